@@ -1,57 +1,61 @@
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+import inspect
+import threading
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterable, Iterator, List, Optional, Union
+
+from langchain_core.tools import BaseTool
+from langgraph.graph import StateGraph
 from langgraph.prebuilt import create_react_agent
-from langgraph_swarm import create_handoff_tool
+from langgraph.utils.runnable import RunnableCallable
+from langgraph_swarm.swarm import SwarmState, add_active_agent_router
 
+from agents.fanout import create_fanout_tool, FANOUT_COORDINATOR_INSTRUCTIONS, FANOUT_WORKER_INSTRUCTIONS
+from agents.handoff_governor import HandoffGovernor
+from utils.history import compacting_prompt, DEFAULT_HISTORY_BUDGET
 from tools.emergency_tools import (
     assess_medical_urgency,
+    assess_medical_urgency_batch,
     check_travel_advisory,
     find_emergency_accommodation,
+    find_emergency_accommodation_batch,
     check_visa_requirements
 )
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from tools.prefetch import SpeculativePrefetcher
 
-def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
-    """
-    Create the specialized agents for the Emergency Travel Response System.
-    
-    Args:
-        model: The LLM to power the agents
-        
-    Returns:
-        A dictionary of all agents in the system
-    """
-    handoff_tools = {
-        "coordinator": create_handoff_tool(agent_name="EmergencyCoordinator", 
-                                           description="Return to the main coordinator for further assistance or to handle another aspect of the emergency"),
-        "medical": create_handoff_tool(agent_name="MedicalEvacuationSpecialist", 
-                                       description="Transfer to the medical evacuation specialist for help with medical transport or evacuation"),
-        "disaster": create_handoff_tool(agent_name="DisasterResponseExpert", 
-                                        description="Transfer to the disaster response expert for help with natural disasters, evacuations, and danger assessment"),
-        "business": create_handoff_tool(agent_name="BusinessContinuityAgent", 
-                                        description="Transfer to the business continuity agent for urgent business travel arrangements"),
-        "security": create_handoff_tool(agent_name="SecurityAnalyst", 
-                                        description="Transfer to the security analyst for risk assessment and safety recommendations"),
-        "logistics": create_handoff_tool(agent_name="LogisticsOperator", 
-                                         description="Transfer to the logistics operator for complex transportation planning"),
-        "documentation": create_handoff_tool(agent_name="DocumentationExpert", 
-                                             description="Transfer to the documentation expert for emergency visa/passport assistance"),
-        "accommodation": create_handoff_tool(agent_name="AccommodationFinder", 
-                                             description="Transfer to the accommodation finder for emergency lodging assistance"),
-        "medical_advisor": create_handoff_tool(agent_name="MedicalAdvisor", 
-                                               description="Transfer to the medical advisor for health guidance for travelers"),
-        "communication": create_handoff_tool(agent_name="CommunicationCoordinator", 
-                                             description="Transfer to the communication coordinator for establishing reliable communication channels"),
-        "insurance": create_handoff_tool(agent_name="InsuranceSpecialist", 
-                                         description="Transfer to the insurance specialist for emergency claims and coverage verification"),
-        "local_resources": create_handoff_tool(agent_name="LocalResourceLocator", 
-                                               description="Transfer to the local resource locator for connecting with local emergency services")
-    }
-    
-    emergency_coordinator = create_react_agent(
-        model,
-        [tool for agent_name, tool in handoff_tools.items() if agent_name != "coordinator"],
-        prompt="""You are the Emergency Coordinator, the central orchestrator for emergency travel response.
+
+HANDOFF_DESCRIPTIONS: Dict[str, str] = {
+    "EmergencyCoordinator": "Return to the main coordinator for further assistance or to handle another aspect of the emergency",
+    "MedicalEvacuationSpecialist": "Transfer to the medical evacuation specialist for help with medical transport or evacuation",
+    "DisasterResponseExpert": "Transfer to the disaster response expert for help with natural disasters, evacuations, and danger assessment",
+    "BusinessContinuityAgent": "Transfer to the business continuity agent for urgent business travel arrangements",
+    "SecurityAnalyst": "Transfer to the security analyst for risk assessment and safety recommendations",
+    "LogisticsOperator": "Transfer to the logistics operator for complex transportation planning",
+    "DocumentationExpert": "Transfer to the documentation expert for emergency visa/passport assistance",
+    "AccommodationFinder": "Transfer to the accommodation finder for emergency lodging assistance",
+    "MedicalAdvisor": "Transfer to the medical advisor for health guidance for travelers",
+    "CommunicationCoordinator": "Transfer to the communication coordinator for establishing reliable communication channels",
+    "InsuranceSpecialist": "Transfer to the insurance specialist for emergency claims and coverage verification",
+    "LocalResourceLocator": "Transfer to the local resource locator for connecting with local emergency services",
+}
+
+# Each agent is described by its domain tools, the agents it may hand off to and its prompt,
+# plus an optional "history_budget": the approximate number of conversation tokens it is sent
+# (DEFAULT_HISTORY_BUDGET if absent), and an optional model "tier": "fast" for lookup work
+# that a smaller model handles well, "routing" for an agent whose turn-opening triage and
+# handoff steps can run on the fast model while its other steps need the strong one, and
+# "strong" (the default) for medical, security and other judgement-heavy work. The order
+# of this table is the order in which agents are added to the swarm.
+AGENT_SPECS: Dict[str, Dict[str, Any]] = {
+    "EmergencyCoordinator": {
+        "tools": [],
+        "handoffs": [name for name in HANDOFF_DESCRIPTIONS if name != "EmergencyCoordinator"],
+        # The coordinator summarizes specialists' findings, so it sees more of the history.
+        "history_budget": 6000,
+        "tier": "routing",
+        "prompt": """You are the Emergency Coordinator, the central orchestrator for emergency travel response.
         
         Your responsibilities:
         - Triage incoming emergency requests 
@@ -69,13 +73,11 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Business emergency: nature of urgent business need, timeline, VIP status
         
         Be compassionate but efficient - emergencies require rapid, accurate responses.""",
-        name="EmergencyCoordinator",
-    )
-    
-    medical_evacuation_specialist = create_react_agent(
-        model,
-        [assess_medical_urgency, handoff_tools["coordinator"]],
-        prompt="""You are the Medical Evacuation Specialist, an expert in medical emergency transportation.
+    },
+    "MedicalEvacuationSpecialist": {
+        "tools": [assess_medical_urgency, assess_medical_urgency_batch],
+        "handoffs": ["EmergencyCoordinator"],
+        "prompt": """You are the Medical Evacuation Specialist, an expert in medical emergency transportation.
         
         Your responsibilities:
         - Assess medical evacuation needs based on reported symptoms and conditions
@@ -93,13 +95,11 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Insurance and payment capabilities for medical evacuation
         
         Be methodical, clear, and compassionate - medical emergencies are stressful for all involved.""",
-        name="MedicalEvacuationSpecialist",
-    )
-    
-    disaster_response_expert = create_react_agent(
-        model,
-        [check_travel_advisory, handoff_tools["coordinator"], handoff_tools["security"], handoff_tools["logistics"]],
-        prompt="""You are the Disaster Response Expert, specialized in natural disaster zones and evacuations.
+    },
+    "DisasterResponseExpert": {
+        "tools": [check_travel_advisory],
+        "handoffs": ["EmergencyCoordinator", "SecurityAnalyst", "LogisticsOperator"],
+        "prompt": """You are the Disaster Response Expert, specialized in natural disaster zones and evacuations.
         
         Your responsibilities:
         - Assess the severity and impact of natural disasters in travel areas
@@ -116,13 +116,12 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Communication methods that remain operational in the disaster zone
         
         Be direct, factual, and reassuring - people in disaster situations need clear guidance.""",
-        name="DisasterResponseExpert",
-    )
-    
-    business_continuity_agent = create_react_agent(
-        model,
-        [handoff_tools["coordinator"], handoff_tools["logistics"], handoff_tools["documentation"]],
-        prompt="""You are the Business Continuity Agent, specialized in urgent business travel needs.
+    },
+    "BusinessContinuityAgent": {
+        "tools": [],
+        "handoffs": ["EmergencyCoordinator", "LogisticsOperator", "DocumentationExpert"],
+        "tier": "fast",
+        "prompt": """You are the Business Continuity Agent, specialized in urgent business travel needs.
         
         Your responsibilities:
         - Arrange last-minute business travel during disruptions
@@ -139,13 +138,11 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Backup plans for multiple scenarios
         
         Be efficient, solution-oriented, and professional - business emergencies require practical alternatives and clear communication.""",
-        name="BusinessContinuityAgent",
-    )
-    
-    security_analyst = create_react_agent(
-        model,
-        [check_travel_advisory, handoff_tools["coordinator"], handoff_tools["local_resources"]],
-        prompt="""You are the Security Analyst, specialized in travel risk assessment and safety.
+    },
+    "SecurityAnalyst": {
+        "tools": [check_travel_advisory],
+        "handoffs": ["EmergencyCoordinator", "LocalResourceLocator"],
+        "prompt": """You are the Security Analyst, specialized in travel risk assessment and safety.
         
         Your responsibilities:
         - Evaluate security threats in travel destinations
@@ -162,13 +159,11 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Emergency contacts and evacuation protocols
         
         Be detailed, factual, and measured - avoid causing unnecessary alarm while ensuring travelers understand genuine risks.""",
-        name="SecurityAnalyst",
-    )
-    
-    logistics_operator = create_react_agent(
-        model,
-        [handoff_tools["coordinator"], handoff_tools["security"]],
-        prompt="""You are the Logistics Operator, specialized in complex transportation planning.
+    },
+    "LogisticsOperator": {
+        "tools": [],
+        "handoffs": ["EmergencyCoordinator", "SecurityAnalyst"],
+        "prompt": """You are the Logistics Operator, specialized in complex transportation planning.
         
         Your responsibilities:
         - Plan multi-stage transportation routes, especially in disrupted areas
@@ -185,13 +180,12 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Border crossing and documentation needs
         
         Be precise, comprehensive, and adaptable - logistics planning requires attention to detail and contingency planning.""",
-        name="LogisticsOperator",
-    )
-    
-    documentation_expert = create_react_agent(
-        model,
-        [check_visa_requirements, handoff_tools["coordinator"]],
-        prompt="""You are the Documentation Expert, specialized in emergency travel documentation.
+    },
+    "DocumentationExpert": {
+        "tools": [check_visa_requirements],
+        "handoffs": ["EmergencyCoordinator"],
+        "tier": "fast",
+        "prompt": """You are the Documentation Expert, specialized in emergency travel documentation.
         
         Your responsibilities:
         - Handle emergency visa and passport issues
@@ -208,13 +202,12 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Requirements for specific emergency situations (medical, evacuation, etc.)
         
         Be precise, knowledgeable, and action-oriented - documentation issues can completely block travel if not resolved quickly.""",
-        name="DocumentationExpert",
-    )
-    
-    accommodation_finder = create_react_agent(
-        model,
-        [find_emergency_accommodation, handoff_tools["coordinator"], handoff_tools["security"]],
-        prompt="""You are the Accommodation Finder, specialized in securing emergency lodging.
+    },
+    "AccommodationFinder": {
+        "tools": [find_emergency_accommodation, find_emergency_accommodation_batch],
+        "handoffs": ["EmergencyCoordinator", "SecurityAnalyst"],
+        "tier": "fast",
+        "prompt": """You are the Accommodation Finder, specialized in securing emergency lodging.
         
         Your responsibilities:
         - Locate available accommodation in emergency situations
@@ -231,13 +224,11 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Duration of stay needed and options for extension
         
         Be resourceful, practical, and thorough - people need safe shelter quickly in emergencies.""",
-        name="AccommodationFinder",
-    )
-    
-    medical_advisor = create_react_agent(
-        model,
-        [assess_medical_urgency, handoff_tools["coordinator"], handoff_tools["medical"]],
-        prompt="""You are the Medical Advisor, providing health guidance for travelers.
+    },
+    "MedicalAdvisor": {
+        "tools": [assess_medical_urgency],
+        "handoffs": ["EmergencyCoordinator", "MedicalEvacuationSpecialist"],
+        "prompt": """You are the Medical Advisor, providing health guidance for travelers.
         
         Your responsibilities:
         - Advise travelers with existing health conditions
@@ -254,13 +245,12 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Location of suitable medical facilities at the destination
         
         Be thorough, evidence-based, and practical - travelers need specific guidance they can implement.""",
-        name="MedicalAdvisor",
-    )
-    
-    communication_coordinator = create_react_agent(
-        model,
-        [handoff_tools["coordinator"], handoff_tools["local_resources"]],
-        prompt="""You are the Communication Coordinator, ensuring reliable emergency communications.
+    },
+    "CommunicationCoordinator": {
+        "tools": [],
+        "handoffs": ["EmergencyCoordinator", "LocalResourceLocator"],
+        "tier": "fast",
+        "prompt": """You are the Communication Coordinator, ensuring reliable emergency communications.
         
         Your responsibilities:
         - Establish communication plans for travelers in remote or disaster areas
@@ -277,13 +267,12 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Regular check-in protocols and emergency signals
         
         Be technical, practical, and thorough - communication is critical during emergencies.""",
-        name="CommunicationCoordinator",
-    )
-    
-    insurance_specialist = create_react_agent(
-        model,
-        [handoff_tools["coordinator"], handoff_tools["medical"]],
-        prompt="""You are the Insurance Specialist, handling emergency travel insurance matters.
+    },
+    "InsuranceSpecialist": {
+        "tools": [],
+        "handoffs": ["EmergencyCoordinator", "MedicalEvacuationSpecialist"],
+        "tier": "fast",
+        "prompt": """You are the Insurance Specialist, handling emergency travel insurance matters.
         
         Your responsibilities:
         - Verify insurance coverage for emergency situations
@@ -300,13 +289,12 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Payment alternatives when insurance doesn't provide immediate coverage
         
         Be detailed, accurate, and solution-oriented - insurance issues can significantly impact access to emergency services.""",
-        name="InsuranceSpecialist",
-    )
-    
-    local_resource_locator = create_react_agent(
-        model,
-        [handoff_tools["coordinator"]],
-        prompt="""You are the Local Resource Locator, connecting travelers with local emergency services.
+    },
+    "LocalResourceLocator": {
+        "tools": [],
+        "handoffs": ["EmergencyCoordinator"],
+        "tier": "fast",
+        "prompt": """You are the Local Resource Locator, connecting travelers with local emergency services.
         
         Your responsibilities:
         - Identify and provide contact information for local emergency services
@@ -323,20 +311,201 @@ def create_agents(model: ChatOpenAI) -> Dict[str, Any]:
         - Cultural factors that may affect emergency response
         
         Be resourceful, specific, and practical - local knowledge is often critical in emergencies.""",
-        name="LocalResourceLocator",
+    },
+}
+
+
+# The prompts are resent on every call as the start of the prompt, which is what the
+# provider's prompt cache matches on. Dedenting them once drops the source indentation
+# from every request and leaves each agent's prefix byte-identical in every process.
+for _spec in AGENT_SPECS.values():
+    _spec["prompt"] = inspect.cleandoc(_spec["prompt"])
+
+ModelLike = Union["BaseChatModel", Mapping]
+
+
+def model_for(name: str, model: ModelLike) -> "BaseChatModel":
+    """Pick the model for an agent: ``model`` itself, or its spec's tier from a mapping of tiers."""
+    if isinstance(model, Mapping):
+        return model[AGENT_SPECS[name].get("tier", "strong")]
+    return model
+
+
+def _domain_tools(name: str, prefetcher: Optional["SpeculativePrefetcher"]) -> List[Any]:
+    tools = AGENT_SPECS[name]["tools"]
+    return [prefetcher.wrap(tool) for tool in tools] if prefetcher is not None else list(tools)
+
+
+def build_agent(name: str, model: ModelLike, handoff_tool: Callable[[str], BaseTool],
+                fanout_workers: Optional[Mapping] = None,
+                prefetcher: Optional["SpeculativePrefetcher"] = None) -> Any:
+    """
+    Build one swarm agent from its entry in AGENT_SPECS.
+    
+    Args:
+        name: The agent's name
+        model: The LLM to power the agent, or LLMs keyed by tier
+        handoff_tool: Returns the handoff tool for a destination agent
+        fanout_workers: Specialist workers for the coordinator's fan-out tool, if enabled
+        prefetcher: Serves the agent's tool calls from results prefetched at the start of the turn
+        
+    Returns:
+        The compiled ReAct agent
+    """
+    spec = AGENT_SPECS[name]
+    tools = _domain_tools(name, prefetcher) + [handoff_tool(target) for target in spec["handoffs"]]
+    prompt = spec["prompt"]
+    if fanout_workers is not None and name == "EmergencyCoordinator":
+        tools.append(create_fanout_tool(fanout_workers))
+        prompt += FANOUT_COORDINATOR_INSTRUCTIONS
+    budget = spec.get("history_budget", DEFAULT_HISTORY_BUDGET)
+    return create_react_agent(model_for(name, model), tools, prompt=compacting_prompt(prompt, budget), name=name)
+
+
+def build_fanout_worker(name: str, model: ModelLike, prefetcher: Optional["SpeculativePrefetcher"] = None) -> Any:
+    """Build a handoff-free copy of a specialist for parallel consultation."""
+    spec = AGENT_SPECS[name]
+    return create_react_agent(
+        model_for(name, model),
+        _domain_tools(name, prefetcher),
+        prompt=spec["prompt"] + FANOUT_WORKER_INSTRUCTIONS,
+        name=name,
     )
+
+
+def create_agents(model: ModelLike, fanout: bool = False, governor: Optional[HandoffGovernor] = None,
+                  prefetcher: Optional["SpeculativePrefetcher"] = None) -> Dict[str, Any]:
+    """
+    Create the specialized agents for the Emergency Travel Response System.
     
-    return {
-        "EmergencyCoordinator": emergency_coordinator,
-        "MedicalEvacuationSpecialist": medical_evacuation_specialist,
-        "DisasterResponseExpert": disaster_response_expert,
-        "BusinessContinuityAgent": business_continuity_agent,
-        "SecurityAnalyst": security_analyst,
-        "LogisticsOperator": logistics_operator,
-        "DocumentationExpert": documentation_expert,
-        "AccommodationFinder": accommodation_finder,
-        "MedicalAdvisor": medical_advisor,
-        "CommunicationCoordinator": communication_coordinator,
-        "InsuranceSpecialist": insurance_specialist,
-        "LocalResourceLocator": local_resource_locator
-    } 
\ No newline at end of file
+    Args:
+        model: The LLM to power the agents, or LLMs keyed by tier ("fast", "routing", "strong")
+            so each agent gets the model its spec asks for
+        fanout: Give the EmergencyCoordinator a tool that consults several
+            specialists concurrently and merges their findings
+        governor: Builds the handoff tools and enforces the hop limit and cycle
+            detection; a default HandoffGovernor is used if omitted
+        prefetcher: Optional tools.prefetch.SpeculativePrefetcher whose prefetched
+            results the agents' tools return when the arguments match
+        
+    Returns:
+        A dictionary of all agents in the system
+    """
+    governor = governor or HandoffGovernor()
+    handoff_tools = {
+        name: governor.create_handoff_tool(agent_name=name, description=description)
+        for name, description in HANDOFF_DESCRIPTIONS.items()
+    }
+    workers = create_fanout_workers(model, prefetcher) if fanout else None
+    return {name: build_agent(name, model, handoff_tools.__getitem__, workers, prefetcher) for name in AGENT_SPECS}
+
+
+def create_fanout_workers(model: ModelLike, prefetcher: Optional["SpeculativePrefetcher"] = None) -> Dict[str, Any]:
+    """
+    Create handoff-free copies of the specialists for parallel consultation.
+    
+    Args:
+        model: The LLM to power the workers, or LLMs keyed by tier
+        prefetcher: Serves the workers' tool calls from prefetched results
+        
+    Returns:
+        A dictionary of worker agents keyed by specialist name
+    """
+    return {name: build_fanout_worker(name, model, prefetcher) for name in AGENT_SPECS if name != "EmergencyCoordinator"}
+
+
+class _LazyRegistry(Mapping):
+    """Mapping that builds each value on first access, once, even under concurrent access."""
+
+    def __init__(self, names: Iterable[str], build: Callable[[str], Any]):
+        self._names = list(names)
+        self._build = build
+        self._built: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> Any:
+        value = self._built.get(name)
+        if value is None:
+            if name not in self._names:
+                raise KeyError(name)
+            with self._lock:
+                value = self._built.get(name)
+                if value is None:
+                    value = self._built[name] = self._build(name)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def built(self) -> List[str]:
+        return [name for name in self._names if name in self._built]
+
+
+class LazyAgents:
+    """
+    Swarm whose agents are built on first use instead of up front.
+
+    ``swarm()`` returns the same graph shape as ``create_swarm(create_agents(...))``:
+    one node per agent, routed on ``active_agent``, with handoff destinations taken
+    from AGENT_SPECS. Each node builds its ReAct agent (and that agent's handoff tools)
+    the first time control reaches it, so an incident that only touches two agents
+    only pays for two. Call ``prewarm()`` to build everything ahead of time, e.g.
+    before forking worker processes so they all inherit the built agents.
+
+    Args:
+        model: The LLM to power the agents, or LLMs keyed by tier
+        fanout: Give the EmergencyCoordinator the fan-out tool (its workers are lazy too)
+        governor: Builds the handoff tools; a default HandoffGovernor is used if omitted
+        prefetcher: Serves the agents' tool calls from prefetched results (see create_agents)
+    """
+
+    def __init__(self, model: ModelLike, fanout: bool = False, governor: Optional[HandoffGovernor] = None,
+                 prefetcher: Optional["SpeculativePrefetcher"] = None):
+        self.model = model
+        self.fanout = fanout
+        self.prefetcher = prefetcher
+        self.governor = governor or HandoffGovernor()
+        self.governor.register(HANDOFF_DESCRIPTIONS)
+        self._handoff_tools = _LazyRegistry(
+            HANDOFF_DESCRIPTIONS,
+            lambda name: self.governor.create_handoff_tool(agent_name=name, description=HANDOFF_DESCRIPTIONS[name]),
+        )
+        self._workers = _LazyRegistry(
+            [name for name in AGENT_SPECS if name != "EmergencyCoordinator"],
+            lambda name: build_fanout_worker(name, self.model, self.prefetcher),
+        )
+        self.agents = _LazyRegistry(
+            AGENT_SPECS,
+            lambda name: build_agent(name, self.model, self._handoff_tools.__getitem__,
+                                     self._workers if self.fanout else None, self.prefetcher),
+        )
+
+    def prewarm(self, names: Optional[Iterable[str]] = None) -> None:
+        """Build the given agents (all by default) now rather than on first use."""
+        for name in names or AGENT_SPECS:
+            self.agents[name]
+            if self.fanout and name in self._workers:
+                self._workers[name]
+
+    def built(self) -> List[str]:
+        return self.agents.built()
+
+    def _node(self, name: str) -> RunnableCallable:
+        def invoke(state: Dict[str, Any], config: Dict[str, Any]) -> Any:
+            return self.agents[name].invoke(state, config)
+
+        async def ainvoke(state: Dict[str, Any], config: Dict[str, Any]) -> Any:
+            return await self.agents[name].ainvoke(state, config)
+
+        return RunnableCallable(invoke, ainvoke, name=name)
+
+    def swarm(self, default_active_agent: str = "EmergencyCoordinator") -> StateGraph:
+        """Return the uncompiled swarm graph with one lazily built node per agent."""
+        builder = StateGraph(SwarmState)
+        add_active_agent_router(builder, route_to=list(AGENT_SPECS), default_active_agent=default_active_agent)
+        for name, spec in AGENT_SPECS.items():
+            builder.add_node(name, self._node(name), destinations=tuple(spec["handoffs"]))
+        return builder
@@ -0,0 +1,90 @@
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Mapping
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+FANOUT_COORDINATOR_INSTRUCTIONS = "\n\n" + inspect.cleandoc("""
+        When an emergency spans several domains (for example medical, security and documentation at once),
+        use the dispatch_specialists tool to consult all of the relevant specialists in parallel, then
+        combine their findings into a single coordinated response for the user.""")
+
+FANOUT_WORKER_INSTRUCTIONS = "\n\n" + inspect.cleandoc("""
+        You are being consulted in parallel with other specialists on the same incident.
+        You cannot transfer the conversation; answer with your own findings and recommendations only.""")
+
+
+def _final_answer(result: Dict[str, Any]) -> str:
+    for message in reversed(result.get("messages", [])):
+        if getattr(message, "type", "") == "ai" and message.content:
+            return message.content
+    return "No findings returned."
+
+
+def create_fanout_tool(workers: Mapping[str, Any]) -> BaseTool:
+    """
+    Create a tool that consults several specialist workers concurrently.
+    
+    The workers are invoked in parallel on the same task and their final answers are
+    merged into one result keyed by specialist name, so the call takes as long as the
+    slowest specialist rather than the sum of all of them.
+    
+    Args:
+        workers: Handoff-free specialist agents keyed by name
+        
+    Returns:
+        The dispatch_specialists tool
+    """
+    def _inputs(task: str) -> Dict[str, Any]:
+        return {"messages": [HumanMessage(content=task)]}
+
+    def _worker_config(config: RunnableConfig) -> RunnableConfig:
+        # Keep callbacks and tracing, but detach the workers from the swarm's checkpointer:
+        # they are one-shot consultations, not nodes of the parent graph.
+        return {**config, "configurable": {}}
+
+    def _unknown(specialists: List[str]) -> Dict[str, str]:
+        return {name: f"Unknown specialist. Available: {', '.join(workers)}" for name in specialists if name not in workers}
+
+    def dispatch_specialists(specialists: List[str], task: str, config: RunnableConfig) -> Dict[str, str]:
+        selected = [name for name in dict.fromkeys(specialists) if name in workers]
+        findings = _unknown(specialists)
+        if not selected:
+            return findings
+        with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+            futures = {name: executor.submit(workers[name].invoke, _inputs(task), _worker_config(config)) for name in selected}
+            for name, future in futures.items():
+                try:
+                    findings[name] = _final_answer(future.result())
+                except Exception as e:
+                    findings[name] = f"Consultation failed: {str(e)}"
+        return findings
+
+    async def adispatch_specialists(specialists: List[str], task: str, config: RunnableConfig) -> Dict[str, str]:
+        selected = [name for name in dict.fromkeys(specialists) if name in workers]
+        findings = _unknown(specialists)
+        results = await asyncio.gather(
+            *(workers[name].ainvoke(_inputs(task), _worker_config(config)) for name in selected),
+            return_exceptions=True
+        )
+        for name, result in zip(selected, results):
+            if isinstance(result, Exception):
+                findings[name] = f"Consultation failed: {str(result)}"
+            else:
+                findings[name] = _final_answer(result)
+        return findings
+
+    return StructuredTool.from_function(
+        func=dispatch_specialists,
+        coroutine=adispatch_specialists,
+        name="dispatch_specialists",
+        description=(
+            "Consult several specialists at the same time on one task and receive all of their findings. "
+            f"specialists must be chosen from: {', '.join(workers)}. "
+            "task should describe the emergency and what each specialist should focus on."
+        ),
+    )
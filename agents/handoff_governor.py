@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, InjectedToolCallId, tool
+from langgraph.prebuilt import InjectedState
+from langgraph.types import Command
+from langgraph_swarm.handoff import METADATA_KEY_HANDOFF_DESTINATION, _normalize_agent_name
+from typing_extensions import Annotated
+
+from agents.triage import COORDINATOR
+from utils.history import summary_lines
+from utils.streaming import HANDOFF_TOOL_PREFIX
+
+
+def _turn_start(messages: List[Any]) -> int:
+    return max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1) + 1
+
+
+class HandoffGovernor:
+    """
+    Builds handoff tools that enforce a hop budget and refuse cycles.
+
+    The transfer path of the current turn is read from the thread's messages (the
+    handoff tool results since the last user message), so it survives checkpoints and
+    restarts. A handoff is refused when the turn has already made ``max_hops``
+    transfers, or when it would revisit a specialist already visited this turn (the
+    coordinator may be revisited). A refused handoff sends control back to the
+    EmergencyCoordinator with a summary of what the specialists found; if the
+    coordinator itself is refused it is told to answer the user directly, in a tool
+    message with ``status="error"`` that does not count as a transfer.
+
+    Args:
+        max_hops: Maximum number of handoffs per turn
+        detect_cycles: Refuse handoffs that revisit a specialist within the same turn
+        coordinator: Agent that receives control when a handoff is refused
+        max_tracked_threads: Number of threads whose last transfer path is kept for monitoring
+    """
+
+    def __init__(self, max_hops: int = 6, detect_cycles: bool = True, coordinator: str = COORDINATOR,
+                 max_tracked_threads: int = 1024):
+        self.max_hops = max_hops
+        self.detect_cycles = detect_cycles
+        self.coordinator = coordinator
+        self.max_tracked_threads = max_tracked_threads
+        self._agents_by_tool: Dict[str, str] = {}
+        self._paths: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"handoffs": 0, "blocked_hop_limit": 0, "blocked_cycle": 0, "forced_returns": 0}
+
+    def register(self, agent_names: Iterable[str]) -> None:
+        """Make handoffs to these agents recognisable in transfer paths before their tools exist."""
+        for agent_name in agent_names:
+            self._agents_by_tool[f"{HANDOFF_TOOL_PREFIX}{_normalize_agent_name(agent_name)}"] = agent_name
+
+    def create_handoff_tool(self, *, agent_name: str, description: Optional[str] = None) -> BaseTool:
+        """
+        Drop-in replacement for langgraph_swarm.create_handoff_tool: same tool name,
+        description and destination metadata, so the swarm routes to it unchanged.
+        """
+        name = f"{HANDOFF_TOOL_PREFIX}{_normalize_agent_name(agent_name)}"
+        self.register([agent_name])
+        if description is None:
+            description = f"Ask agent '{agent_name}' for help"
+        governor = self
+
+        @tool(name, description=description)
+        def handoff_to_agent(
+            state: Annotated[dict, InjectedState],
+            tool_call_id: Annotated[str, InjectedToolCallId],
+            config: RunnableConfig,
+        ):
+            return governor._handoff(agent_name, name, state, tool_call_id, config)
+
+        handoff_to_agent.metadata = {METADATA_KEY_HANDOFF_DESTINATION: agent_name}
+        return handoff_to_agent
+
+    def turn_path(self, messages: List[Any]) -> List[str]:
+        """Agents visited in the current turn, in order, starting with the one that took the user message."""
+        turn = messages[_turn_start(messages):]
+        first = next((m.name for m in turn if isinstance(m, AIMessage) and m.name), None)
+        path = [first] if first else []
+        for message in turn:
+            # A refused handoff that left control where it was is marked as an error.
+            if (isinstance(message, ToolMessage) and message.name in self._agents_by_tool
+                    and message.status != "error"):
+                path.append(self._agents_by_tool[message.name])
+        return path
+
+    def _handoff(self, agent_name: str, tool_name: str, state: Dict[str, Any], tool_call_id: str,
+                 config: RunnableConfig) -> Any:
+        messages = state["messages"]
+        path = self.turn_path(messages)
+        source = path[-1] if path else self.coordinator
+        hops = len(path) - 1 if path else 0
+
+        reason = None
+        if hops >= self.max_hops:
+            reason, counter = f"the hop limit of {self.max_hops} handoffs per turn was reached", "blocked_hop_limit"
+        elif self.detect_cycles and agent_name != self.coordinator and agent_name in path:
+            reason, counter = f"{agent_name} was already consulted in this turn", "blocked_cycle"
+
+        thread_id = config.get("configurable", {}).get("thread_id")
+        if reason is None:
+            self._record(thread_id, path + [agent_name], "handoffs")
+            tool_message = ToolMessage(content=f"Successfully transferred to {agent_name}",
+                                       name=tool_name, tool_call_id=tool_call_id)
+            return Command(
+                goto=agent_name,
+                graph=Command.PARENT,
+                update={"messages": messages + [tool_message], "active_agent": agent_name},
+            )
+
+        route = " -> ".join(path + [agent_name])
+        findings = "\n".join(summary_lines(messages[_turn_start(messages):]))
+        if source == self.coordinator:
+            self._record(thread_id, path, counter)
+            return ToolMessage(
+                content=(f"Handoff to {agent_name} refused: {reason} (path: {route}). "
+                         f"Do not transfer again; answer the user directly with what is known so far.\n{findings}"),
+                name=tool_name,
+                tool_call_id=tool_call_id,
+                status="error",
+            )
+
+        self._record(thread_id, path + [self.coordinator], counter, forced=True)
+        # Named as a transfer to the coordinator so the path records where control actually went.
+        tool_message = ToolMessage(
+            content=(f"Handoff to {agent_name} refused: {reason} (path: {route}). "
+                     f"Returning to {self.coordinator}. Findings so far:\n{findings}"),
+            name=f"{HANDOFF_TOOL_PREFIX}{_normalize_agent_name(self.coordinator)}",
+            tool_call_id=tool_call_id,
+        )
+        return Command(
+            goto=self.coordinator,
+            graph=Command.PARENT,
+            update={"messages": messages + [tool_message], "active_agent": self.coordinator},
+        )
+
+    def _record(self, thread_id: Optional[str], path: List[str], counter: str, forced: bool = False) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+            self._counters["forced_returns"] += int(forced)
+            if thread_id is not None:
+                self._paths[thread_id] = path
+                self._paths.move_to_end(thread_id)
+                while len(self._paths) > self.max_tracked_threads:
+                    self._paths.popitem(last=False)
+
+    def last_path(self, thread_id: str) -> List[str]:
+        with self._lock:
+            return list(self._paths.get(thread_id, []))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            longest = max((len(path) - 1 for path in self._paths.values()), default=0)
+            return {**self._counters, "longest_path": longest}
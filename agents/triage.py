@@ -0,0 +1,115 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from tools.emergency_tools import classify_urgency, URGENCY_RANK
+from tools.knowledge_base import default_knowledge_base
+
+
+COORDINATOR = "EmergencyCoordinator"
+
+# Keyword signals per specialist. An incident that hits exactly one domain is routed
+# straight to that specialist; anything ambiguous goes to the EmergencyCoordinator.
+DOMAIN_KEYWORDS: Dict[str, List[str]] = {
+    "SecurityAnalyst": ["protest", "protests", "unrest", "riot", "riots", "security threat", "kidnap",
+                        "kidnapping", "terrorist", "terrorism", "shooting", "gunfire", "armed", "coup"],
+    "DisasterResponseExpert": ["earthquake", "flood", "flooding", "hurricane", "typhoon", "cyclone",
+                               "tsunami", "wildfire", "volcano", "eruption", "landslide", "tornado"],
+    "DocumentationExpert": ["passport", "visa", "travel documents", "embassy", "consulate"],
+    "AccommodationFinder": ["somewhere to stay", "place to stay", "accommodation", "lodging", "shelter"],
+    "CommunicationCoordinator": ["lost contact", "haven't heard", "cannot reach", "can't reach",
+                                 "cell networks", "no signal", "phones are down"],
+    "InsuranceSpecialist": ["insurance", "claim", "coverage"],
+}
+
+_DOMAIN_PATTERNS = {
+    agent: re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")\b", re.IGNORECASE)
+    for agent, keywords in DOMAIN_KEYWORDS.items()
+}
+
+
+@dataclass
+class TriageDecision:
+    agent: str
+    confidence: float
+    hits: Dict[str, int] = field(default_factory=dict)
+    country: Optional[str] = None
+
+    @property
+    def fast_path(self) -> bool:
+        return self.agent != COORDINATOR
+
+
+def classify_incident(text: str) -> TriageDecision:
+    """
+    Classify an incoming incident with local rules, without calling the LLM.
+
+    Args:
+        text: The user's description of the emergency
+
+    Returns:
+        A TriageDecision with the suggested agent, a confidence between 0 and 1,
+        the keyword hits per specialist and the first country named in the text
+    """
+    hits = {agent: len(pattern.findall(text)) for agent, pattern in _DOMAIN_PATTERNS.items()}
+
+    urgency = classify_urgency(text)
+    if urgency == "CRITICAL":
+        hits["MedicalEvacuationSpecialist"] = 2
+    elif urgency == "URGENT":
+        hits["MedicalAdvisor"] = 1
+
+    knowledge_base = default_knowledge_base()
+    country_match = knowledge_base.country_pattern().search(text)
+    country = country_match.group(1).lower() if country_match else None
+    if country and knowledge_base.advisory(country)[0] == "DO NOT TRAVEL":
+        hits["SecurityAnalyst"] = hits["SecurityAnalyst"] + 1
+
+    hits = {agent: count for agent, count in hits.items() if count}
+    total = sum(hits.values())
+    if not total:
+        return TriageDecision(COORDINATOR, 0.0, hits, country)
+
+    agent = max(hits, key=hits.get)
+    confidence = hits[agent] / total
+    return TriageDecision(agent, confidence, hits, country)
+
+
+def incident_priority(text: str) -> int:
+    """Rank a message by medical urgency for scheduling: CRITICAL 0, URGENT 1, ROUTINE 2."""
+    return URGENCY_RANK[classify_urgency(text)]
+
+
+class TriageRouter:
+    """
+    Pre-router that sends clear-cut incidents straight to a specialist.
+
+    Incidents whose classification confidence reaches ``threshold`` skip the
+    EmergencyCoordinator's routing LLM call; everything else falls back to it.
+    Counters record how often the fast path was taken.
+
+    Args:
+        threshold: Minimum confidence needed to bypass the coordinator
+    """
+
+    def __init__(self, threshold: float = 1.0):
+        self.threshold = threshold
+        self.routed: Dict[str, int] = {}
+        self.total = 0
+
+    def __call__(self, text: str) -> Optional[str]:
+        """Return the specialist to start with, or None to use the coordinator."""
+        decision = classify_incident(text)
+        agent = decision.agent if decision.confidence >= self.threshold else COORDINATOR
+        self.total += 1
+        self.routed[agent] = self.routed.get(agent, 0) + 1
+        return None if agent == COORDINATOR else agent
+
+    def stats(self) -> Dict[str, Any]:
+        fast_path = self.total - self.routed.get(COORDINATOR, 0)
+        return {
+            "incidents": self.total,
+            "fast_path": fast_path,
+            "fast_path_rate": fast_path / self.total if self.total else 0.0,
+            "routed": dict(self.routed),
+        }
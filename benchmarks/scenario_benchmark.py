@@ -0,0 +1,227 @@
+"""
+Offline benchmark of the orchestration layer: every scenario, plus synthetic variants,
+runs through the compiled swarm against a deterministic scripted chat model.
+
+Run from the repository root (no API key or network needed):
+    python -m benchmarks.scenario_benchmark --variants 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agents.agent_definitions import AGENT_SPECS, LazyAgents
+from agents.triage import COORDINATOR, TriageRouter, classify_incident
+from scenarios.emergency_scenarios import get_scenarios
+from utils.engine import IncidentEngine, IncidentResult
+from utils.instrumentation import AgentMetrics
+
+HANDOFF_PREFIX = "transfer_to_"
+MAX_HANDOFFS_PER_TURN = 3
+# Provider prompt caching as documented by OpenAI: prompts of at least 1024 tokens, matched
+# on their exact prefix in 128-token steps (about four characters per token here).
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+# The first line of each prompt identifies the agent the model is running as.
+_AGENT_BY_PROMPT = {spec["prompt"].splitlines()[0]: name for name, spec in AGENT_SPECS.items()}
+_call_ids = itertools.count()
+
+
+def _tool_args(tool: str, text: str, country: Optional[str]) -> Dict[str, Any]:
+    place = (country or "unknown").title()
+    if tool == "assess_medical_urgency":
+        return {"symptoms": text}
+    if tool == "assess_medical_urgency_batch":
+        return {"records": [text]}
+    if tool == "check_travel_advisory":
+        return {"country": place}
+    if tool == "find_emergency_accommodation":
+        return {"location": place, "num_people": 2}
+    if tool == "check_visa_requirements":
+        return {"citizenship": "US", "destination": place, "purpose": "medical"}
+    return {}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the agents' chat model.
+
+    The coordinator hands off to the specialist chosen by the rule-based triage; a
+    specialist calls its first domain tool once, hands off to a second specialist if the
+    incident also touches that domain, and otherwise answers. Every reply carries
+    approximate token usage, including the prompt tokens a provider-side prefix cache
+    would have served, so the instrumentation has something to count. ``reused_tokens``
+    counts the prompt tokens that repeat an earlier prompt's prefix whatever the
+    prompt's length, which shows how cache-stable prompts are even when they are
+    too short for the provider to cache.
+    """
+
+    latency: float = 0.0
+    cache_min_tokens: int = CACHE_MIN_TOKENS
+    prefixes: Set[str] = Field(default_factory=set)
+    reused_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        system = messages[0].content if messages and isinstance(messages[0], SystemMessage) else ""
+        agent = _AGENT_BY_PROMPT.get(system.splitlines()[0] if system else "", COORDINATOR)
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        turn = messages[last_human:]
+        text = messages[last_human].content if turn else ""
+        decision = classify_incident(text)
+        handoffs = [m for m in turn if isinstance(m, ToolMessage) and m.name.startswith(HANDOFF_PREFIX)]
+        visited = {COORDINATOR.lower()} | {m.name[len(HANDOFF_PREFIX):] for m in handoffs}
+
+        def call(name: str, args: Dict[str, Any]) -> AIMessage:
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{next(_call_ids)}"}])
+
+        if len(handoffs) < MAX_HANDOFFS_PER_TURN:
+            if agent == COORDINATOR and isinstance(messages[-1], HumanMessage) and decision.fast_path:
+                target = HANDOFF_PREFIX + decision.agent.lower()
+                if target in tools:
+                    return call(target, {})
+            if agent != COORDINATOR:
+                called = {m.name for m in turn if isinstance(m, ToolMessage)}
+                domain_tools = [t for t in tools if not t.startswith(HANDOFF_PREFIX)]
+                if domain_tools and domain_tools[0] not in called:
+                    return call(domain_tools[0], _tool_args(domain_tools[0], text, decision.country))
+                for other in sorted(decision.hits, key=decision.hits.get, reverse=True):
+                    target = HANDOFF_PREFIX + other.lower()
+                    if other.lower() not in visited and target in tools:
+                        return call(target, {})
+        return AIMessage(content=f"{agent}: recommended actions for the reported situation. " * 8)
+
+    def _reused_chars(self, prompt: str) -> int:
+        """Length of the longest prefix of ``prompt``, in whole cache steps, seen before; records its prefixes."""
+        reused = 0
+        for end in range(CACHE_STEP_TOKENS * 4, len(prompt) + 1, CACHE_STEP_TOKENS * 4):
+            digest = hashlib.blake2b(prompt[:end].encode(), digest_size=16).hexdigest()
+            if digest in self.prefixes:
+                reused = end
+            else:
+                self.prefixes.add(digest)
+        return reused
+
+    def _result(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> ChatResult:
+        message = self._reply(messages, [tool["function"]["name"] for tool in tools or []])
+        # Tool schemas count towards the prompt, as they do for the provider.
+        prompt = json.dumps(tools or []) + "".join(f"{m.type}:{m.content}" for m in messages)
+        prompt_tokens = len(prompt) // 4
+        reused_tokens = min(self._reused_chars(prompt) // 4, prompt_tokens)
+        self.reused_tokens += reused_tokens
+        # The provider only serves a matching prefix of at least cache_min_tokens from its cache.
+        cached_tokens = reused_tokens if reused_tokens >= self.cache_min_tokens else 0
+        completion_tokens = max(len(message.content) // 4, 1)
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens,
+                                  "input_token_details": {"cache_read": cached_tokens}}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages, kwargs.get("tools"))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages, kwargs.get("tools"))
+
+
+def build_incidents(variants: int) -> List[Tuple[str, str, str]]:
+    """(thread_id, initial, followup) for every scenario, repeated ``variants`` times."""
+    incidents = []
+    for variant in range(variants):
+        for key, scenario in get_scenarios().items():
+            prefix = f"[report {variant}] " if variant else ""
+            incidents.append((f"bench-{key}-{variant}", prefix + scenario["initial"], scenario["followup"]))
+    return incidents
+
+
+async def run_suite(incidents: List[Tuple[str, str, str]], latency: float, concurrency: int,
+                    triage: bool, cache_min_tokens: int = CACHE_MIN_TOKENS, turns: int = 2
+                    ) -> Tuple[List[IncidentResult], float, AgentMetrics, ScriptedChatModel]:
+    metrics = AgentMetrics()
+    model = ScriptedChatModel(latency=latency, cache_min_tokens=cache_min_tokens)
+    app = LazyAgents(model).swarm().compile(checkpointer=InMemorySaver())
+    engine = IncidentEngine(app, max_concurrency=concurrency, deadline=None, max_retries=1,
+                            router=TriageRouter() if triage else None, callbacks=[metrics])
+    start = time.perf_counter()
+    async with engine:
+        results = await engine.run_many((thread_id, initial) for thread_id, initial, _ in incidents)
+        # Later follow-ups are numbered so each turn is a new message; long incidents
+        # outgrow the agents' history budgets and exercise compaction.
+        for turn in range(1, turns):
+            suffix = f" (update {turn})" if turn > 1 else ""
+            results += await engine.run_many((thread_id, followup + suffix) for thread_id, _, followup in incidents)
+    return results, time.perf_counter() - start, metrics, model
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline throughput and latency of the swarm on the scenario suite")
+    parser.add_argument("--variants", type=int, default=10, help="Copies of each scenario to run")
+    parser.add_argument("--concurrency", type=int, default=16, help="Turns in flight at once")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per model call")
+    parser.add_argument("--no-triage", action="store_true", help="Start every incident at the coordinator")
+    parser.add_argument("--cache-min-tokens", type=int, default=CACHE_MIN_TOKENS,
+                        help="Shortest prompt the simulated provider prompt cache serves")
+    parser.add_argument("--turns", type=int, default=2, help="Turns per incident: the report, then follow-ups")
+    args = parser.parse_args()
+
+    incidents = build_incidents(args.variants)
+    results, elapsed, metrics, model = asyncio.run(run_suite(incidents, args.latency, args.concurrency, not args.no_triage,
+                                                      args.cache_min_tokens, args.turns))
+    failed = [result for result in results if not result.ok]
+    latencies = [result.elapsed * 1000 for result in results if result.ok]
+    handoffs = sum(metrics.handoff_totals().values())
+    llm_calls = sum(stats.llm_calls for stats in metrics.by_agent().values())
+    prompt_tokens = sum(stats.prompt_tokens for stats in metrics.by_agent().values())
+    cached_tokens = sum(stats.cached_prompt_tokens for stats in metrics.by_agent().values())
+
+    # Memory is measured in a separate pass since tracing allocations slows every turn down.
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    asyncio.run(run_suite(incidents, 0.0, args.concurrency, not args.no_triage, turns=args.turns))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"incidents: {len(incidents)}   turns: {len(results)}   failed: {len(failed)}")
+    print(f"throughput: {len(results) / elapsed:.1f} turns/s   wall: {elapsed:.2f}s")
+    if latencies:
+        print(f"turn latency: p50 {percentile(latencies, 0.5):.1f} ms   p99 {percentile(latencies, 0.99):.1f} ms   "
+              f"mean {statistics.mean(latencies):.1f} ms")
+    print(f"model calls per incident: {llm_calls / len(incidents):.2f}   handoffs per incident: {handoffs / len(incidents):.2f}")
+    print(f"prompt tokens per incident: {prompt_tokens / len(incidents):.0f}   "
+          f"served from prompt cache: {cached_tokens / prompt_tokens if prompt_tokens else 0.0:.1%}   "
+          f"repeating an earlier prompt's prefix: {model.reused_tokens / prompt_tokens if prompt_tokens else 0.0:.1%}")
+    print(f"memory per incident: peak {(peak - baseline) / len(incidents) / 1024:.1f} KiB")
+    for error in {str(result.error) for result in failed}:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Cold-start cost of the CLI and of building the swarm, eager versus lazy.
+
+Every measurement runs in a fresh interpreter, so import costs are included.
+Run from the repository root (no network needed):
+    python -m benchmarks.startup_benchmark
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+_BUILD = """
+from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.memory import InMemorySaver
+model = ChatOpenAI(model="gpt-4")
+"""
+
+CASES: Dict[str, str] = {
+    "interpreter": "pass",
+    "import main (time to menu)": "import main",
+    "eager: create_agents + compile": _BUILD + """
+from langgraph_swarm import create_swarm
+from agents.agent_definitions import create_agents
+create_swarm(list(create_agents(model).values()), default_active_agent="EmergencyCoordinator").compile(checkpointer=InMemorySaver())
+""",
+    "lazy: LazyAgents + compile": _BUILD + """
+from agents.agent_definitions import LazyAgents
+LazyAgents(model).swarm().compile(checkpointer=InMemorySaver())
+""",
+    "lazy + first two agents": _BUILD + """
+from agents.agent_definitions import LazyAgents
+agents = LazyAgents(model)
+agents.swarm().compile(checkpointer=InMemorySaver())
+agents.prewarm(["EmergencyCoordinator", "MedicalEvacuationSpecialist"])
+""",
+}
+
+
+def wall_times(code: str, runs: int) -> List[float]:
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-startup-benchmark")}
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, env=env)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start time of the CLI and the swarm")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per case")
+    args = parser.parse_args()
+
+    print(f"{'case':<36}{'median (ms)':>14}{'min (ms)':>12}")
+    for name, code in CASES.items():
+        times = wall_times(code, args.runs)
+        print(f"{name:<36}{statistics.median(times) * 1000:>14.0f}{min(times) * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
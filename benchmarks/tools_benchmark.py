@@ -0,0 +1,175 @@
+"""
+Micro-benchmark of the emergency tools against their original implementations.
+
+Run from the repository root:
+    python -m benchmarks.tools_benchmark
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.emergency_tools import (
+    assess_medical_urgency,
+    assess_medical_urgency_batch,
+    check_travel_advisory,
+    check_visa_requirements
+)
+from tools.geo import Facility, FacilityIndex, haversine_km
+
+
+def legacy_assess_medical_urgency(symptoms: str, medical_history: Optional[str] = None) -> Dict[str, Any]:
+    urgent_keywords = ["chest pain", "difficulty breathing", "unconscious", "severe bleeding",
+                       "stroke", "heart attack", "severe allergic", "anaphylaxis"]
+    urgency_level = "ROUTINE"
+    if any(keyword in symptoms.lower() for keyword in urgent_keywords):
+        urgency_level = "CRITICAL"
+    elif "pain" in symptoms.lower() or "fever" in symptoms.lower():
+        urgency_level = "URGENT"
+    return {
+        "urgency_level": urgency_level,
+        "assessment_time": datetime.now().isoformat(),
+        "requires_evacuation": urgency_level == "CRITICAL",
+        "recommendations": f"Based on symptoms, this appears to be a {urgency_level.lower()} situation."
+    }
+
+
+def legacy_check_travel_advisory(country: str) -> Dict[str, Any]:
+    advisories = {
+        "ukraine": {"level": "DO NOT TRAVEL", "risks": ["armed conflict", "civil unrest"]},
+        "haiti": {"level": "DO NOT TRAVEL", "risks": ["kidnapping", "civil unrest"]},
+        "afghanistan": {"level": "DO NOT TRAVEL", "risks": ["terrorism", "kidnapping"]},
+        "japan": {"level": "EXERCISE NORMAL PRECAUTIONS", "risks": []},
+        "italy": {"level": "EXERCISE NORMAL PRECAUTIONS", "risks": []},
+        "egypt": {"level": "EXERCISE INCREASED CAUTION", "risks": ["terrorism"]},
+        "mexico": {"level": "EXERCISE INCREASED CAUTION", "risks": ["crime", "kidnapping"]},
+        "india": {"level": "EXERCISE INCREASED CAUTION", "risks": ["crime", "terrorism"]},
+    }
+    country_lower = country.lower()
+    if country_lower in advisories:
+        return {
+            "country": country,
+            "advisory_level": advisories[country_lower]["level"],
+            "risks": advisories[country_lower]["risks"],
+            "as_of_date": datetime.now().strftime("%Y-%m-%d")
+        }
+    return {
+        "country": country,
+        "advisory_level": "INFORMATION NOT AVAILABLE",
+        "risks": [],
+        "as_of_date": datetime.now().strftime("%Y-%m-%d")
+    }
+
+
+def legacy_check_visa_requirements(citizenship: str, destination: str, purpose: str) -> Dict[str, Any]:
+    if purpose.lower() == "medical":
+        return {
+            "required": True,
+            "emergency_procedure_available": True,
+            "documentation_needed": ["Passport valid for 6 months", "Doctor's letter stating medical necessity",
+                                     "Proof of funds or insurance", "Emergency visa application form"],
+            "processing_time": "24-48 hours for emergency medical cases",
+            "contact": f"{destination.title()} Embassy Emergency Line: +1-555-EMERGENCY"
+        }
+    elif purpose.lower() == "evacuation":
+        return {
+            "required": "Expedited process",
+            "emergency_procedure_available": True,
+            "documentation_needed": ["Any available identification", "Evacuation order if available",
+                                     "Emergency contact in destination country"],
+            "processing_time": "Immediate to 24 hours for evacuation cases",
+            "contact": f"{destination.title()} Emergency Management Office: +1-555-EVAC-NOW"
+        }
+    return {
+        "required": "Standard process applies",
+        "emergency_procedure_available": False,
+        "documentation_needed": ["Passport valid for 6 months", "Visa application",
+                                 "Proof of accommodation and return travel", "Proof of funds"],
+        "processing_time": "5-10 business days",
+        "contact": f"{destination.title()} Embassy: consular@{destination.lower()}.embassy.example.org"
+    }
+
+
+SYMPTOMS = [
+    "The pain is on the left side of his chest, and he's also feeling dizzy. He has a history of high blood pressure.",
+    "Executive reporting chest pain and shortness of breath after a long flight.",
+    "Mild headache and tiredness, no other symptoms reported by the traveler so far.",
+    "High fever since last night and a rash on both arms.",
+]
+
+CASES: List[Tuple[str, Callable[..., Any], Callable[..., Any], Tuple[Any, ...]]] = [
+    ("assess_medical_urgency", legacy_assess_medical_urgency, assess_medical_urgency, tuple(SYMPTOMS)),
+    ("check_travel_advisory", legacy_check_travel_advisory, check_travel_advisory, ("Egypt", "Japan", "Atlantis")),
+    ("check_visa_requirements", legacy_check_visa_requirements, check_visa_requirements,
+     (("US", "Germany", "medical"), ("US", "Poland", "evacuation"), ("US", "Italy", "business"))),
+]
+
+
+def legacy_prioritize(reports: List[str]) -> List[Dict[str, Any]]:
+    rank = {"CRITICAL": 0, "URGENT": 1, "ROUTINE": 2}
+    assessed = [legacy_assess_medical_urgency(report) for report in reports]
+    return sorted(assessed, key=lambda result: rank[result["urgency_level"]])
+
+
+MASS_CASUALTY = [f"Report {i}: {SYMPTOMS[i % len(SYMPTOMS)]}" for i in range(500)]
+
+
+def synthetic_facilities(count: int, seed: int = 7) -> List[Facility]:
+    rng = random.Random(seed)
+    features = ["wheelchair", "family", "medical", "pets"]
+    return [
+        Facility(str(i), f"Facility {i}", "Shelter", rng.uniform(-55, 70), rng.uniform(-180, 180), rng.randint(1, 200),
+                 frozenset(rng.sample(features, rng.randint(0, 2))), "", "")
+        for i in range(count)
+    ]
+
+
+def linear_nearest(facilities: List[Facility], lat: float, lon: float, min_capacity: int, feature: str) -> List[Facility]:
+    distances = [(haversine_km(lat, lon, f.lat, f.lon), f.id, f) for f in facilities
+                 if f.capacity >= min_capacity and feature in f.features]
+    return [f for distance, _, f in sorted(distances)[:5] if distance <= 100]
+
+
+def per_call_us(func: Callable[..., Any], inputs: Tuple[Any, ...], number: int) -> float:
+    calls = [(args if isinstance(args, tuple) else (args,)) for args in inputs]
+
+    def run() -> None:
+        for args in calls:
+            func(*args)
+
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / (number * len(calls)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-call cost of the emergency tools, before and after")
+    parser.add_argument("--number", type=int, default=20000, help="Loops per timing run")
+    parser.add_argument("--facilities", type=int, default=50000,
+                        help="Synthetic facilities indexed for the nearest-facility timing")
+    args = parser.parse_args()
+
+    print(f"{'tool':<26}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, legacy, current, inputs in CASES:
+        before = per_call_us(legacy, inputs, args.number)
+        after = per_call_us(current, inputs, args.number)
+        print(f"{name:<26}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+    number = max(args.number // 1000, 5)
+    before = per_call_us(legacy_prioritize, ((MASS_CASUALTY,),), number) / len(MASS_CASUALTY)
+    after = per_call_us(assess_medical_urgency_batch, ((MASS_CASUALTY,),), number) / len(MASS_CASUALTY)
+    print(f"{'urgency batch (per report)':<26}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+    facilities = synthetic_facilities(args.facilities)
+    index = FacilityIndex(facilities)
+    rng = random.Random(11)
+    queries = tuple((rng.uniform(-55, 70), rng.uniform(-180, 180)) for _ in range(20))
+    before = per_call_us(lambda lat, lon: linear_nearest(facilities, lat, lon, 4, "wheelchair"), queries, 1)
+    after = per_call_us(lambda lat, lon: index.nearest(lat, lon, k=5, min_capacity=4, features=frozenset({"wheelchair"})),
+                        queries, max(args.number // 100, 1))
+    label = f"nearest facility ({args.facilities // 1000}k)"
+    print(f"{label:<26}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
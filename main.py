@@ -1,67 +1,381 @@
-import time
+import argparse
+import asyncio
+import functools
 import os
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import InMemorySaver
-from langgraph_swarm import create_swarm
-from langgraph.store.memory import InMemoryStore
+import sys
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TextIO
 from dotenv import load_dotenv
-from agents.agent_definitions import create_agents
-from utils.formatting import pretty_print_response, print_scenario_menu, print_scenario_header, print_followup_header
-from utils.invocation import invoke_with_retry
+from agents.triage import TriageRouter, incident_priority
+from utils.engine import IncidentEngine, IncidentResult
+from utils.service import IncidentService
+from utils.formatting import (RENDERERS, IncrementalRenderer, PrettyRenderer, StreamPrinter, print_scenario_menu,
+                              print_scenario_header, print_followup_header)
 from scenarios.emergency_scenarios import get_scenarios
+from tools.knowledge_base import default_knowledge_base
 load_dotenv()
 
-def main():
-    model = ChatOpenAI(model="gpt-4", temperature=0.2)    
-    agents = create_agents(model)    
-    checkpointer = InMemorySaver()
-    store = InMemoryStore()    
-    workflow = create_swarm(
-        list(agents.values()),
-        default_active_agent="EmergencyCoordinator"
-    )    
-    app = workflow.compile(checkpointer=checkpointer, store=store)    
-    scenarios = get_scenarios()
-    print_scenario_menu(scenarios)
+if TYPE_CHECKING:
+    from utils.sharding import ShardSetup
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RescueNet - Emergency Travel Response System")
+    parser.add_argument("--all", action="store_true",
+                        help="Run every scenario concurrently instead of the interactive menu")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="Run as a long-lived HTTP service accepting incidents instead of the interactive menu")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print tokens, tool calls and handoffs as they happen (interactive mode)")
+    parser.add_argument("--output", choices=sorted(RENDERERS), default="pretty",
+                        help="Print each turn's new messages as readable text or as compact JSON lines for log shipping")
+    parser.add_argument("--fanout", action="store_true",
+                        help="Let the coordinator consult several specialists in parallel")
+    parser.add_argument("--no-triage", action="store_true",
+                        help="Always start new incidents at the EmergencyCoordinator")
+    parser.add_argument("--no-prefetch", action="store_true",
+                        help="Do not run likely specialist tool calls while the coordinator triages")
+    parser.add_argument("--db", default=os.getenv("RESCUENET_DB"),
+                        help="SQLite file for checkpoints and memory (default: $RESCUENET_DB, in-memory if unset)")
+    parser.add_argument("--incident-ttl", type=float, default=24 * 3600,
+                        help="Seconds a closed incident is kept in the database before eviction")
+    parser.add_argument("--evict-interval", type=float, default=600.0,
+                        help="Seconds between evictions of closed incidents and expired memory (with --serve)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Serve repeated agent requests from an in-process response cache")
+    parser.add_argument("--semantic-cache", type=float, metavar="THRESHOLD",
+                        help="Also serve near-identical requests whose embedding similarity reaches THRESHOLD")
+    parser.add_argument("--cassette", metavar="PATH",
+                        help="Replay model responses recorded in PATH and record new ones (zstd-compressed)")
+    parser.add_argument("--cassette-mode", choices=["replay", "record", "strict"], default="replay",
+                        help="replay: reuse recordings, call the model on a miss; record: always call and re-record; "
+                             "strict: fail on a miss instead of calling the model")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Maximum number of swarm turns in flight at once")
+    parser.add_argument("--max-pending", type=int, default=256,
+                        help="Maximum number of queued turns before new incidents wait")
+    parser.add_argument("--deadline", type=float, default=300.0,
+                        help="Per-turn deadline in seconds")
+    parser.add_argument("--shards", type=int, default=int(os.getenv("RESCUENET_SHARDS", 1)),
+                        help="Worker processes to spread incidents over by thread_id (with --all or --serve)")
+    parser.add_argument("--fast-model", default="gpt-4o-mini",
+                        help="Model for agents marked as the fast tier (escalates to gpt-4 on failed or unsure replies)")
+    parser.add_argument("--single-model", action="store_true",
+                        help="Run every agent on gpt-4 instead of tiering them")
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("RESCUENET_RPM", 500)),
+                        help="Model requests per minute shared by all agents (0 disables rate limiting)")
+    parser.add_argument("--tpm", type=float, default=float(os.getenv("RESCUENET_TPM", 300_000)),
+                        help="Model tokens per minute shared by all agents (0 disables rate limiting)")
+    parser.add_argument("--max-connections", type=int, default=64,
+                        help="Size of the HTTP connection pool shared by all agents")
+    parser.add_argument("--max-hops", type=int, default=6,
+                        help="Maximum agent handoffs per turn before control returns to the coordinator")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write per-agent latency, token and handoff metrics to PATH on exit "
+                             "(Prometheus text if PATH ends in .prom, JSON lines otherwise)")
+    args = parser.parse_args()
+    if args.cassette and (args.cache or args.semantic_cache is not None):
+        parser.error("--cassette cannot be combined with --cache or --semantic-cache")
+    if args.shards > 1 and not (args.all or args.serve):
+        parser.error("--shards needs --all or --serve")
+    if args.shards > 1 and args.cassette:
+        parser.error("--cassette cannot be shared by several --shards")
+    if args.stream and args.output == "jsonl":
+        parser.error("--stream prints text as it arrives and cannot be combined with --output jsonl")
+    return args
+
+
+def console(args: argparse.Namespace) -> TextIO:
+    """Where menus, prompts and diagnostics go: stdout carries only JSON records with --output jsonl."""
+    return sys.stderr if args.output == "jsonl" else sys.stdout
+
+
+def ask(question: str, stream: TextIO) -> str:
+    # input() would write its prompt to stdout.
+    print(question, end="", file=stream, flush=True)
+    return input()
+
+
+def unwrap(result: IncidentResult) -> dict:
+    if result.error is not None:
+        raise result.error
+    return result.response
+
+
+async def run_and_print(engine: IncidentEngine, thread_id: str, content: str, turn_number: int, stream: bool,
+                        renderer: IncrementalRenderer) -> None:
+    if not stream:
+        renderer.render(thread_id, turn_number, unwrap(await engine.run_turn(thread_id, content)))
+        return
+    printer = StreamPrinter(turn_number)
+    try:
+        unwrap(await engine.stream_turn(thread_id, content, printer))
+    finally:
+        printer.close()
+
+
+async def run_all_scenarios(engine: IncidentEngine, scenarios: dict, renderer: IncrementalRenderer) -> None:
+    headers = isinstance(renderer, PrettyRenderer)
+
+    async def run_one(choice: str, selected: dict) -> None:
+        thread_id = f"emergency-{choice}"
+        try:
+            turn_1 = unwrap(await engine.run_turn(thread_id, selected['initial']))
+            turn_2 = unwrap(await engine.run_turn(thread_id, selected['followup']))
+        except Exception as e:
+            renderer.render_error(thread_id, f"Error processing scenario {choice}: {str(e)}")
+            return
+        if headers:
+            print_scenario_header(choice, selected)
+        renderer.render(thread_id, 1, turn_1)
+        if headers:
+            print_followup_header(selected['followup'])
+        renderer.render(thread_id, 2, turn_2)
+
+    await asyncio.gather(*(run_one(choice, selected) for choice, selected in scenarios.items()))
+    renderer.render_stats("Engine", engine.stats())
+
+
+@dataclass
+class Runtime:
+    app: Any
+    checkpointer: Any
+    governor: Any
+    http: Any
+    escalation: Optional[Any]
+    limiter: Optional[Any]
+    cache: Optional[Any] = None
+    metrics: Optional[Any] = None
+    prefetcher: Optional[Any] = None
+    store: Optional[Any] = None
+
+
+def build_app(args: argparse.Namespace) -> Runtime:
+    """Create the model, persistence and lazily built swarm."""
+    # LangChain, LangGraph and above all langchain_openai make up nearly all of the
+    # start-up time, so they are imported here, where main() runs them in the background
+    # while the user picks a scenario.
+    from langchain_openai import OpenAIEmbeddings
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.store.memory import InMemoryStore
+    from agents.agent_definitions import LazyAgents
+    from agents.handoff_governor import HandoffGovernor
+    from utils.cache import ResponseCache
+    from utils.cassette import Cassette
+    from utils.instrumentation import AgentMetrics
+    from utils.models import FAST, EscalatingModel, HttpClientPool, create_chat_model, create_tiered_models
+    from utils.persistence import SqliteCheckpointer, SqliteStore
+    from utils.ratelimit import ProviderRateLimiter
+    from tools.prefetch import SpeculativePrefetcher
+
+    http = HttpClientPool(max_connections=args.max_connections)
+    limiter = ProviderRateLimiter(args.rpm, args.tpm) if args.rpm and args.tpm else None
+    cache = None
+    if args.cassette:
+        cache = Cassette(args.cassette, mode=args.cassette_mode)
+    elif args.cache or args.semantic_cache is not None:
+        embed = None
+        if args.semantic_cache is not None:
+            embed = OpenAIEmbeddings(http_client=http.client, http_async_client=http.async_client).embed_query
+        cache = ResponseCache(embed=embed, similarity_threshold=args.semantic_cache or 0.95)
+    if args.single_model:
+        model = create_chat_model(http, temperature=0.2, cache=cache, rate_limiter=limiter)
+        escalation = None
+    else:
+        model = create_tiered_models(http, fast_model=args.fast_model, temperature=0.2, cache=cache,
+                                     rate_limiter=limiter)
+        escalation = model[FAST].stats if isinstance(model[FAST], EscalatingModel) else None
+    if args.db:
+        checkpointer = SqliteCheckpointer(args.db)
+        store = SqliteStore(args.db)
+        checkpointer.evict_closed(args.incident_ttl)
+        store.sweep_expired()
+    else:
+        checkpointer = InMemorySaver()
+        store = InMemoryStore()
+    governor = HandoffGovernor(max_hops=args.max_hops)
+    prefetcher = None if args.no_prefetch else SpeculativePrefetcher()
+    agents = LazyAgents(model, fanout=args.fanout, governor=governor, prefetcher=prefetcher)
+    app = agents.swarm(default_active_agent="EmergencyCoordinator").compile(checkpointer=checkpointer, store=store)
+    metrics = AgentMetrics() if args.metrics else None
+    return Runtime(app, checkpointer, governor, http, escalation, limiter, cache, metrics, prefetcher, store)
+
+
+async def choose_scenario(scenarios: dict, stream: TextIO) -> str:
+    print_scenario_menu(scenarios, stream)
     while True:
-        choice = input("\nSelect a scenario number (1-6): ")
+        choice = await asyncio.to_thread(ask, "\nSelect a scenario number (1-6): ", stream)
         if choice in scenarios:
-            break
-        print("Invalid choice. Please select a number between 1 and 6.")
-    
-    selected = scenarios[choice]    
-    config = {"configurable": {"thread_id": f"emergency-{choice}"}}    
-    print_scenario_header(choice, selected)
-    
+            return choice
+        print("Invalid choice. Please select a number between 1 and 6.", file=stream)
+
+
+async def run_scenario(engine: IncidentEngine, args: argparse.Namespace, scenarios: dict, choice: str,
+                       checkpointer: Any, renderer: IncrementalRenderer) -> None:
+    headers = isinstance(renderer, PrettyRenderer)
+    selected = scenarios[choice]
+    thread_id = f"emergency-{choice}"
+    if headers:
+        print_scenario_header(choice, selected)
+
     try:
-        turn_1 = invoke_with_retry(
-            app,
-            {"messages": [{"role": "user", "content": selected['initial']}]},
-            config
-        )
-        pretty_print_response(1, turn_1)        
-        print_followup_header(selected['followup'])        
-        turn_2 = invoke_with_retry(
-            app,
-            {"messages": [{"role": "user", "content": selected['followup']}]},
-            config
-        )
-        pretty_print_response(2, turn_2)
-        additional_input = input("\nWould you like to ask a follow-up question? (y/n): ")
+        await run_and_print(engine, thread_id, selected['initial'], 1, args.stream, renderer)
+        if headers:
+            print_followup_header(selected['followup'])
+        await run_and_print(engine, thread_id, selected['followup'], 2, args.stream, renderer)
+        additional_input = await asyncio.to_thread(ask, "\nWould you like to ask a follow-up question? (y/n): ",
+                                                   console(args))
         if additional_input.lower() == 'y':
-            user_followup = input("\nEnter your follow-up question: ")
-            print_followup_header(f"USER: {user_followup}")            
-            turn_3 = invoke_with_retry(
-                app,
-                {"messages": [{"role": "user", "content": user_followup}]},
-                config
-            )
-            pretty_print_response(3, turn_3)
-        
+            user_followup = await asyncio.to_thread(ask, "\nEnter your follow-up question: ", console(args))
+            if headers:
+                print_followup_header(f"USER: {user_followup}")
+            await run_and_print(engine, thread_id, user_followup, 3, args.stream, renderer)
+
     except Exception as e:
-        print(f"Error processing scenario: {str(e)}")
-        print("Try checking your API key, model availability, and network connection.")
+        renderer.render_error(thread_id, f"Error processing scenario {choice}: {str(e)}")
+        print("Try checking your API key, model availability, and network connection.", file=sys.stderr)
+    else:
+        if args.db:
+            checkpointer.close_thread(thread_id)
+
+
+def runtime_stats(runtime: Runtime, router: Optional[TriageRouter]) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """Stats providers for the service's /metrics, keyed by section name."""
+    stats = {"handoffs": runtime.governor.stats, "http": runtime.http.stats}
+    if runtime.escalation is not None:
+        stats["escalation"] = runtime.escalation.snapshot
+    if runtime.limiter is not None:
+        stats["rate_limit"] = runtime.limiter.stats
+    if runtime.prefetcher is not None:
+        stats["prefetch"] = runtime.prefetcher.stats
+    stats["knowledge_base"] = default_knowledge_base().stats
+    if router is not None:
+        stats["triage"] = router.stats
+    if runtime.cache is not None:
+        stats["cache"] = runtime.cache.stats
+    if runtime.metrics is not None:
+        stats["agents"] = lambda: {agent: vars(totals) for agent, totals in runtime.metrics.by_agent().items()}
+    return stats
+
+
+async def serve(engine: Any, args: argparse.Namespace, stats: Dict[str, Callable[[], Dict[str, Any]]],
+                on_close: Optional[Callable[[str], None]], checkpointer: Any = None, store: Any = None) -> None:
+    host, _, port = args.serve.rpartition(":")
+    service = IncidentService(engine, host=host or "127.0.0.1", port=int(port), stats=stats, on_close=on_close,
+                              deadline=args.deadline)
+    if not args.db:
+        await service.serve()
+        return
+    from utils.persistence import evict_expired
+    # A long-running service keeps closing incidents, so they are evicted as it goes
+    # rather than only at the next start-up.
+    eviction = asyncio.create_task(evict_expired(checkpointer, store, args.incident_ttl, args.evict_interval))
+    try:
+        await service.serve()
+    finally:
+        eviction.cancel()
+
+
+def create_engine(args: argparse.Namespace, runtime: Runtime, router: Optional[TriageRouter]) -> IncidentEngine:
+    callbacks = [handler for handler in (runtime.metrics, runtime.limiter) if handler is not None]
+    return IncidentEngine(runtime.app, max_concurrency=args.concurrency, max_pending=args.max_pending,
+                          deadline=args.deadline, router=router, callbacks=callbacks or None,
+                          priority=incident_priority,
+                          prefetch=runtime.prefetcher.prefetch if runtime.prefetcher is not None else None)
 
 
+async def close_runtime(args: argparse.Namespace, runtime: Runtime) -> None:
+    await runtime.http.aclose()
+    if runtime.prefetcher is not None:
+        runtime.prefetcher.shutdown()
+    if args.cassette:
+        runtime.cache.flush()
+    if runtime.metrics is not None:
+        runtime.metrics.export(args.metrics)
+        print(f"Agent metrics written to {args.metrics}", file=console(args))
+
+
+def build_shard(args: argparse.Namespace, shard: int) -> "ShardSetup":
+    """Build one shard's swarm and engine inside its worker process (see utils.sharding)."""
+    from utils.sharding import ShardSetup
+    args = argparse.Namespace(**vars(args))
+    # The provider's budgets are shared by all shards, so each takes its part of them.
+    args.rpm /= args.shards
+    args.tpm /= args.shards
+    if args.metrics:
+        root, extension = os.path.splitext(args.metrics)
+        args.metrics = f"{root}.shard{shard}{extension}"
+    runtime = build_app(args)
+    router = None if args.no_triage else TriageRouter()
+    return ShardSetup(create_engine(args, runtime, router),
+                      on_close=getattr(runtime.checkpointer, "close_thread", None),
+                      cleanup=functools.partial(close_runtime, args, runtime),
+                      stats=runtime_stats(runtime, router))
+
+
+async def run_sharded(args: argparse.Namespace, scenarios: dict) -> None:
+    from utils.sharding import ShardedEngine
+    engine = ShardedEngine(functools.partial(build_shard, args), shards=args.shards,
+                           max_concurrency=args.concurrency, max_pending=args.max_pending)
+    async with engine:
+        if args.serve:
+            loop = asyncio.get_running_loop()
+
+            def close(thread_id: str) -> None:
+                # The engine gives up on the shard after request_timeout; this only guards the handler thread.
+                asyncio.run_coroutine_threadsafe(engine.close_thread(thread_id), loop).result(engine.request_timeout + 5)
+
+            checkpointer = store = None
+            if args.db:
+                from utils.persistence import SqliteCheckpointer, SqliteStore
+                # The shards share the database, so the parent evicts for all of them.
+                checkpointer, store = SqliteCheckpointer(args.db), SqliteStore(args.db)
+            try:
+                await serve(engine, args, {}, close, checkpointer, store)
+            finally:
+                if args.db:
+                    checkpointer.close()
+                    store.close()
+        else:
+            await run_all_scenarios(engine, scenarios, RENDERERS[args.output]())
+
+
+async def main():
+    args = parse_args()
+    scenarios = get_scenarios()
+    if args.shards > 1:
+        await run_sharded(args, scenarios)
+        return
+    building = asyncio.create_task(asyncio.to_thread(build_app, args))
+    choice = None if args.all or args.serve else await choose_scenario(scenarios, console(args))
+    runtime = await building
+    router = None if args.no_triage else TriageRouter()
+    engine = create_engine(args, runtime, router)
+    renderer = RENDERERS[args.output]()
+    try:
+        async with engine:
+            if args.serve:
+                await serve(engine, args, runtime_stats(runtime, router),
+                            getattr(runtime.checkpointer, "close_thread", None), runtime.checkpointer, runtime.store)
+            elif args.all:
+                await run_all_scenarios(engine, scenarios, renderer)
+            else:
+                await run_scenario(engine, args, scenarios, choice, runtime.checkpointer, renderer)
+        if args.all:
+            if router is not None:
+                renderer.render_stats("Triage", router.stats())
+            if runtime.cache is not None:
+                renderer.render_stats("Cache", runtime.cache.stats())
+            renderer.render_stats("Handoff", runtime.governor.stats())
+            renderer.render_stats("HTTP connection", runtime.http.stats())
+            if runtime.escalation is not None:
+                renderer.render_stats("Model escalation", runtime.escalation.snapshot())
+            if runtime.limiter is not None:
+                renderer.render_stats("Rate limiter", runtime.limiter.stats())
+            if runtime.prefetcher is not None:
+                renderer.render_stats("Tool prefetch", runtime.prefetcher.stats())
+    finally:
+        await close_runtime(args, runtime)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Tests for utils.cassette.Cassette
+"""
+import os
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from utils.cassette import Cassette, CassetteMiss
+
+LLM = "model=gpt-4o-mini"
+
+
+def record(cassette: Cassette, prompt: str) -> None:
+    message = AIMessage(content=f"answer to {prompt}",
+                        tool_calls=[{"name": "check_travel_advisory", "args": {"country": "Japan"}, "id": f"call_{prompt}"}])
+    cassette.update(prompt, LLM, [ChatGeneration(message=message)])
+
+
+def replayed(cassette: Cassette, prompt: str) -> str:
+    return cassette.lookup(prompt, LLM)[0].message.content
+
+
+def test_recordings_replay_exactly_after_reopening(tmp_path):
+    path = str(tmp_path / "run.cassette")
+    cassette = Cassette(path, flush_every=1)
+    record(cassette, "first")
+    record(cassette, "second")
+
+    reopened = Cassette(path, mode="strict")
+    generation = reopened.lookup("first", LLM)[0]
+    assert generation.message.content == "answer to first"
+    assert generation.message.tool_calls[0]["id"] == "call_first"
+    assert replayed(reopened, "second") == "answer to second"
+    with pytest.raises(CassetteMiss):
+        reopened.lookup("third", LLM)
+
+
+def test_record_mode_ignores_recordings(tmp_path):
+    cassette = Cassette(str(tmp_path / "run.cassette"), mode="record")
+    record(cassette, "first")
+    assert cassette.lookup("first", LLM) is None
+
+
+def test_truncated_last_frame_is_dropped_and_rewritten(tmp_path, capsys):
+    path = str(tmp_path / "run.cassette")
+    cassette = Cassette(path, flush_every=1)
+    record(cassette, "first")
+    intact = os.path.getsize(path)
+    record(cassette, "second")
+    with open(path, "r+b") as stream:
+        stream.truncate(intact + (os.path.getsize(path) - intact) // 2)
+
+    recovered = Cassette(path, flush_every=1)
+    assert "truncated frame" in capsys.readouterr().err
+    assert replayed(recovered, "first") == "answer to first"
+    assert recovered.lookup("second", LLM) is None
+
+    # The next flush rewrites the file rather than appending after the damaged tail.
+    record(recovered, "third")
+    reopened = Cassette(path, mode="strict")
+    assert capsys.readouterr().err == ""
+    assert [replayed(reopened, prompt) for prompt in ("first", "third")] == ["answer to first", "answer to third"]
+
+
+def test_garbage_after_the_last_frame_is_ignored(tmp_path, capsys):
+    path = str(tmp_path / "run.cassette")
+    cassette = Cassette(path, flush_every=1)
+    record(cassette, "first")
+    with open(path, "ab") as stream:
+        stream.write(b"not a zstandard frame")
+
+    recovered = Cassette(path)
+    assert "damaged" in capsys.readouterr().err
+    assert replayed(recovered, "first") == "answer to first"
+
+
+def test_compact_keeps_the_latest_recording_and_prunes_unused(tmp_path):
+    path = str(tmp_path / "run.cassette")
+    cassette = Cassette(path, flush_every=1)
+    for prompt in ("first", "second"):
+        record(cassette, prompt)
+
+    rerun = Cassette(path, mode="record", flush_every=1)
+    record(rerun, "first")
+    rerun.compact(prune=True)
+
+    compacted = Cassette(path, mode="strict")
+    assert compacted.stats()["entries"] == 1
+    assert replayed(compacted, "first") == "answer to first"
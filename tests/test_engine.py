@@ -0,0 +1,109 @@
+"""
+Tests for utils.engine.IncidentEngine, run against a fake compiled swarm
+"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from utils.engine import IncidentEngine
+
+
+class FakeApp:
+    """Stands in for the compiled swarm: echoes the turn's messages after ``delay`` seconds."""
+
+    def __init__(self, delay: float = 0.0, error: Optional[BaseException] = None, state_errors: int = 0):
+        self.delay = delay
+        self.error = error
+        self.state_errors = state_errors
+        self.running: Dict[str, int] = {}
+        self.max_running: Dict[str, int] = {}
+
+    async def aget_state(self, config: Dict[str, Any]) -> Any:
+        if self.state_errors:
+            self.state_errors -= 1
+            raise RuntimeError("state store unavailable")
+        return SimpleNamespace(values={}, next=(), config=config)
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        thread_id = config["configurable"]["thread_id"]
+        self.running[thread_id] = self.running.get(thread_id, 0) + 1
+        self.max_running[thread_id] = max(self.max_running.get(thread_id, 0), self.running[thread_id])
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return {"messages": inputs["messages"]}
+        finally:
+            self.running[thread_id] -= 1
+
+
+def run(coroutine: Any) -> Any:
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+def test_run_turn_returns_the_response():
+    async def scenario():
+        async with IncidentEngine(FakeApp()) as engine:
+            return await engine.run_turn("t1", "hello"), engine.stats()
+
+    result, stats = run(scenario())
+    assert result.ok
+    assert result.response["messages"][-1]["content"] == "hello"
+    assert stats["completed"] == 1 and stats["running"] == 0
+
+
+def test_turn_past_its_deadline_times_out():
+    async def scenario():
+        async with IncidentEngine(FakeApp(delay=5.0), deadline=0.05) as engine:
+            return await engine.run_turn("t1", "hello"), engine.stats()
+
+    result, stats = run(scenario())
+    assert isinstance(result.error, asyncio.TimeoutError)
+    assert stats["timed_out"] == 1 and stats["running"] == 0
+
+
+def test_fatal_error_is_returned_not_raised():
+    async def scenario():
+        async with IncidentEngine(FakeApp(error=ValueError("bad request"))) as engine:
+            return await engine.run_turn("t1", "hello"), engine.stats()
+
+    result, stats = run(scenario())
+    assert isinstance(result.error, ValueError)
+    assert stats["failed"] == 1 and stats["running"] == 0
+
+
+def test_failure_while_routing_settles_the_turn_and_keeps_the_worker():
+    app = FakeApp(state_errors=1)
+
+    async def scenario():
+        async with IncidentEngine(app, max_concurrency=1, router=lambda content: None) as engine:
+            first = await engine.run_turn("t1", "hello")
+            second = await engine.run_turn("t2", "hello again")
+            return first, second, engine.stats()
+
+    first, second, stats = run(scenario())
+    assert isinstance(first.error, RuntimeError)
+    assert second.ok
+    assert stats["failed"] == 1 and stats["completed"] == 1 and stats["running"] == 0
+
+
+def test_failure_while_ranking_settles_every_turn():
+    async def scenario():
+        async with IncidentEngine(FakeApp(), max_concurrency=2, priority=lambda content: 1 // 0) as engine:
+            return await engine.run_many([("a", "x"), ("b", "y"), ("c", "z")]), engine.stats()
+
+    results, stats = run(scenario())
+    assert all(isinstance(result.error, ZeroDivisionError) for result in results)
+    assert stats["failed"] == 3 and stats["running"] == 0
+
+
+def test_turns_of_one_thread_run_one_at_a_time():
+    app = FakeApp(delay=0.01)
+
+    async def scenario():
+        async with IncidentEngine(app, max_concurrency=4) as engine:
+            return await engine.run_many([("t1", f"message {i}") for i in range(4)] + [("t2", "other")])
+
+    results = run(scenario())
+    assert all(result.ok for result in results)
+    assert app.max_running == {"t1": 1, "t2": 1}
@@ -0,0 +1,96 @@
+"""
+Tests for agents.handoff_governor.HandoffGovernor
+"""
+from typing import Any, List
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.types import Command
+
+from agents.handoff_governor import HandoffGovernor
+from agents.triage import COORDINATOR
+
+SPECIALISTS = ["MedicalEvacuationSpecialist", "LogisticsOperator", "SecurityAnalyst"]
+
+
+def governor(**kwargs: Any) -> HandoffGovernor:
+    governor = HandoffGovernor(**kwargs)
+    governor.register([COORDINATOR] + SPECIALISTS)
+    return governor
+
+
+def transfer(agent: str, status: str = "success") -> ToolMessage:
+    return ToolMessage(content=f"Successfully transferred to {agent}", name=f"transfer_to_{agent.lower()}",
+                       tool_call_id=f"call_{agent}", status=status)
+
+
+def hand_off(governor: HandoffGovernor, agent: str, messages: List[Any]) -> Any:
+    handoff = governor.create_handoff_tool(agent_name=agent)
+    call = {"type": "tool_call", "id": "call_next", "name": handoff.name,
+            "args": {"state": {"messages": messages}}}
+    return handoff.invoke(call, {"configurable": {"thread_id": "t1"}})
+
+
+def test_turn_path_follows_the_transfers_of_the_current_turn_only():
+    messages = [
+        HumanMessage(content="earlier report"),
+        AIMessage(content="", name=COORDINATOR),
+        transfer("SecurityAnalyst"),
+        HumanMessage(content="new report"),
+        AIMessage(content="", name=COORDINATOR),
+        transfer("MedicalEvacuationSpecialist"),
+        AIMessage(content="", name="MedicalEvacuationSpecialist"),
+        transfer("LogisticsOperator"),
+    ]
+    assert governor().turn_path(messages) == [COORDINATOR, "MedicalEvacuationSpecialist", "LogisticsOperator"]
+
+
+def test_turn_path_skips_refused_handoffs_and_other_tools():
+    messages = [
+        HumanMessage(content="report"),
+        AIMessage(content="", name=COORDINATOR),
+        transfer("MedicalEvacuationSpecialist", status="error"),
+        ToolMessage(content="urgent", name="assess_medical_urgency", tool_call_id="call_tool"),
+    ]
+    assert governor().turn_path(messages) == [COORDINATOR]
+    assert governor().turn_path([HumanMessage(content="report")]) == []
+
+
+def test_handoff_transfers_control():
+    messages = [HumanMessage(content="report"), AIMessage(content="", name=COORDINATOR)]
+    result = hand_off(governor(), "MedicalEvacuationSpecialist", messages)
+    assert isinstance(result, Command)
+    assert result.goto == "MedicalEvacuationSpecialist"
+    assert result.update["messages"][-1].name == "transfer_to_medicalevacuationspecialist"
+
+
+def test_revisiting_a_specialist_returns_to_the_coordinator():
+    messages = [
+        HumanMessage(content="report"),
+        AIMessage(content="", name=COORDINATOR),
+        transfer("MedicalEvacuationSpecialist"),
+        AIMessage(content="", name="MedicalEvacuationSpecialist"),
+        transfer("SecurityAnalyst"),
+    ]
+    gov = governor()
+    result = hand_off(gov, "MedicalEvacuationSpecialist", messages)
+    assert result.goto == COORDINATOR
+    assert gov.turn_path(result.update["messages"]) == [COORDINATOR, "MedicalEvacuationSpecialist", "SecurityAnalyst", COORDINATOR]
+    stats = gov.stats()
+    assert stats["blocked_cycle"] == 1 and stats["forced_returns"] == 1
+
+
+def test_coordinator_over_the_hop_limit_is_told_to_answer():
+    messages = [
+        HumanMessage(content="report"),
+        AIMessage(content="", name=COORDINATOR),
+        transfer("SecurityAnalyst"),
+        AIMessage(content="", name="SecurityAnalyst"),
+        transfer(COORDINATOR),
+    ]
+    gov = governor(max_hops=2)
+    result = hand_off(gov, "MedicalEvacuationSpecialist", messages)
+    assert isinstance(result, ToolMessage) and result.status == "error"
+    assert "hop limit" in result.content
+    assert gov.turn_path(messages + [result]) == [COORDINATOR, "SecurityAnalyst", COORDINATOR]
+    assert gov.stats()["blocked_hop_limit"] == 1
+    assert gov.last_path("t1") == [COORDINATOR, "SecurityAnalyst", COORDINATOR]
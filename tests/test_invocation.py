@@ -0,0 +1,113 @@
+"""
+Tests for utils.invocation: error classification, backoff and retries
+"""
+import asyncio
+
+import httpx
+import openai
+import pytest
+from langchain_core.exceptions import OutputParserException
+
+from utils.invocation import (
+    FATAL,
+    INVALID_OUTPUT,
+    RATE_LIMIT,
+    TIMEOUT,
+    TRANSIENT,
+    RetryBudget,
+    RetryPolicy,
+    classify_error,
+    invoke_with_retry,
+)
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(status: int, headers=None) -> openai.APIStatusError:
+    response = httpx.Response(status, headers=headers, request=REQUEST)
+    error_class = openai.RateLimitError if status == 429 else openai.APIStatusError
+    return error_class(f"status {status}", response=response, body=None)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (status_error(429), RATE_LIMIT),
+    (openai.APITimeoutError(request=REQUEST), TIMEOUT),
+    (asyncio.TimeoutError(), TIMEOUT),
+    (openai.APIConnectionError(request=REQUEST), TRANSIENT),
+    (ConnectionResetError(), TRANSIENT),
+    (status_error(503), TRANSIENT),
+    (status_error(409), TRANSIENT),
+    (status_error(400), FATAL),
+    (OutputParserException("not json"), INVALID_OUTPUT),
+    (ValueError("model produced invalid content"), INVALID_OUTPUT),
+    (KeyError("thread_id"), FATAL),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_backoff_grows_with_full_jitter_up_to_the_cap():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    for attempt, ceiling in [(0, 0.5), (2, 2.0), (10, 4.0)]:
+        delays = [policy.delay(attempt, ConnectionError(), TRANSIENT) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2
+
+
+def test_rate_limit_waits_for_retry_after():
+    policy = RetryPolicy(base_delay=0.01, max_delay=30.0)
+    assert policy.delay(0, status_error(429, {"retry-after": "7"}), RATE_LIMIT) >= 7.0
+    assert policy.delay(0, status_error(429, {"retry-after": "120"}), RATE_LIMIT) == 30.0
+    assert policy.delay(0, status_error(429, {"retry-after": "soon"}), RATE_LIMIT) <= 0.01
+
+
+def test_budget_refuses_once_spent():
+    budget = RetryBudget(capacity=2, refill_rate=0.0)
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.exhausted == 1
+
+
+class FlakyApp:
+    """Raises the queued errors in turn, then answers."""
+
+    def __init__(self, *errors: BaseException):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_state(self, config):
+        raise ValueError("No checkpointer set")
+
+    def invoke(self, inputs, config):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"messages": inputs["messages"]}
+
+
+def policy(max_retries: int = 5, capacity: float = 20.0) -> RetryPolicy:
+    return RetryPolicy(max_retries=max_retries, base_delay=0.0, budget=RetryBudget(capacity, refill_rate=0.0))
+
+
+def test_transient_errors_are_retried():
+    app = FlakyApp(ConnectionError(), status_error(503))
+    assert invoke_with_retry(app, {"messages": ["hi"]}, {}, policy=policy()) == {"messages": ["hi"]}
+    assert app.calls == 3
+
+
+def test_fatal_error_is_not_retried():
+    app = FlakyApp(status_error(400))
+    with pytest.raises(openai.APIStatusError):
+        invoke_with_retry(app, {"messages": ["hi"]}, {}, policy=policy())
+    assert app.calls == 1
+
+
+def test_retries_stop_at_max_retries_and_when_the_budget_runs_out():
+    app = FlakyApp(*[ConnectionError()] * 5)
+    with pytest.raises(ConnectionError):
+        invoke_with_retry(app, {"messages": ["hi"]}, {}, policy=policy(max_retries=3))
+    assert app.calls == 3
+
+    app = FlakyApp(*[ConnectionError()] * 5)
+    with pytest.raises(ConnectionError):
+        invoke_with_retry(app, {"messages": ["hi"]}, {}, policy=policy(capacity=1))
+    assert app.calls == 2
@@ -0,0 +1,75 @@
+"""
+Tests for tools.knowledge_base and the visa lookup built on it
+"""
+import os
+
+from tools.emergency_tools import check_visa_requirements
+from tools.knowledge_base import NOT_AVAILABLE, KnowledgeBase, VisaRule, default_knowledge_base
+
+
+def test_visa_rule_by_code_name_and_alias():
+    knowledge_base = default_knowledge_base()
+    assert knowledge_base.visa_rule("US", "DE") == VisaRule("visa_free", 90)
+    assert knowledge_base.visa_rule("American", "germany") == VisaRule("visa_free", 90)
+    assert knowledge_base.visa_rule("United States", "India") == VisaRule("e_visa", 90)
+    assert knowledge_base.visa_rule("India", "U.S.A.") == VisaRule("visa_required", None)
+    assert knowledge_base.visa_rule("US", "Atlantis") is None
+
+
+def write_tables(directory, requirement: str) -> None:
+    with open(os.path.join(directory, "countries.csv"), "w", encoding="utf-8") as stream:
+        stream.write("code,name,aliases,advisory_level,risks\n"
+                     "AA,Aland,alandic,,\n"
+                     "BB,Borduria,,LEVEL 3: RECONSIDER TRAVEL,unrest;curfew\n")
+    with open(os.path.join(directory, "visa_matrix.csv"), "w", encoding="utf-8") as stream:
+        stream.write(f"citizenship,destination,requirement,max_stay_days\nAA,BB,{requirement},30\n")
+
+
+def test_edited_tables_are_picked_up_without_a_restart(tmp_path):
+    write_tables(tmp_path, "visa_free")
+    knowledge_base = KnowledgeBase(str(tmp_path), check_interval=0)
+    assert knowledge_base.visa_rule("Alandic", "Borduria") == VisaRule("visa_free", 30)
+    assert knowledge_base.advisory("borduria") == ("LEVEL 3: RECONSIDER TRAVEL", ("unrest", "curfew"))
+    knowledge_base.memo()["derived"] = True
+
+    write_tables(tmp_path, "visa_required")
+    path = os.path.join(tmp_path, "visa_matrix.csv")
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+    assert knowledge_base.visa_rule("AA", "BB") == VisaRule("visa_required", 30)
+    assert "derived" not in knowledge_base.memo()
+
+
+def test_missing_tables_read_as_empty(tmp_path):
+    knowledge_base = KnowledgeBase(str(tmp_path))
+    assert knowledge_base.country("US") is None
+    assert knowledge_base.advisory("US") == (NOT_AVAILABLE, ())
+
+
+def test_visa_free_entry_needs_no_visa():
+    result = check_visa_requirements("US", "Germany", "medical")
+    assert result["entry_requirement"] == "visa_free"
+    assert result["required"] is False
+    assert result["emergency_procedure_available"] is False
+    assert "90 days" in result["processing_time"]
+
+
+def test_e_visa_entry_adds_the_purpose_documents():
+    result = check_visa_requirements("US", "India", "medical")
+    assert result["entry_requirement"] == "e_visa"
+    assert result["required"] == "Electronic visa before departure"
+    assert "Electronic visa application" in result["documentation_needed"]
+    assert len(result["documentation_needed"]) == len(set(result["documentation_needed"]))
+
+
+def test_visa_required_entry_uses_the_purpose_template():
+    result = check_visa_requirements("India", "Germany", "standard")
+    assert result["entry_requirement"] == "visa_required"
+    assert result["required"] is True
+    assert result["max_stay_days"] is None
+
+
+def test_unknown_pair_falls_back_to_the_purpose_template():
+    result = check_visa_requirements("US", "Atlantis", "medical")
+    assert result["entry_requirement"] == NOT_AVAILABLE
+    assert result["required"] is True
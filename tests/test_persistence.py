@@ -0,0 +1,86 @@
+"""
+Tests for utils.persistence: the SQLite checkpointer and store
+"""
+import operator
+from typing import Annotated, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from utils.persistence import SqliteCheckpointer, SqliteStore
+
+
+class CounterState(TypedDict):
+    count: Annotated[int, operator.add]
+
+
+def counter_graph(checkpointer: SqliteCheckpointer):
+    graph = StateGraph(CounterState)
+    graph.add_node("increment", lambda state: {"count": 1})
+    graph.add_edge(START, "increment")
+    graph.add_edge("increment", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def config(thread_id: str):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_state_survives_reopening_the_database(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    checkpointer = SqliteCheckpointer(path)
+    counter_graph(checkpointer).invoke({"count": 1}, config("t1"))
+    checkpointer.close()
+
+    checkpointer = SqliteCheckpointer(path)
+    app = counter_graph(checkpointer)
+    assert app.get_state(config("t1")).values == {"count": 2}
+    assert app.invoke({"count": 1}, config("t1")) == {"count": 4}
+    assert app.get_state(config("other")).values == {}
+    checkpointer.close()
+
+
+def test_only_the_newest_checkpoints_are_kept():
+    checkpointer = SqliteCheckpointer(":memory:", keep_last=3)
+    app = counter_graph(checkpointer)
+    for _ in range(5):
+        app.invoke({"count": 1}, config("t1"))
+    assert checkpointer.stats()["checkpoints"] == 3
+    assert app.get_state(config("t1")).values == {"count": 10}
+    assert len(list(checkpointer.list(config("t1")))) == 3
+
+
+def test_closed_threads_are_evicted_after_their_ttl():
+    checkpointer = SqliteCheckpointer(":memory:")
+    app = counter_graph(checkpointer)
+    for thread_id in ("open", "closed"):
+        app.invoke({"count": 1}, config(thread_id))
+    checkpointer.close_thread("closed")
+
+    assert checkpointer.evict_closed(ttl=3600) == 0
+    assert checkpointer.stats()["closed_threads"] == 1
+    assert checkpointer.evict_closed(ttl=-1) == 1
+    assert checkpointer.get_tuple(config("closed")) is None
+    assert app.get_state(config("open")).values == {"count": 2}
+    assert checkpointer.stats()["threads"] == 1
+
+
+def test_new_checkpoint_reopens_a_closed_thread():
+    checkpointer = SqliteCheckpointer(":memory:")
+    app = counter_graph(checkpointer)
+    app.invoke({"count": 1}, config("t1"))
+    checkpointer.close_thread("t1")
+    app.invoke({"count": 1}, config("t1"))
+    assert checkpointer.evict_closed(ttl=-1) == 0
+    assert checkpointer.stats()["closed_threads"] == 0
+
+
+def test_store_round_trip_and_expiry():
+    store = SqliteStore(":memory:")
+    store.put(("incidents", "t1"), "summary", {"status": "open"})
+    store.put(("incidents", "t2"), "summary", {"status": "closed"}, ttl=-1)
+
+    assert store.get(("incidents", "t1"), "summary").value == {"status": "open"}
+    assert store.get(("incidents", "t2"), "summary") is None
+    assert [item.key for item in store.search(("incidents",), filter={"status": "open"})] == ["summary"]
+    assert store.sweep_expired() == 1
+    assert store.list_namespaces(prefix=("incidents",)) == [("incidents", "t1")]
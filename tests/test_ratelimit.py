@@ -0,0 +1,97 @@
+"""
+Tests for utils.ratelimit.ProviderRateLimiter
+"""
+import asyncio
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.caches import InMemoryCache
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tools.emergency_tools import URGENCY_RANK
+from utils.ratelimit import ProviderRateLimiter, request_priority
+
+
+class UsageModel(BaseChatModel):
+    """Answers every call with ``total_tokens`` of usage, or raises ``error``."""
+
+    total_tokens: int = 100
+    error: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "usage"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.error:
+            raise RuntimeError(self.error)
+        message = AIMessage(content="ok", usage_metadata={"input_tokens": self.total_tokens - 1, "output_tokens": 1,
+                                                          "total_tokens": self.total_tokens})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def limiter() -> ProviderRateLimiter:
+    # One token per second refill on a large bucket, so refills do not blur the accounting.
+    return ProviderRateLimiter(requests_per_minute=6000, tokens_per_minute=60, burst=100_000, initial_estimate=1500)
+
+
+def test_reservation_is_settled_with_the_reported_usage():
+    rate_limiter = limiter()
+    model = UsageModel(total_tokens=100, rate_limiter=rate_limiter, callbacks=[rate_limiter])
+    model.invoke("hello")
+
+    assert rate_limiter.tokens.capacity - rate_limiter.tokens.level == pytest.approx(100, abs=1)
+    stats = rate_limiter.stats()
+    assert stats["outstanding_reservations"] == 0 and stats["granted"] == 1
+    assert stats["token_estimate"] == 0.8 * 1500 + 0.2 * 100
+
+
+def test_failed_call_keeps_its_reservation_charged():
+    rate_limiter = limiter()
+    model = UsageModel(error="provider unavailable", rate_limiter=rate_limiter, callbacks=[rate_limiter])
+    with pytest.raises(RuntimeError):
+        model.invoke("hello")
+
+    assert rate_limiter.tokens.capacity - rate_limiter.tokens.level == pytest.approx(1500, abs=1)
+    assert rate_limiter.stats()["outstanding_reservations"] == 0
+
+
+def test_cache_hit_takes_no_budget():
+    rate_limiter = limiter()
+    model = UsageModel(cache=InMemoryCache(), rate_limiter=rate_limiter, callbacks=[rate_limiter])
+    model.invoke("hello")
+    level = rate_limiter.tokens.level
+    model.invoke("hello")
+
+    assert rate_limiter.tokens.level == pytest.approx(level, abs=1)
+    stats = rate_limiter.stats()
+    assert stats["granted"] == 1 and stats["outstanding_reservations"] == 0
+
+
+def test_non_blocking_acquire_fails_when_out_of_budget():
+    rate_limiter = ProviderRateLimiter(requests_per_minute=60, burst=1)
+    assert rate_limiter.acquire(blocking=False)
+    assert not rate_limiter.acquire(blocking=False)
+    assert rate_limiter.stats()["waiting"] == 0
+
+
+def test_urgent_calls_are_served_first():
+    # One request of burst, refilled ten times a second.
+    rate_limiter = ProviderRateLimiter(requests_per_minute=600, burst=0.1)
+    served = []
+
+    async def call(name: str, priority: int) -> None:
+        request_priority.set(priority)
+        await rate_limiter.aacquire()
+        served.append(name)
+
+    async def scenario():
+        await rate_limiter.aacquire()
+        await asyncio.gather(call("routine 1", URGENCY_RANK["ROUTINE"]), call("routine 2", URGENCY_RANK["ROUTINE"]),
+                             call("critical", URGENCY_RANK["CRITICAL"]))
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert served == ["critical", "routine 1", "routine 2"]
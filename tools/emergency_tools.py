@@ -1,5 +1,127 @@
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Any, Optional, Union
+
+from tools.knowledge_base import NOT_AVAILABLE, default_knowledge_base
+
+
+URGENT_KEYWORDS = ["chest pain", "difficulty breathing", "unconscious", "severe bleeding",
+                   "stroke", "heart attack", "severe allergic", "anaphylaxis"]
+ELEVATED_KEYWORDS = ["pain", "fever"]
+URGENCY_RANK = {"CRITICAL": 0, "URGENT": 1, "ROUTINE": 2}
+
+# One compiled pass over the symptoms finds critical and elevated keywords alike;
+# critical alternatives come first so they win when both match at the same position.
+URGENCY_PATTERN = re.compile(
+    "|".join([
+        "(?P<critical>" + "|".join(map(re.escape, URGENT_KEYWORDS)) + ")",
+        "(?P<urgent>" + "|".join(map(re.escape, ELEVATED_KEYWORDS)) + ")",
+    ]),
+    re.IGNORECASE
+)
+
+# Accommodation search: special-needs words mapped to facility features, results per
+# request and search radius around the requested location.
+SPECIAL_NEEDS_FEATURES: Dict[str, str] = {
+    "wheelchair": "wheelchair", "mobility": "wheelchair", "accessible": "wheelchair", "accessibility": "wheelchair",
+    "medical": "medical", "oxygen": "medical", "dialysis": "medical", "nursing": "medical",
+    "child": "family", "children": "family", "infant": "family", "baby": "family", "family": "family",
+    "pet": "pets", "pets": "pets", "dog": "pets",
+}
+ACCOMMODATION_RESULTS = 5
+ACCOMMODATION_RADIUS_KM = 100.0
+BOOKING_INSTRUCTIONS = "Contact the preferred option directly or reply with your selection for assistance."
+
+# Emergency visa procedures by purpose of travel; "contact" is formatted with the destination.
+VISA_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "medical": {
+        "required": True,
+        "emergency_procedure_available": True,
+        "documentation_needed": (
+            "Passport valid for 6 months",
+            "Doctor's letter stating medical necessity",
+            "Proof of funds or insurance",
+            "Emergency visa application form"
+        ),
+        "processing_time": "24-48 hours for emergency medical cases",
+        "contact": "{title} Embassy Emergency Line: +1-555-EMERGENCY"
+    },
+    "evacuation": {
+        "required": "Expedited process",
+        "emergency_procedure_available": True,
+        "documentation_needed": (
+            "Any available identification",
+            "Evacuation order if available",
+            "Emergency contact in destination country"
+        ),
+        "processing_time": "Immediate to 24 hours for evacuation cases",
+        "contact": "{title} Emergency Management Office: +1-555-EVAC-NOW"
+    },
+    "standard": {
+        "required": "Standard process applies",
+        "emergency_procedure_available": False,
+        "documentation_needed": (
+            "Passport valid for 6 months",
+            "Visa application",
+            "Proof of accommodation and return travel",
+            "Proof of funds"
+        ),
+        "processing_time": "5-10 business days",
+        "contact": "{title} Embassy: consular@{lower}.embassy.example.org"
+    },
+}
+
+# What each entry requirement of the visa matrix asks of the traveler. When a visa is
+# needed (VISA_REQUIREMENTS) the purpose's template adds its own documents and procedure.
+ENTRY_REQUIREMENTS: Dict[str, Dict[str, Any]] = {
+    "visa_free": {
+        "required": False,
+        "documentation_needed": ("Passport valid for 6 months", "Proof of return or onward travel"),
+        "processing_time": "None, no visa needed",
+    },
+    "electronic_authorization": {
+        "required": "Electronic travel authorization before departure",
+        "documentation_needed": ("Passport valid for 6 months", "Electronic travel authorization"),
+        "processing_time": "Usually within 72 hours",
+    },
+    "visa_on_arrival": {
+        "required": "Visa on arrival",
+        "documentation_needed": ("Passport valid for 6 months", "Visa fee payable on arrival",
+                                 "Proof of return or onward travel"),
+        "processing_time": "Issued at the port of entry",
+    },
+    "e_visa": {
+        "required": "Electronic visa before departure",
+        "documentation_needed": ("Passport valid for 6 months", "Electronic visa application", "Proof of funds"),
+        "processing_time": "3-5 business days",
+    },
+    "visa_required": {
+        "required": True,
+        "documentation_needed": VISA_TEMPLATES["standard"]["documentation_needed"],
+        "processing_time": VISA_TEMPLATES["standard"]["processing_time"],
+    },
+}
+VISA_REQUIREMENTS = ("visa_required", "e_visa")
+
+
+@lru_cache(maxsize=4096)
+def classify_urgency(symptoms: str) -> str:
+    """
+    Classify symptoms as CRITICAL, URGENT or ROUTINE with the precompiled keyword matcher.
+    
+    Args:
+        symptoms: Description of current symptoms
+        
+    Returns:
+        The urgency level
+    """
+    urgency_level = "ROUTINE"
+    for match in URGENCY_PATTERN.finditer(symptoms):
+        if match.lastgroup == "critical":
+            return "CRITICAL"
+        urgency_level = "URGENT"
+    return urgency_level
 
 
 def assess_medical_urgency(symptoms: str, medical_history: Optional[str] = None) -> Dict[str, Any]:
@@ -13,15 +135,7 @@ def assess_medical_urgency(symptoms: str, medical_history: Optional[str] = None)
     Returns:
         A dictionary with urgency assessment results
     """
-    urgent_keywords = ["chest pain", "difficulty breathing", "unconscious", "severe bleeding", 
-                      "stroke", "heart attack", "severe allergic", "anaphylaxis"]
-    
-    urgency_level = "ROUTINE"
-    if any(keyword in symptoms.lower() for keyword in urgent_keywords):
-        urgency_level = "CRITICAL"
-    elif "pain" in symptoms.lower() or "fever" in symptoms.lower():
-        urgency_level = "URGENT"
-        
+    urgency_level = classify_urgency(symptoms)
     return {
         "urgency_level": urgency_level,
         "assessment_time": datetime.now().isoformat(),
@@ -30,6 +144,40 @@ def assess_medical_urgency(symptoms: str, medical_history: Optional[str] = None)
     }
 
 
+def assess_medical_urgency_batch(records: Iterable[Union[str, Dict[str, str]]]) -> Dict[str, Any]:
+    """
+    Assess many symptom reports at once and return them as a prioritized queue.
+    
+    Args:
+        records: Symptom reports, either plain strings or dictionaries with "symptoms"
+            and optionally "medical_history" and "id" keys; any iterable is accepted
+        
+    Returns:
+        A dictionary with the reports sorted from most to least urgent and a count per urgency level
+    """
+    assessed = []
+    counts = dict.fromkeys(URGENCY_RANK, 0)
+    for index, record in enumerate(records):
+        if isinstance(record, str):
+            record = {"symptoms": record}
+        urgency_level = classify_urgency(record.get("symptoms", ""))
+        counts[urgency_level] += 1
+        assessed.append({
+            "id": record.get("id", index),
+            "symptoms": record.get("symptoms", ""),
+            "medical_history": record.get("medical_history"),
+            "urgency_level": urgency_level,
+            "requires_evacuation": urgency_level == "CRITICAL",
+        })
+    assessed.sort(key=lambda report: URGENCY_RANK[report["urgency_level"]])
+    return {
+        "assessment_time": datetime.now().isoformat(),
+        "total_reports": len(assessed),
+        "counts": counts,
+        "prioritized_reports": assessed
+    }
+
+
 def check_travel_advisory(country: str) -> Dict[str, Any]:
     """
     Check current travel advisories for a specific country.
@@ -40,34 +188,55 @@ def check_travel_advisory(country: str) -> Dict[str, Any]:
     Returns:
         Dictionary with advisory information
     """
-    advisories = {
-        "ukraine": {"level": "DO NOT TRAVEL", "risks": ["armed conflict", "civil unrest"]},
-        "haiti": {"level": "DO NOT TRAVEL", "risks": ["kidnapping", "civil unrest"]},
-        "afghanistan": {"level": "DO NOT TRAVEL", "risks": ["terrorism", "kidnapping"]},
-        "japan": {"level": "EXERCISE NORMAL PRECAUTIONS", "risks": []},
-        "italy": {"level": "EXERCISE NORMAL PRECAUTIONS", "risks": []},
-        "egypt": {"level": "EXERCISE INCREASED CAUTION", "risks": ["terrorism"]},
-        "mexico": {"level": "EXERCISE INCREASED CAUTION", "risks": ["crime", "kidnapping"]},
-        "india": {"level": "EXERCISE INCREASED CAUTION", "risks": ["crime", "terrorism"]},
+    level, risks = default_knowledge_base().advisory(country)
+    return {
+        "country": country,
+        "advisory_level": level,
+        "risks": list(risks),
+        "as_of_date": date.today().isoformat()
     }
-    
-    country_lower = country.lower()
-    if country_lower in advisories:
-        result = {
-            "country": country,
-            "advisory_level": advisories[country_lower]["level"],
-            "risks": advisories[country_lower]["risks"],
-            "as_of_date": datetime.now().strftime("%Y-%m-%d")
-        }
-        
-    else:
-        result = {
-            "country": country,
-            "advisory_level": "INFORMATION NOT AVAILABLE",
-            "risks": [],
-            "as_of_date": datetime.now().strftime("%Y-%m-%d")
+
+
+def _required_features(special_needs: Optional[str]) -> frozenset:
+    words = re.findall(r"[a-z]+", (special_needs or "").lower())
+    return frozenset(SPECIAL_NEEDS_FEATURES[word] for word in words if word in SPECIAL_NEEDS_FEATURES)
+
+
+def _accommodation(location: str, num_people: int, special_needs: Optional[str],
+                   available: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    knowledge_base = default_knowledge_base()
+    point = knowledge_base.locate(location)
+    result: Dict[str, Any] = {"location": location, "num_people": num_people, "available_options": []}
+    if point is None:
+        result["notes"] = f"No facility data for {location}; contact local emergency services or the nearest embassy."
+        return result
+    index = knowledge_base.facilities()
+    features = _required_features(special_needs)
+    matches = index.nearest(*point, k=ACCOMMODATION_RESULTS, min_capacity=num_people, features=features,
+                            max_km=ACCOMMODATION_RADIUS_KM, available=available)
+    if not matches:
+        # Nothing takes the whole group: offer the nearest places with any room so it can split up.
+        matches = index.nearest(*point, k=ACCOMMODATION_RESULTS, min_capacity=1, features=features,
+                                max_km=ACCOMMODATION_RADIUS_KM, available=available)
+        if matches:
+            result["notes"] = f"No single facility nearby can take {num_people} people; the group will need to split."
+    result["available_options"] = [
+        {
+            "id": facility.id,
+            "name": facility.name,
+            "type": facility.type,
+            "distance_km": round(distance, 1),
+            "beds_available": facility.capacity if available is None else available.get(facility.id, facility.capacity),
+            "features": sorted(facility.features),
+            "address": facility.address,
+            "contact": facility.contact,
         }
-    
+        for distance, facility in matches
+    ]
+    if not matches:
+        result["notes"] = f"No facility with free capacity within {ACCOMMODATION_RADIUS_KM:g} km of {location}."
+    elif special_needs and not features:
+        result["notes"] = f"Confirm that the facility can accommodate: {special_needs}."
     return result
 
 
@@ -81,42 +250,85 @@ def find_emergency_accommodation(location: str, num_people: int, special_needs:
         special_needs: Any special requirements or accessibility needs
         
     Returns:
-        Dictionary with accommodation options
+        Dictionary with accommodation options, nearest first, that have room for the whole group and meet its needs
     """
-    options = [
-        {
-            "name": f"Emergency Shelter in {location}",
-            "type": "Shelter",
-            "capacity": "Large groups",
-            "address": f"Main Emergency Center, {location}",
-            "contact": "emergency@example.org"
-        },
-        {
-            "name": f"Hotel Rapid Response in {location}",
-            "type": "Hotel",
-            "capacity": f"Can accommodate {num_people} people",
-            "address": f"123 Safety St, {location}",
-            "contact": "reservations@hotelrapidresponse.example.com"
-        }
-    ]
+    result = _accommodation(location, num_people, special_needs)
+    result["booking_instructions"] = BOOKING_INSTRUCTIONS
+    return result
+
+
+def find_emergency_accommodation_batch(groups: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Find emergency accommodation for several groups at once, e.g. a team split across locations.
     
-    if special_needs:
-        options.append({
-            "name": f"Accessible Haven in {location}",
-            "type": "Specialized Facility",
-            "capacity": "Limited but available",
-            "address": f"456 Care Avenue, {location}",
-            "notes": f"Equipped for {special_needs}",
-            "contact": "access@haven.example.org"
-        })
+    Args:
+        groups: One dictionary per group with "location", "num_people" and optionally
+            "special_needs" and "id" keys
         
+    Returns:
+        A dictionary with the options for each group, in the order given; beds are shared out
+        so no two groups are sent to the same last free places
+    """
+    available: Dict[str, int] = {}
+    results: List[Optional[Dict[str, Any]]] = [None] * len(groups)
+    # Larger groups are hardest to place, so they choose first.
+    for index in sorted(range(len(groups)), key=lambda i: -int(groups[i].get("num_people", 1))):
+        group = groups[index]
+        num_people = int(group.get("num_people", 1))
+        result = _accommodation(group["location"], num_people, group.get("special_needs"), available)
+        result["id"] = group.get("id", index)
+        options = result["available_options"]
+        if options and options[0]["beds_available"] >= num_people:
+            # Hold the recommended option's beds for this group.
+            available[options[0]["id"]] = options[0]["beds_available"] - num_people
+            result["recommended"] = options[0]["id"]
+        results[index] = result
     return {
-        "location": location,
-        "available_options": options,
-        "booking_instructions": "Contact the preferred option directly or reply with your selection for assistance."
+        "total_groups": len(groups),
+        "total_people": sum(int(group.get("num_people", 1)) for group in groups),
+        "groups": results,
+        "booking_instructions": BOOKING_INSTRUCTIONS
     }
 
 
+@lru_cache(maxsize=1024)
+def _visa_template(purpose_key: str, destination: str) -> Dict[str, Any]:
+    template = VISA_TEMPLATES.get(purpose_key.strip(), VISA_TEMPLATES["standard"])
+    return {**template, "contact": template["contact"].format(title=destination.title(), lower=destination.lower())}
+
+
+def _visa_requirements(citizenship: str, destination: str, purpose_key: str) -> Dict[str, Any]:
+    knowledge_base = default_knowledge_base()
+    country = knowledge_base.country(destination)
+    template = _visa_template(purpose_key, country.name if country is not None else destination)
+    result = dict(template)
+    rule = knowledge_base.visa_rule(citizenship, country) if country is not None else None
+    result["entry_requirement"] = rule.requirement if rule is not None else NOT_AVAILABLE
+    result["max_stay_days"] = rule.max_stay_days if rule is not None else None
+    entry = ENTRY_REQUIREMENTS.get(rule.requirement) if rule is not None else None
+    if entry is None:
+        # Without a matrix entry only the purpose's emergency procedure is known.
+        return result
+    result.update(entry)
+    if rule.requirement == "visa_required":
+        # The purpose's template describes the visa itself, e.g. an emergency medical visa.
+        result["documentation_needed"] = template["documentation_needed"]
+        result["processing_time"] = template["processing_time"]
+    elif rule.requirement in VISA_REQUIREMENTS:
+        standard = VISA_TEMPLATES["standard"]["documentation_needed"]
+        result["documentation_needed"] += tuple(
+            document for document in template["documentation_needed"]
+            if document not in standard and document not in entry["documentation_needed"]
+        )
+        if template["emergency_procedure_available"]:
+            result["processing_time"] = template["processing_time"]
+    else:
+        result["emergency_procedure_available"] = False
+        if rule.max_stay_days:
+            result["processing_time"] = f"{entry['processing_time']} for stays of up to {rule.max_stay_days} days"
+    return result
+
+
 def check_visa_requirements(citizenship: str, destination: str, purpose: str) -> Dict[str, Any]:
     """
     Check emergency visa requirements and procedures.
@@ -129,41 +341,12 @@ def check_visa_requirements(citizenship: str, destination: str, purpose: str) ->
     Returns:
         Dictionary with visa requirement information
     """
-    if purpose.lower() == "medical":
-        return {
-            "required": True,
-            "emergency_procedure_available": True,
-            "documentation_needed": [
-                "Passport valid for 6 months",
-                "Doctor's letter stating medical necessity",
-                "Proof of funds or insurance",
-                "Emergency visa application form"
-            ],
-            "processing_time": "24-48 hours for emergency medical cases",
-            "contact": f"{destination.title()} Embassy Emergency Line: +1-555-EMERGENCY"
-        }
-    elif purpose.lower() == "evacuation":
-        return {
-            "required": "Expedited process",
-            "emergency_procedure_available": True,
-            "documentation_needed": [
-                "Any available identification",
-                "Evacuation order if available",
-                "Emergency contact in destination country"
-            ],
-            "processing_time": "Immediate to 24 hours for evacuation cases",
-            "contact": f"{destination.title()} Emergency Management Office: +1-555-EVAC-NOW"
-        }
-    else:
-        return {
-            "required": "Standard process applies",
-            "emergency_procedure_available": False,
-            "documentation_needed": [
-                "Passport valid for 6 months",
-                "Visa application",
-                "Proof of accommodation and return travel",
-                "Proof of funds"
-            ],
-            "processing_time": "5-10 business days",
-            "contact": f"{destination.title()} Embassy: consular@{destination.lower()}.embassy.example.org"
-        } 
\ No newline at end of file
+    # Resolving both countries and the matrix entry is memoized per knowledge-base version.
+    memo = default_knowledge_base().memo()
+    key = ("visa", citizenship, destination, purpose)
+    result = memo.get(key)
+    if result is None:
+        result = memo[key] = _visa_requirements(citizenship, destination, purpose.strip().lower())
+    result = result.copy()
+    result["documentation_needed"] = list(result["documentation_needed"])
+    return result
@@ -0,0 +1,126 @@
+"""
+Grid index for nearest-facility queries over emergency accommodation
+"""
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class Facility(NamedTuple):
+    id: str
+    name: str
+    type: str
+    lat: float
+    lon: float
+    capacity: int
+    features: FrozenSet[str]
+    address: str
+    contact: str
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class FacilityIndex:
+    """
+    Facilities bucketed into a latitude/longitude grid for nearest-neighbour search.
+
+    A query scans rings of cells outward from the query's cell, keeping the ``k``
+    nearest facilities that pass the capacity and feature filters, and stops once the
+    next ring cannot hold anything nearer (or lies beyond ``max_km``). With cells about
+    the size of a city, a query touches a handful of buckets however many facilities
+    the index holds.
+
+    Args:
+        facilities: The facilities to index
+        cell_degrees: Grid cell size in degrees of latitude and longitude
+    """
+
+    def __init__(self, facilities: Sequence[Facility], cell_degrees: float = 0.25):
+        self.facilities = list(facilities)
+        self.cell_degrees = cell_degrees
+        self._columns = math.ceil(360 / cell_degrees)
+        self._cells: Dict[Tuple[int, int], List[Facility]] = defaultdict(list)
+        for facility in self.facilities:
+            self._cells[self._cell(facility.lat, facility.lon)].append(facility)
+        self._cells = dict(self._cells)
+
+    def __len__(self) -> int:
+        return len(self.facilities)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor((lon + 180) / self.cell_degrees) % self._columns
+
+    def _ring(self, row: int, column: int, radius: int) -> List[Tuple[int, int]]:
+        if radius == 0:
+            return [(row, column)]
+        cells = []
+        for offset in range(-radius, radius + 1):
+            cells.append((row - radius, column + offset))
+            cells.append((row + radius, column + offset))
+        for offset in range(-radius + 1, radius):
+            cells.append((row + offset, column - radius))
+            cells.append((row + offset, column + radius))
+        # Wrap around the antimeridian; narrow grids would otherwise revisit cells.
+        return list(dict.fromkeys((r, c % self._columns) for r, c in cells))
+
+    def _ring_min_km(self, lat: float, radius: int) -> float:
+        """Lower bound on the distance from a query to anything in ring ``radius``."""
+        if radius <= 1:
+            return 0.0
+        span = (radius - 1) * self.cell_degrees
+        # A ring cell is at least ``span`` away in latitude or in longitude, and degrees of
+        # longitude are shortest at the highest latitude the ring reaches.
+        return span * KM_PER_DEGREE * math.cos(math.radians(min(89.9, abs(lat) + radius * self.cell_degrees)))
+
+    def nearest(self, lat: float, lon: float, k: int = 5, min_capacity: int = 0,
+                features: FrozenSet[str] = frozenset(), max_km: float = 100.0,
+                available: Optional[Mapping[str, int]] = None) -> List[Tuple[float, Facility]]:
+        """
+        The ``k`` nearest facilities that fit the request, nearest first.
+
+        Args:
+            lat: Query latitude
+            lon: Query longitude
+            k: Maximum number of results
+            min_capacity: Only facilities with at least this many places free
+            features: Only facilities offering all of these (e.g. {"wheelchair"})
+            max_km: Search radius
+            available: Places still free per facility id, overriding the indexed
+                capacity (for sharing beds out across several requests)
+
+        Returns:
+            (distance in km, facility) pairs
+        """
+        row, column = self._cell(lat, lon)
+        best: List[Tuple[float, int, Facility]] = []
+        seen = 0
+        max_rings = min(int(max_km / (KM_PER_DEGREE * self.cell_degrees * max(math.cos(math.radians(abs(lat))), 0.01))) + 2,
+                        self._columns)
+        for radius in range(max_rings + 1):
+            bound = self._ring_min_km(lat, radius)
+            if bound > max_km or (len(best) == k and bound > -best[0][0]):
+                break
+            for cell in self._ring(row, column, radius):
+                for facility in self._cells.get(cell, ()):
+                    free = facility.capacity if available is None else available.get(facility.id, facility.capacity)
+                    if free < min_capacity or not features <= facility.features:
+                        continue
+                    distance = haversine_km(lat, lon, facility.lat, facility.lon)
+                    if distance > max_km:
+                        continue
+                    seen += 1
+                    entry = (-distance, seen, facility)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, entry)
+        return [(-distance, facility) for distance, _, facility in sorted(best, reverse=True)]
@@ -0,0 +1,326 @@
+"""
+Travel advisory, visa and accommodation knowledge base loaded from the CSV files in data/
+"""
+import csv
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Hashable, List, NamedTuple, Optional, Pattern, Tuple, TypeVar, Union
+
+from tools.geo import Facility, FacilityIndex
+
+DEFAULT_DATA_DIR = os.getenv("RESCUENET_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+COUNTRIES_FILE = "countries.csv"
+VISA_MATRIX_FILE = "visa_matrix.csv"
+PLACES_FILE = "places.csv"
+FACILITIES_FILE = "facilities.csv"
+NOT_AVAILABLE = "INFORMATION NOT AVAILABLE"
+MEMO_ENTRIES = 4096
+
+T = TypeVar("T")
+
+
+class Country(NamedTuple):
+    code: str
+    name: str
+    advisory_level: str
+    risks: Tuple[str, ...]
+
+
+class VisaRule(NamedTuple):
+    requirement: str
+    max_stay_days: Optional[int]
+
+
+class _Countries(NamedTuple):
+    by_key: Dict[str, Country]
+    pattern: Pattern
+
+
+def _key(text: str) -> str:
+    return " ".join(text.lower().replace(".", "").split())
+
+
+def _parse_countries(path: Optional[str]) -> _Countries:
+    by_key: Dict[str, Country] = {}
+    names = []
+    if path is not None:
+        with open(path, newline="", encoding="utf-8") as stream:
+            for row in csv.DictReader(stream):
+                country = Country(
+                    code=row["code"].upper(),
+                    name=row["name"],
+                    advisory_level=row["advisory_level"] or NOT_AVAILABLE,
+                    risks=tuple(risk for risk in row["risks"].split(";") if risk),
+                )
+                for key in [country.code, country.name] + row["aliases"].split(";"):
+                    if key:
+                        by_key.setdefault(_key(key), country)
+                # Exact spellings too, so the common lookups skip normalization.
+                by_key.setdefault(country.code, country)
+                by_key.setdefault(country.name, country)
+                names.append(country.name)
+    # Names only, matched as capitalised in the data file: aliases such as "us" and
+    # names such as "Turkey" or "Chad" are ordinary words in lower case.
+    names.sort(key=len, reverse=True)
+    pattern = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b" if names else r"(?!)")
+    return _Countries(by_key, pattern)
+
+
+def _parse_visa_matrix(path: Optional[str]) -> Dict[Tuple[str, str], VisaRule]:
+    rules: Dict[Tuple[str, str], VisaRule] = {}
+    if path is None:
+        return rules
+    # Tens of thousands of pairs share a handful of distinct rules and a few hundred
+    # country codes, so each is stored once.
+    shared: Dict[Tuple[str, str], VisaRule] = {}
+    with open(path, newline="", encoding="utf-8") as stream:
+        reader = csv.reader(stream)
+        columns = {name: index for index, name in enumerate(next(reader, []))}
+        home, away = columns["citizenship"], columns["destination"]
+        requirement, max_stay = columns["requirement"], columns["max_stay_days"]
+        for row in reader:
+            rule = shared.get((row[requirement], row[max_stay]))
+            if rule is None:
+                stay = row[max_stay]
+                rule = shared[row[requirement], stay] = VisaRule(sys.intern(row[requirement]), int(stay) if stay else None)
+            rules[sys.intern(row[home].upper()), sys.intern(row[away].upper())] = rule
+    return rules
+
+
+class _Places(NamedTuple):
+    by_key: Dict[str, Tuple[float, float]]
+    by_country: Dict[str, Tuple[float, float]]
+
+
+def _parse_places(path: Optional[str]) -> _Places:
+    by_key: Dict[str, Tuple[float, float]] = {}
+    by_country: Dict[str, Tuple[float, float]] = {}
+    if path is None:
+        return _Places(by_key, by_country)
+    with open(path, newline="", encoding="utf-8") as stream:
+        for row in csv.DictReader(stream):
+            point = (float(row["lat"]), float(row["lon"]))
+            for key in [row["name"]] + row["aliases"].split(";"):
+                if key:
+                    by_key.setdefault(_key(key), point)
+            # The first place listed for a country (its capital) stands in for the country.
+            by_country.setdefault(row["country"].upper(), point)
+    return _Places(by_key, by_country)
+
+
+def _parse_facilities(path: Optional[str]) -> FacilityIndex:
+    facilities: List[Facility] = []
+    if path is not None:
+        with open(path, newline="", encoding="utf-8") as stream:
+            for row in csv.DictReader(stream):
+                facilities.append(Facility(
+                    id=row["id"],
+                    name=row["name"],
+                    type=sys.intern(row["type"]),
+                    lat=float(row["lat"]),
+                    lon=float(row["lon"]),
+                    capacity=int(row["capacity"]),
+                    features=frozenset(feature for feature in row["features"].split(";") if feature),
+                    address=row["address"],
+                    contact=row["contact"],
+                ))
+    return FacilityIndex(facilities)
+
+
+def _modified(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class _Table(Generic[T]):
+    """One data file, parsed on first use and parsed again once it changes on disk."""
+
+    def __init__(self, path: str, parse: Callable[[Optional[str]], T], check_interval: float):
+        self.path = path
+        self.parse = parse
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._value: Optional[T] = None
+        self._modified: Optional[int] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        now = time.monotonic()
+        if self._value is None or now - self._checked >= self.check_interval:
+            with self._lock:
+                if self._value is None or now - self._checked >= self.check_interval:
+                    self._refresh(now, force=False)
+        return self._value
+
+    def _refresh(self, now: float, force: bool) -> None:
+        self._checked = now
+        modified = _modified(self.path)
+        if force or self._value is None or modified != self._modified:
+            if self._value is not None:
+                self.reloads += 1
+            # Parsed in full before the swap, so concurrent readers see the old or the new table.
+            self._value = self.parse(self.path if modified is not None else None)
+            self._modified = modified
+
+    def reload(self) -> None:
+        with self._lock:
+            self._refresh(time.monotonic(), force=True)
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+
+class KnowledgeBase:
+    """
+    Country advisories, a citizenship-by-destination visa matrix, place coordinates and
+    emergency accommodation facilities, read from CSV files.
+
+    Nothing is read at construction: each file is parsed into dictionaries on its first
+    lookup, so start-up never pays for the visa matrix and a process that only checks
+    advisories never loads it. Countries are indexed by ISO code, name and every alias
+    (including demonyms such as "American"), visa rules by (citizenship, destination)
+    code pair and places by name, so every lookup is a dictionary access; facilities go
+    into a tools.geo.FacilityIndex for nearest-facility queries.
+
+    At most every ``check_interval`` seconds a lookup compares the file's modification
+    time with the loaded copy and re-parses it if it changed, so edited data goes live
+    in a running swarm without a restart. A missing file reads as empty. Results that
+    callers derive from several lookups can be kept in ``memo()``, which is emptied
+    whenever a file is re-read.
+
+    Args:
+        data_dir: Directory holding countries.csv, visa_matrix.csv, places.csv and facilities.csv
+        check_interval: Seconds between checks for changed files (0 checks on every lookup)
+    """
+
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR, check_interval: float = 5.0):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self._memo: Dict[Hashable, Any] = {}
+        self._memo_version = 0
+        self._memo_check_at = 0.0
+        self._countries = _Table(os.path.join(data_dir, COUNTRIES_FILE), _parse_countries, check_interval)
+        self._visas = _Table(os.path.join(data_dir, VISA_MATRIX_FILE), _parse_visa_matrix, check_interval)
+        self._places = _Table(os.path.join(data_dir, PLACES_FILE), _parse_places, check_interval)
+        self._facilities = _Table(os.path.join(data_dir, FACILITIES_FILE), _parse_facilities, check_interval)
+        self._tables = (self._countries, self._visas, self._places, self._facilities)
+
+    def country(self, name: str) -> Optional[Country]:
+        """Resolve a country from its name, ISO code or an alias ("USA", "British", "Burma")."""
+        by_key = self._countries.get().by_key
+        country = by_key.get(name)
+        return country if country is not None else by_key.get(_key(name))
+
+    def country_pattern(self) -> Pattern:
+        """Regex matching country names in free text; group 1 is the name as written."""
+        return self._countries.get().pattern
+
+    def advisory(self, name: str) -> Tuple[str, Tuple[str, ...]]:
+        """Advisory level and risks for a country, or INFORMATION NOT AVAILABLE if unknown."""
+        country = self.country(name)
+        return (country.advisory_level, country.risks) if country is not None else (NOT_AVAILABLE, ())
+
+    def visa_rule(self, citizenship: Union[str, Country], destination: Union[str, Country]) -> Optional[VisaRule]:
+        """Entry requirement for citizens of one country travelling to another, if known."""
+        home = citizenship if isinstance(citizenship, Country) else self.country(citizenship)
+        away = destination if isinstance(destination, Country) else self.country(destination)
+        if home is None or away is None:
+            return None
+        return self._visas.get().get((home.code, away.code))
+
+    def locate(self, location: str) -> Optional[Tuple[float, float]]:
+        """
+        Coordinates for a place name, a "City, Country" string, a country or a "lat,lon" pair.
+
+        Each comma-separated part, then every run of up to three words, is tried as a
+        place name, so "Cairo, Egypt" and "eastern Bangkok" resolve to the city; failing
+        that, a country named anywhere resolves to its first listed place.
+        """
+        places = self._places.get()
+        parts = [part.strip() for part in location.split(",")]
+        if len(parts) == 2:
+            try:
+                lat, lon = float(parts[0]), float(parts[1])
+            except ValueError:
+                pass
+            else:
+                if -90 <= lat <= 90 and -180 <= lon <= 180:
+                    return lat, lon
+        words = re.findall(r"[\w'.-]+", location)
+        phrases = [location] + parts + [" ".join(words[start:start + size]) for size in (3, 2, 1)
+                                        for start in range(len(words) - size + 1)]
+        for phrase in phrases:
+            point = places.by_key.get(_key(phrase))
+            if point is not None:
+                return point
+        for phrase in phrases:
+            country = self.country(phrase)
+            if country is not None and country.code in places.by_country:
+                return places.by_country[country.code]
+        return None
+
+    def facilities(self) -> FacilityIndex:
+        """Spatial index over the accommodation facilities."""
+        return self._facilities.get()
+
+    def memo(self) -> Dict[Hashable, Any]:
+        """
+        A dictionary for caching results derived from the data, valid for the current version.
+
+        Files are checked for changes at most every ``check_interval`` seconds, as by the
+        lookups themselves, and the memo starts empty again after any file is re-read
+        (or once it has grown past MEMO_ENTRIES results).
+        """
+        if time.monotonic() >= self._memo_check_at:
+            self._check_memo()
+        return self._memo
+
+    def _check_memo(self) -> None:
+        self._memo_check_at = time.monotonic() + self.check_interval
+        for table in self._tables:
+            if table.loaded:
+                table.get()
+        if self.version != self._memo_version or len(self._memo) > MEMO_ENTRIES:
+            self._memo_version = self.version
+            self._memo = {}
+
+    @property
+    def version(self) -> int:
+        """Changes whenever a loaded file is re-read, for callers caching derived results."""
+        return sum(table.reloads for table in self._tables)
+
+    def reload(self) -> None:
+        """Re-read every file now instead of waiting for the next change check."""
+        for table in self._tables:
+            table.reload()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "data_dir": self.data_dir,
+            "countries": len({country.code for country in self._countries.get().by_key.values()})
+            if self._countries.loaded else None,
+            "visa_rules": len(self._visas.get()) if self._visas.loaded else None,
+            "facilities": len(self._facilities.get()) if self._facilities.loaded else None,
+            "reloads": self.version,
+        }
+
+
+_default: Optional[KnowledgeBase] = None
+_default_lock = threading.Lock()
+
+
+def default_knowledge_base() -> KnowledgeBase:
+    """The process-wide knowledge base over DEFAULT_DATA_DIR ($RESCUENET_DATA_DIR or data/)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = KnowledgeBase()
+    return _default
@@ -0,0 +1,258 @@
+import functools
+import inspect
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.emergency_tools import (
+    check_travel_advisory,
+    check_visa_requirements,
+    classify_urgency,
+    find_emergency_accommodation
+)
+from tools.knowledge_base import default_knowledge_base
+
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                "nine": 9, "ten": 10}
+
+# A nationality is the word or two before "citizen"; they are resolved through the
+# knowledge base, which knows codes ("US"), names and demonyms ("American").
+_CITIZENSHIP_RE = re.compile(r"\b([\w.]+(?:\s+[\w.]+)?)\s+(?:citizens?|passport holders?|nationals?)\b", re.IGNORECASE)
+_DESTINATION_RE = re.compile(r"\b(?:to|into|reach|enter|entering)\s+(?:the\s+)?$", re.IGNORECASE)
+_PLACE_RE = re.compile(r"\b(?:in|at|near|to)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)")
+_NUMBER = r"(\d{1,3}|" + "|".join(NUMBER_WORDS) + r")"
+_PARTY_RE = re.compile(r"\b(?:family|team|group|party)\s+of\s+" + _NUMBER + r"\b", re.IGNORECASE)
+_PEOPLE_RE = re.compile(r"\b" + _NUMBER + r"\s+(?:people|persons|travell?ers|adults|guests)\b", re.IGNORECASE)
+_LODGING_RE = re.compile(r"\b(?:stay|accommodation|lodging|shelter|hotel|evacuated|displaced)\b", re.IGNORECASE)
+_EVACUATION_RE = re.compile(r"\b(?:evacuat\w*|earthquake|flood\w*|hurricane|wildfire|tsunami|border closures?|"
+                            r"stranded)\b", re.IGNORECASE)
+_SPECIAL_NEEDS_RE = re.compile(r"\b(wheelchair|mobility|oxygen|dialysis|infant|pregnan\w*)\b", re.IGNORECASE)
+
+
+def _canonical(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    country = default_knowledge_base().country(value)
+    return country.code if country is not None else " ".join(value.lower().split())
+
+
+def _citizenship(text: str) -> Optional[str]:
+    match = _CITIZENSHIP_RE.search(text)
+    if match is None:
+        return None
+    knowledge_base = default_knowledge_base()
+    words = match.group(1)
+    country = knowledge_base.country(words) or knowledge_base.country(words.split()[-1])
+    return country.name if country is not None else None
+
+
+def _count(text: str) -> int:
+    return int(text) if text.isdigit() else NUMBER_WORDS[text.lower()]
+
+
+@dataclass
+class IncidentEntities:
+    countries: List[str] = field(default_factory=list)
+    destination: Optional[str] = None
+    place: Optional[str] = None
+    citizenship: Optional[str] = None
+    num_people: Optional[int] = None
+    purpose: str = "standard"
+    needs_lodging: bool = False
+    special_needs: Optional[str] = None
+
+    def merged(self, earlier: "IncidentEntities") -> "IncidentEntities":
+        """These entities with the gaps filled from an earlier message of the same incident."""
+        return IncidentEntities(
+            countries=self.countries + [country for country in earlier.countries if country not in self.countries],
+            destination=self.destination or earlier.destination,
+            place=self.place or earlier.place,
+            citizenship=self.citizenship or earlier.citizenship,
+            num_people=self.num_people or earlier.num_people,
+            purpose=self.purpose if self.purpose != "standard" else earlier.purpose,
+            needs_lodging=self.needs_lodging or earlier.needs_lodging,
+            special_needs=self.special_needs or earlier.special_needs,
+        )
+
+
+def extract_entities(text: str) -> IncidentEntities:
+    """
+    Pull the facts specialists' tools take as arguments out of a user message, without the LLM.
+
+    Args:
+        text: The user's message
+
+    Returns:
+        The countries mentioned (in order) and the one being traveled to, the most
+        specific place name, the traveler's citizenship, party size, travel purpose for
+        visa rules and lodging needs
+    """
+    knowledge_base = default_knowledge_base()
+    citizenship = _citizenship(text)
+    countries: List[str] = []
+    destination = None
+    for match in knowledge_base.country_pattern().finditer(text):
+        found = knowledge_base.country(match.group(1))
+        if found is None or found.name == citizenship:
+            continue
+        country = found.name
+        if country not in countries:
+            countries.append(country)
+        if destination is None and _DESTINATION_RE.search(text, 0, match.start()):
+            destination = country
+
+    places = [place for place in _PLACE_RE.findall(text) if knowledge_base.country(place) is None]
+    party = _PARTY_RE.search(text) or _PEOPLE_RE.search(text)
+    special = _SPECIAL_NEEDS_RE.search(text)
+    if classify_urgency(text) != "ROUTINE":
+        purpose = "medical"
+    elif _EVACUATION_RE.search(text):
+        purpose = "evacuation"
+    else:
+        purpose = "standard"
+    return IncidentEntities(
+        countries=countries,
+        destination=destination,
+        place=places[0] if places else None,
+        citizenship=citizenship,
+        num_people=_count(party.group(1)) if party else None,
+        purpose=purpose,
+        needs_lodging=bool(_LODGING_RE.search(text)),
+        special_needs=special.group(1).lower() if special else None,
+    )
+
+
+def plan_calls(entities: IncidentEntities) -> List[Tuple[str, Dict[str, Any]]]:
+    """The tool calls a specialist is likely to make for these entities, as (tool name, arguments)."""
+    calls: List[Tuple[str, Dict[str, Any]]] = [
+        ("check_travel_advisory", {"country": country}) for country in entities.countries[:3]
+    ]
+    destination = entities.destination or next(
+        (country for country in entities.countries if country != entities.citizenship), None)
+    if destination and entities.citizenship and destination != entities.citizenship:
+        calls.append(("check_visa_requirements", {"citizenship": entities.citizenship,
+                                                  "destination": destination,
+                                                  "purpose": entities.purpose}))
+    location = entities.place or (entities.countries[0] if entities.countries else None)
+    if entities.needs_lodging and location:
+        args: Dict[str, Any] = {"location": location, "num_people": entities.num_people or 1}
+        if entities.special_needs:
+            args["special_needs"] = entities.special_needs
+        calls.append(("find_emergency_accommodation", args))
+    return calls
+
+
+def _key(name: str, args: Dict[str, Any]) -> Tuple[Any, ...]:
+    # The knowledge base version keeps results from before a data reload from being served.
+    return (name, default_knowledge_base().version) + tuple(sorted((arg, _canonical(value)) for arg, value in args.items() if value is not None))
+
+
+class SpeculativePrefetcher:
+    """
+    Run the tool calls specialists are likely to need while the coordinator is still thinking.
+
+    ``prefetch`` extracts entities from a user message and starts the planned tool calls
+    on a thread pool, without waiting for them; IncidentEngine calls it as each turn
+    starts, so the calls overlap the coordinator's LLM call. Given a thread id, entities
+    from the incident's earlier messages fill in what a follow-up leaves out. Agents get the tools through
+    ``wrap``: a call whose arguments match a prefetched one (after normalizing case and
+    country spellings) takes that result, waiting for it if it is still running, and any
+    other call runs the tool as usual. Results expire after ``ttl`` seconds.
+
+    Args:
+        tools: Tools that may be prefetched, keyed by name
+        max_workers: Threads running prefetched calls
+        ttl: Seconds a prefetched result may be served
+        max_entries: Prefetched results (and incidents' entities) kept before the oldest are dropped
+    """
+
+    def __init__(self, tools: Optional[Dict[str, Callable[..., Any]]] = None, max_workers: int = 4,
+                 ttl: float = 300.0, max_entries: int = 1024):
+        self.tools = tools or {tool.__name__: tool for tool in
+                               (check_travel_advisory, check_visa_requirements, find_emergency_accommodation)}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._results: "OrderedDict[Tuple[Any, ...], Tuple[float, Future]]" = OrderedDict()
+        self._threads: "OrderedDict[str, IncidentEntities]" = OrderedDict()
+        self._wrapped: Dict[str, Callable[..., Any]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"prefetched": 0, "hits": 0, "misses": 0}
+
+    def _entities(self, text: str, thread_id: Optional[str]) -> IncidentEntities:
+        entities = extract_entities(text)
+        if thread_id is None:
+            return entities
+        with self._lock:
+            earlier = self._threads.pop(thread_id, None)
+            if earlier is not None:
+                entities = entities.merged(earlier)
+            self._threads[thread_id] = entities
+            while len(self._threads) > self.max_entries:
+                self._threads.popitem(last=False)
+        return entities
+
+    def prefetch(self, text: str, thread_id: Optional[str] = None) -> int:
+        """Start the likely tool calls for a message; returns how many were started."""
+        started = 0
+        now = time.monotonic()
+        for name, args in plan_calls(self._entities(text, thread_id)):
+            if name not in self.tools:
+                continue
+            key = _key(name, args)
+            with self._lock:
+                cached = self._results.get(key)
+                if cached is not None and now - cached[0] <= self.ttl:
+                    continue
+                self._results[key] = (now, self._executor.submit(self.tools[name], **args))
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+                self._counters["prefetched"] += 1
+            started += 1
+        return started
+
+    def _take(self, key: Tuple[Any, ...]) -> Optional[Future]:
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is None or time.monotonic() - cached[0] > self.ttl:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return cached[1]
+
+    def wrap(self, tool: Callable[..., Any]) -> Callable[..., Any]:
+        """Return ``tool`` reading prefetched results, with its name, signature and docstring."""
+        name = getattr(tool, "__name__", None)
+        if name not in self.tools:
+            return tool
+        if name not in self._wrapped:
+            signature = inspect.signature(tool)
+
+            @functools.wraps(tool)
+            def prefetched(*args: Any, **kwargs: Any) -> Any:
+                bound = signature.bind(*args, **kwargs)
+                future = self._take(_key(name, bound.arguments))
+                if future is not None:
+                    try:
+                        return future.result()
+                    except Exception:
+                        pass
+                return tool(*args, **kwargs)
+
+            self._wrapped[name] = prefetched
+        return self._wrapped[name]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {**self._counters, "cached": len(self._results),
+                    "hit_rate": self._counters["hits"] / lookups if lookups else 0.0}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,216 @@
+"""
+Response cache for the chat model shared by the swarm agents
+"""
+import copy
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+
+# Message fields that change between otherwise identical requests (run ids, provider ids, usage).
+_VOLATILE_FIELDS = {"id", "tool_call_id", "response_metadata", "usage_metadata", "additional_kwargs"}
+# Message fields listing tool calls, whose provider-assigned "id" is volatile too; the
+# arguments are kept whole, ids included, since they are part of the request.
+_TOOL_CALL_FIELDS = {"tool_calls", "invalid_tool_calls"}
+# Embeddings computed by a missed lookup, kept for the update that follows it.
+_PENDING_EMBEDDINGS = 256
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?)?")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_text(text: str, fold: bool = True) -> str:
+    text = _TIMESTAMP_RE.sub("<time>", text)
+    return _WHITESPACE_RE.sub(" ", text).strip().lower() if fold else text
+
+
+def _normalize_message(node: Dict[str, Any], fold: bool) -> Dict[str, Any]:
+    message = {"type": node["id"][-1]}
+    for k, v in node["kwargs"].items():
+        if k in _VOLATILE_FIELDS:
+            continue
+        if k in _TOOL_CALL_FIELDS and isinstance(v, list):
+            v = [{f: x for f, x in call.items() if f != "id"} if isinstance(call, dict) else call for call in v]
+        message[k] = _normalize(v, fold)
+    return message
+
+
+def _normalize(node: Any, fold: bool = True) -> Any:
+    if isinstance(node, dict):
+        if node.get("lc") == 1 and isinstance(node.get("kwargs"), dict):
+            return _normalize_message(node, fold)
+        return {k: _normalize(v, fold) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_normalize(item, fold) for item in node]
+    if isinstance(node, str):
+        return _normalize_text(node, fold)
+    return node
+
+
+def normalize_prompt(prompt: str, fold_text: bool = True) -> List[Dict[str, Any]]:
+    """
+    Normalize a serialized message list as passed to BaseCache.lookup.
+
+    Message, tool call and run ids, provider metadata and timestamps are removed and
+    text is lower-cased with whitespace collapsed, so that the same conversation
+    (system prompt, user text and tool results) always produces the same key. With
+    ``fold_text=False`` text is kept as is apart from the timestamps.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return [{"type": "text", "content": _normalize_text(prompt, fold_text)}]
+    return _normalize(messages if isinstance(messages, list) else [messages], fold_text)
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class _Entry:
+    generations: RETURN_VAL_TYPE
+    created: float
+    partition: str
+    shape: Tuple[str, ...]
+    embedding: Optional[Sequence[float]] = None
+
+
+class ResponseCache(BaseCache):
+    """
+    In-process LRU/TTL cache of model responses, pluggable as ``ChatOpenAI(cache=...)``.
+
+    Lookups first try an exact match on the normalized prompt (which already covers
+    the agent's system prompt, the conversation and tool results) plus the model
+    parameters and bound tools. When ``embed`` is given, a miss falls back to the most
+    similar cached conversation of the same agent and message shape, provided its
+    cosine similarity reaches ``similarity_threshold``.
+
+    Args:
+        max_entries: Maximum number of cached responses before the least recently used is evicted
+        ttl: Seconds a response stays valid (None for no expiry)
+        embed: Optional function returning an embedding for a piece of text
+        similarity_threshold: Minimum cosine similarity for a semantic hit
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: Optional[float] = 3600.0,
+                 embed: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pending: "OrderedDict[str, Sequence[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    def _keys(self, prompt: str, llm_string: str) -> Tuple[str, str, Tuple[str, ...], str]:
+        messages = normalize_prompt(prompt)
+        system = [m for m in messages if m.get("type") == "SystemMessage"]
+        conversation = [m for m in messages if m.get("type") != "SystemMessage"]
+        key = _digest([llm_string, messages])
+        partition = _digest([llm_string, system])
+        shape = tuple(m.get("type", "") for m in conversation)
+        text = "\n".join(str(m.get("content", "")) for m in conversation)
+        return key, partition, shape, text
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl is not None and now - entry.created > self.ttl
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key, partition, shape, text = self._keys(prompt, llm_string)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return _fresh_copy(entry.generations)
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if e.embedding is not None and e.partition == partition and e.shape == shape and not self._expired(e, now)
+            ] if self.embed is not None else []
+
+        if candidates:
+            embedding = self.embed(text)
+            best_key, best_entry = max(candidates, key=lambda item: _cosine(embedding, item[1].embedding))
+            if _cosine(embedding, best_entry.embedding) >= self.similarity_threshold:
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self._counters["semantic_hits"] += 1
+                return _fresh_copy(best_entry.generations)
+            with self._lock:
+                # The model is called next and its reply stored under this key; keep the
+                # embedding so update() does not request it a second time.
+                self._pending[key] = embedding
+                while len(self._pending) > _PENDING_EMBEDDINGS:
+                    self._pending.popitem(last=False)
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key, partition, shape, text = self._keys(prompt, llm_string)
+        generations = copy.deepcopy(return_val)
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None:
+                message.id = None
+        with self._lock:
+            embedding = self._pending.pop(key, None)
+        if embedding is None and self.embed is not None:
+            embedding = self.embed(text)
+        with self._lock:
+            self._entries[key] = _Entry(generations, time.monotonic(), partition, shape, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["semantic_hits"]
+            return {**self._counters, "entries": len(self._entries),
+                    "hit_rate": hits / lookups if lookups else 0.0}
+
+
+def _fresh_copy(generations: RETURN_VAL_TYPE) -> RETURN_VAL_TYPE:
+    """Copy cached generations and give replayed tool calls new ids."""
+    generations = copy.deepcopy(generations)
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        if message is None or not getattr(message, "tool_calls", None):
+            continue
+        renamed = {}
+        for call in message.tool_calls:
+            new_id = f"call_{uuid.uuid4().hex[:24]}"
+            renamed[call["id"]] = new_id
+            call["id"] = new_id
+        for raw in message.additional_kwargs.get("tool_calls", []):
+            raw["id"] = renamed.get(raw.get("id"), raw.get("id"))
+    return generations
@@ -0,0 +1,209 @@
+"""
+Record/replay cassette of model responses, stored as zstandard-compressed JSON lines
+"""
+import hashlib
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+import zstandard
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+from utils.cache import normalize_prompt
+
+RECORD = "record"
+REPLAY = "replay"
+STRICT = "strict"
+MODES = (REPLAY, RECORD, STRICT)
+
+
+class CassetteMiss(LookupError):
+    """Raised in strict mode when a model call has no recorded response."""
+
+
+def cassette_key(prompt: str, llm_string: str) -> str:
+    """
+    Content hash of one model request.
+
+    The key covers the model parameters and bound tool schemas (``llm_string``) and the
+    conversation with ids and timestamps removed, so a rerun of the same scenario maps
+    to the same keys while any change to an agent's prompt, tools or inputs does not.
+    """
+    payload = orjson.dumps([llm_string, normalize_prompt(prompt, fold_text=False)], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _read_records(path: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Read the records of a cassette file, up to the last complete one.
+
+    A process that dies while flushing leaves a truncated last frame; what follows the
+    last complete record is dropped with a warning instead of failing start-up.
+
+    Returns:
+        The records, and whether the file was read to its end intact
+    """
+    records: List[Dict[str, Any]] = []
+    decompressor = zstandard.ZstdDecompressor()
+    frame = decompressor.decompressobj()
+    started = False
+    buffer = b""
+    try:
+        with open(path, "rb") as stream:
+            while True:
+                data = stream.read(1 << 20)
+                if not data:
+                    break
+                while data:
+                    started = True
+                    *lines, buffer = (buffer + frame.decompress(data)).split(b"\n")
+                    records.extend(orjson.loads(line) for line in lines if line)
+                    data = b""
+                    if frame.eof:
+                        # Each flush writes one frame; the next one starts in the unused data.
+                        data, frame, started = frame.unused_data, decompressor.decompressobj(), False
+    except (zstandard.ZstdError, orjson.JSONDecodeError) as e:
+        print(f"Cassette {path} is damaged after {len(records)} records ({e}); ignoring the rest", file=sys.stderr)
+        return records, False
+    if started or buffer:
+        print(f"Cassette {path} ends in a truncated frame after {len(records)} records; ignoring it",
+              file=sys.stderr)
+        return records, False
+    return records, True
+
+
+def _record_generation(generation: Any) -> Optional[Dict[str, Any]]:
+    message = getattr(generation, "message", None)
+    if message is None:
+        return None
+    message = message.model_copy(update={"id": None})
+    return {"message": message_to_dict(message), "info": generation.generation_info}
+
+
+def _generation(record: Dict[str, Any]) -> ChatGeneration:
+    return ChatGeneration(message=messages_from_dict([record["message"]])[0], generation_info=record["info"])
+
+
+class Cassette(BaseCache):
+    """
+    Model cache, pluggable as ``ChatOpenAI(cache=...)``, that records responses to disk and replays them.
+
+    In ``replay`` mode (the default) recorded responses are returned exactly as they
+    were recorded, tool call ids included, so a scenario replays deterministically;
+    requests that changed (say, after editing one agent's prompt) go to the provider
+    and are recorded. ``record`` sends every request to the provider and re-records
+    it, and ``strict`` raises CassetteMiss instead of calling the provider, which suits
+    offline regression runs.
+
+    The file is a sequence of zstandard frames of JSON lines; each ``flush`` appends one
+    frame with the responses recorded since the last, and ``compact`` rewrites the file
+    as a single frame. A file whose last frame was cut short (say, by a crash during a
+    flush) is read up to its last complete record and rewritten on the next flush.
+
+    Args:
+        path: Cassette file (created on first flush)
+        mode: One of "replay", "record" or "strict"
+        flush_every: Append to the file after this many new recordings
+        level: zstandard compression level
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, flush_every: int = 50, level: int = 10):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.flush_every = flush_every
+        self.level = level
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._used: set = set()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "recorded": 0}
+        # Appending after a damaged tail would hide the new frames from the next read.
+        self._damaged = False
+        if os.path.exists(path):
+            records, intact = _read_records(path)
+            for record in records:
+                self._records[record["key"]] = record
+            self._damaged = not intact
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if self.mode == RECORD:
+            return None
+        key = cassette_key(prompt, llm_string)
+        with self._lock:
+            record = self._records.get(key)
+            self._counters["hits" if record is not None else "misses"] += 1
+            if record is not None:
+                self._used.add(key)
+        if record is not None:
+            return [_generation(generation) for generation in record["generations"]]
+        if self.mode == STRICT:
+            raise CassetteMiss(f"No recorded response for request {key[:12]} in {self.path}")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        generations = [_record_generation(generation) for generation in return_val]
+        if not all(generations):
+            return
+        record = {"key": cassette_key(prompt, llm_string), "generations": generations}
+        with self._lock:
+            self._records[record["key"]] = record
+            self._used.add(record["key"])
+            self._pending.append(record)
+            self._counters["recorded"] += 1
+            flush = len(self._pending) >= self.flush_every
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the responses recorded since the last flush as one compressed frame."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            if self._damaged:
+                self._rewrite()
+                return
+            frame = zstandard.ZstdCompressor(level=self.level).compress(b"".join(
+                orjson.dumps(record) + b"\n" for record in pending
+            ))
+            with open(self.path, "ab") as stream:
+                stream.write(frame)
+
+    def compact(self, prune: bool = False) -> None:
+        """
+        Rewrite the cassette as one frame, keeping only the latest recording per request.
+
+        Args:
+            prune: Also drop recordings no request used during this run
+        """
+        with self._lock:
+            self._pending = []
+            if prune:
+                self._records = {key: record for key, record in self._records.items() if key in self._used}
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        payload = b"".join(orjson.dumps(record) + b"\n" for record in self._records.values())
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as stream:
+            stream.write(zstandard.ZstdCompressor(level=self.level).compress(payload))
+        os.replace(temporary, self.path)
+        self._damaged = False
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._records.clear()
+            self._pending = []
+            self._used.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {**self._counters, "mode": self.mode, "entries": len(self._records),
+                    "hit_rate": self._counters["hits"] / lookups if lookups else 0.0}
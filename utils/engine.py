@@ -0,0 +1,237 @@
+"""
+Asynchronous incident engine for the Emergency Travel Response System
+"""
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.invocation import ainvoke_with_retry, astream_with_retry
+
+
+@dataclass
+class IncidentResult:
+    thread_id: str
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class IncidentEngine:
+    """
+    Run swarm turns for many incidents concurrently on a single event loop.
+
+    Turns are placed on a bounded queue and consumed by a fixed number of workers,
+    so at most ``max_concurrency`` turns are in flight and ``submit`` waits once
+    ``max_pending`` turns are queued (backpressure). Turns that share a thread_id are
+    serialized so a follow-up always runs against the previous turn's checkpoint.
+
+    Args:
+        app: The compiled swarm
+        max_concurrency: Maximum number of turns running at once
+        max_pending: Maximum number of queued turns before submit blocks
+        deadline: Default per-turn deadline in seconds (None for no deadline)
+        max_retries: Attempts per turn passed to ainvoke_with_retry
+        router: Optional pre-router called with the first message of a new thread; it returns
+            the agent to start with, or None to start with the swarm's default agent
+        callbacks: Optional callback handlers (e.g. utils.instrumentation.AgentMetrics) added to every turn
+        priority: Optional function ranking a message (lower is more urgent, e.g.
+            agents.triage.incident_priority); a thread keeps the most urgent rank any
+            of its messages had, and its model calls carry it as ``request_priority``
+        prefetch: Optional function called with each message and its thread_id as the turn
+            starts, before any model call (e.g. tools.prefetch.SpeculativePrefetcher.prefetch);
+            it must not block
+    """
+
+    def __init__(self, app: Any, max_concurrency: int = 16, max_pending: int = 256,
+                 deadline: Optional[float] = 120.0, max_retries: int = 5,
+                 router: Optional[Callable[[str], Optional[str]]] = None,
+                 callbacks: Optional[List[Any]] = None, priority: Optional[Callable[[str], int]] = None,
+                 max_tracked_threads: int = 4096, prefetch: Optional[Callable[[str, str], Any]] = None):
+        self.app = app
+        self.router = router
+        self.callbacks = callbacks
+        self.priority = priority
+        self.prefetch = prefetch
+        self.max_tracked_threads = max_tracked_threads
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._thread_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._thread_priorities: "OrderedDict[str, int]" = OrderedDict()
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "timed_out": 0, "running": 0, "busy": 0}
+        self._busy_seconds = 0.0
+        self._busy_since: Dict[asyncio.Task, float] = {}
+        self._started_at: Optional[float] = None
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._started_at = time.monotonic()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def stop(self) -> None:
+        """Wait for queued turns to finish, then shut the workers down."""
+        if not self._workers:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def __aenter__(self) -> "IncidentEngine":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    async def submit(self, thread_id: str, content: str, deadline: Optional[float] = None,
+                     on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> "asyncio.Future[IncidentResult]":
+        """
+        Queue a user message for a thread, waiting if the queue is full.
+
+        If ``on_event`` is given the turn is streamed and every event from
+        utils.streaming.astream_events is passed to it as it happens.
+
+        Returns:
+            A future resolving to the IncidentResult of the turn
+        """
+        if not self._workers:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        inputs = {"messages": [{"role": "user", "content": content}]}
+        await self._queue.put((thread_id, inputs, self.deadline if deadline is None else deadline, on_event, future))
+        self._counters["submitted"] += 1
+        return future
+
+    async def run_turn(self, thread_id: str, content: str, deadline: Optional[float] = None) -> IncidentResult:
+        return await (await self.submit(thread_id, content, deadline))
+
+    async def stream_turn(self, thread_id: str, content: str, on_event: Callable[[Dict[str, Any]], None],
+                          deadline: Optional[float] = None) -> IncidentResult:
+        return await (await self.submit(thread_id, content, deadline, on_event))
+
+    async def run_many(self, incidents: Iterable[Tuple[str, str]], deadline: Optional[float] = None) -> List[IncidentResult]:
+        """Submit (thread_id, content) pairs and gather their results in order."""
+        futures = [await self.submit(thread_id, content, deadline) for thread_id, content in incidents]
+        return list(await asyncio.gather(*futures))
+
+    async def thread_state(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """The thread's current state values (messages, active_agent), or None if it has none."""
+        state = await self.app.aget_state({"configurable": {"thread_id": thread_id}})
+        return state.values if state is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Turn counters plus queue depth and worker utilization.
+
+        ``busy`` workers hold a turn (possibly waiting for an earlier turn on the same
+        thread); ``utilization`` is the busy share right now and ``avg_utilization``
+        the busy share of worker time since start.
+        """
+        uptime = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        busy_seconds = self._busy_seconds + sum(time.monotonic() - started for started in self._busy_since.values())
+        return {
+            **self._counters,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_pending": self.max_pending,
+            "workers": self.max_concurrency,
+            "utilization": self._counters["busy"] / self.max_concurrency,
+            "avg_utilization": busy_seconds / (uptime * self.max_concurrency) if uptime else 0.0,
+        }
+
+    def _thread_lock(self, thread_id: str) -> asyncio.Lock:
+        lock = self._thread_locks.get(thread_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._thread_locks[thread_id] = lock
+        return lock
+
+    def _priority(self, thread_id: str, content: str) -> int:
+        rank = self.priority(content)
+        previous = self._thread_priorities.pop(thread_id, rank)
+        self._thread_priorities[thread_id] = rank = min(rank, previous)
+        while len(self._thread_priorities) > self.max_tracked_threads:
+            self._thread_priorities.popitem(last=False)
+        return rank
+
+    async def _route(self, inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        state = await self.app.aget_state(config)
+        if state.values.get("messages"):
+            return inputs
+        agent = self.router(inputs["messages"][-1]["content"])
+        return inputs if agent is None else {**inputs, "active_agent": agent}
+
+    async def _worker(self) -> None:
+        worker = asyncio.current_task()
+        while True:
+            thread_id, inputs, deadline, on_event, future = await self._queue.get()
+            self._counters["busy"] += 1
+            self._busy_since[worker] = time.monotonic()
+            try:
+                try:
+                    result = await self._run(thread_id, inputs, deadline, on_event)
+                except Exception as e:
+                    # _run settles the turn's own failures; this catches anything else so
+                    # the worker survives and the caller always gets a result.
+                    self._counters["failed"] += 1
+                    result = IncidentResult(thread_id, error=e)
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                if not future.done():
+                    # The worker was cancelled (engine stopped) while the turn was running.
+                    future.cancel()
+                self._busy_seconds += time.monotonic() - self._busy_since.pop(worker)
+                self._counters["busy"] -= 1
+                self._queue.task_done()
+
+    async def _run(self, thread_id: str, inputs: Dict[str, Any], deadline: Optional[float],
+                   on_event: Optional[Callable[[Dict[str, Any]], None]]) -> IncidentResult:
+        config = {"configurable": {"thread_id": thread_id}}
+        if self.callbacks:
+            config["callbacks"] = self.callbacks
+        lock = self._thread_lock(thread_id)
+        start = time.perf_counter()
+        async with lock:
+            self._counters["running"] += 1
+            # Everything from ranking the message to the swarm call can fail; all of it
+            # is settled as this turn's result.
+            try:
+                if self.priority is not None:
+                    # Imported here to keep langchain_core off the start-up path. Tasks and
+                    # executor threads started by the turn copy this context.
+                    from utils.ratelimit import request_priority
+                    request_priority.set(self._priority(thread_id, inputs["messages"][-1]["content"]))
+                if self.prefetch is not None:
+                    self.prefetch(inputs["messages"][-1]["content"], thread_id)
+                if self.router is not None:
+                    inputs = await self._route(inputs, config)
+                if on_event is None:
+                    turn = ainvoke_with_retry(self.app, inputs, config, self.max_retries)
+                else:
+                    turn = astream_with_retry(self.app, inputs, config, on_event, self.max_retries)
+                response = await asyncio.wait_for(turn, timeout=deadline)
+            except asyncio.TimeoutError:
+                self._counters["timed_out"] += 1
+                error = asyncio.TimeoutError(f"Turn for {thread_id} exceeded its {deadline}s deadline")
+                return IncidentResult(thread_id, error=error, elapsed=time.perf_counter() - start)
+            except Exception as e:
+                self._counters["failed"] += 1
+                return IncidentResult(thread_id, error=e, elapsed=time.perf_counter() - start)
+            finally:
+                self._counters["running"] -= 1
+        self._counters["completed"] += 1
+        return IncidentResult(thread_id, response=response, elapsed=time.perf_counter() - start)
@@ -1,49 +1,197 @@
 import json
 import re
-from typing import Dict, Any
+import sys
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, TextIO, Tuple
 
+import orjson
 
-def pretty_print_response(turn_number: int, response: Dict[str, Any]) -> None:
+
+_AGENT_TAG = re.compile(r"\[(.*?)\]")
+
+
+def _message_fields(msg: Any) -> Tuple[str, Any, Optional[str]]:
+    if isinstance(msg, dict):
+        return msg.get("role", "unknown"), msg.get("content", ""), msg.get("name")
+    return getattr(msg, "type", "unknown"), getattr(msg, "content", ""), getattr(msg, "name", None)
+
+
+def _print_message(msg: Any) -> None:
+    role, content, name = _message_fields(msg)
+    content = content if isinstance(content, str) else str(content)
+    if role.lower() == "human" or role.lower() == "user":
+        print(f"\n👤 USER:\n{'-'*40}")
+        print(f"{content}")
+    elif role.lower() == "ai" or role.lower() == "assistant":
+        agent_match = _AGENT_TAG.search(content, 0, 50)
+        agent_name = agent_match.group(1) if agent_match else name or "AI Assistant"
+        if agent_match:
+            content = content.replace(agent_match.group(0), "").strip()
+
+        print(f"\n🤖 {agent_name.upper()}:\n{'-'*40}")
+        print(f"{content}")
+    else:
+        print(f"\n📝 {role.upper()}:\n{'-'*40}")
+        print(f"{content}")
+
+
+def pretty_print_response(turn_number: int, response: Dict[str, Any], messages: Optional[List[Any]] = None) -> None:
+    """Print a turn's messages (the whole history unless ``messages`` is given)."""
     print(f"\n{'='*80}")
     print(f"TURN {turn_number} RESPONSE")
     print(f"{'='*80}")
-    
+
     if "messages" in response:
-        for msg in response["messages"]:
-            try:
-                role = getattr(msg, "type", "unknown")
-                content = getattr(msg, "content", "")
-            except (AttributeError, TypeError):
-                role = msg.get("role", "unknown") if isinstance(msg, dict) else "unknown"
-                content = msg.get("content", "") if isinstance(msg, dict) else str(msg)            
-            if role.lower() == "human" or role.lower() == "user":
-                print(f"\n👤 USER:\n{'-'*40}")
-                print(f"{content}")
-            elif role.lower() == "ai" or role.lower() == "assistant":
-                agent_match = re.search(r"\[(.*?)\]", content[:50])
-                agent_name = agent_match.group(1) if agent_match else "AI Assistant"
-                if agent_match:
-                    content = content.replace(agent_match.group(0), "").strip()
-                
-                print(f"\n🤖 {agent_name.upper()}:\n{'-'*40}")
-                print(f"{content}")
-            else:
-                print(f"\n📝 {role.upper()}:\n{'-'*40}")
-                print(f"{content}")
+        for msg in response["messages"] if messages is None else messages:
+            _print_message(msg)
     else:
-        print(json.dumps(response, indent=2))
-    
+        print(json.dumps(response, indent=2, default=str))
+
     print(f"\n{'='*80}\n")
 
 
-def print_scenario_menu(scenarios: Dict[str, Dict[str, str]]) -> None:
-    print("\n" + "="*50)
-    print("EMERGENCY TRAVEL RESPONSE SYSTEM - SCENARIO SELECTION")
-    print("="*50)
+class IncrementalRenderer(ABC):
+    """
+    Render only the messages a turn added to its thread.
+
+    The swarm returns the whole conversation on every turn, so printing it all makes
+    output grow quadratically with the number of turns. The renderer remembers the last
+    message it showed per thread and starts after it next time. Errors and end-of-run
+    stats go through the renderer too, so every line of its output has one format.
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, Tuple[int, Optional[str]]] = {}
+
+    def new_messages(self, thread_id: str, messages: List[Any]) -> List[Any]:
+        count, last_id = self._seen.get(thread_id, (0, None))
+        start = count if count <= len(messages) else 0
+        if last_id is not None:
+            # Scan back from the end: only the new messages are visited.
+            start = next((i + 1 for i in range(len(messages) - 1, -1, -1)
+                          if getattr(messages[i], "id", None) == last_id), start)
+        if messages:
+            self._seen[thread_id] = (len(messages), getattr(messages[-1], "id", None))
+        return messages[start:]
+
+    def forget(self, thread_id: str) -> None:
+        self._seen.pop(thread_id, None)
+
+    @abstractmethod
+    def render(self, thread_id: str, turn_number: int, response: Dict[str, Any]) -> None:
+        """Print the messages the turn added to the thread."""
+
+    @abstractmethod
+    def render_error(self, thread_id: str, message: str) -> None:
+        """Report a turn that failed."""
+
+    @abstractmethod
+    def render_stats(self, name: str, stats: Dict[str, Any]) -> None:
+        """Print a section of end-of-run stats, e.g. "Engine"."""
+
+
+class PrettyRenderer(IncrementalRenderer):
+    """Human-readable output, like pretty_print_response but only for new messages."""
+
+    def render(self, thread_id: str, turn_number: int, response: Dict[str, Any]) -> None:
+        messages = self.new_messages(thread_id, response.get("messages", []))
+        pretty_print_response(turn_number, response, messages)
+
+    def render_error(self, thread_id: str, message: str) -> None:
+        print(message)
+
+    def render_stats(self, name: str, stats: Dict[str, Any]) -> None:
+        print(f"{name} stats: {stats}")
+
+
+class JsonLinesRenderer(IncrementalRenderer):
+    """
+    One compact JSON object per new message, for log shipping.
+
+    Each line holds the thread_id, turn, message type, agent name, content and the
+    names of any tool calls; encoding uses orjson. Failed turns are written as
+    ``"type": "error"`` records and stats sections as ``"type": "stats"`` records.
+    """
+
+    def __init__(self, stream: TextIO = sys.stdout):
+        super().__init__()
+        self.stream = stream
+
+    def render(self, thread_id: str, turn_number: int, response: Dict[str, Any]) -> None:
+        lines = []
+        for msg in self.new_messages(thread_id, response.get("messages", [])):
+            role, content, name = _message_fields(msg)
+            record = {"thread_id": thread_id, "turn": turn_number, "type": role, "agent": name, "content": content}
+            tool_calls = getattr(msg, "tool_calls", None)
+            if tool_calls:
+                record["tool_calls"] = [call["name"] for call in tool_calls]
+            lines.append(orjson.dumps(record, default=str))
+        self._write(lines)
+
+    def render_error(self, thread_id: str, message: str) -> None:
+        self._write([orjson.dumps({"thread_id": thread_id, "type": "error", "content": message})])
+
+    def render_stats(self, name: str, stats: Dict[str, Any]) -> None:
+        record = {"type": "stats", "name": name, "stats": stats}
+        self._write([orjson.dumps(record, default=str, option=orjson.OPT_NON_STR_KEYS)])
+
+    def _write(self, lines: List[bytes]) -> None:
+        if lines:
+            self.stream.write(b"\n".join(lines).decode() + "\n")
+            self.stream.flush()
+
+
+RENDERERS = {"pretty": PrettyRenderer, "jsonl": JsonLinesRenderer}
+
+
+class StreamPrinter:
+    """
+    Print streamed swarm events incrementally, as produced by utils.streaming.astream_events.
+
+    Call the printer with each event, then close() once the turn has finished.
+    """
+
+    def __init__(self, turn_number: int):
+        self.turn_number = turn_number
+        self._started = False
+        self._agent = None
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        if not self._started:
+            print(f"\n{'='*80}")
+            print(f"TURN {self.turn_number} RESPONSE (STREAMING)")
+            print(f"{'='*80}")
+            self._started = True
+
+        kind = event["type"]
+        if kind in ("token", "message"):
+            if event["agent"] != self._agent:
+                print(f"\n\n🤖 {event['agent'].upper()}:\n{'-'*40}")
+                self._agent = event["agent"]
+            print(event["text"], end="" if kind == "token" else "\n", flush=True)
+            return
+
+        self._agent = None
+        if kind == "tool_call":
+            print(f"\n🔧 {event['agent']} calling {event['name']}...", flush=True)
+        elif kind == "tool_result":
+            print(f"\n📝 {event['name'].upper()}:\n{'-'*40}")
+            print(f"{event['content']}", flush=True)
+        elif kind == "handoff":
+            print(f"\n🔀 {event['from']} ➜ {event['to']}", flush=True)
+
+    def close(self) -> None:
+        print(f"\n\n{'='*80}\n")
+
+
+def print_scenario_menu(scenarios: Dict[str, Dict[str, str]], stream: TextIO = sys.stdout) -> None:
+    print("\n" + "="*50, file=stream)
+    print("EMERGENCY TRAVEL RESPONSE SYSTEM - SCENARIO SELECTION", file=stream)
+    print("="*50, file=stream)
     
     for key, scenario in scenarios.items():
-        print(f"\n[{key}] {scenario['name']}")
-        print(f"    {scenario['description']}")
+        print(f"\n[{key}] {scenario['name']}", file=stream)
+        print(f"    {scenario['description']}", file=stream)
 
 
 def print_scenario_header(choice: str, scenario: Dict[str, str]) -> None:
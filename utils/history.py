@@ -0,0 +1,193 @@
+"""
+Conversation-history compaction applied before each agent's model call
+"""
+import json
+from typing import Any, Callable, Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from utils.streaming import HANDOFF_TOOL_PREFIX
+
+DEFAULT_HISTORY_BUDGET = 3000
+OLD_TOOL_RESULT_CHARS = 300
+SUMMARY_LINE_CHARS = 200
+# Share of the budget set aside for the note that replaces the dropped messages.
+SUMMARY_SHARE = 0.2
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Rough token count (about four characters per token) including tool call arguments."""
+    size = len(message.content) if isinstance(message.content, str) else len(json.dumps(message.content))
+    for call in getattr(message, "tool_calls", None) or []:
+        size += len(call["name"]) + len(json.dumps(call["args"]))
+    return size // 4 + 4
+
+
+def _is_handoff(message: BaseMessage) -> bool:
+    return isinstance(message, ToolMessage) and (message.name or "").startswith(HANDOFF_TOOL_PREFIX)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + f"... [{len(text) - limit} chars omitted]"
+
+
+def _clip_tool_result(message: BaseMessage) -> BaseMessage:
+    if (isinstance(message, ToolMessage) and not _is_handoff(message)
+            and isinstance(message.content, str) and len(message.content) > OLD_TOOL_RESULT_CHARS):
+        return message.model_copy(update={"content": _clip(message.content, OLD_TOOL_RESULT_CHARS)})
+    return message
+
+
+def _strip_old_tool_results(messages: List[BaseMessage], current_turn: int) -> List[BaseMessage]:
+    # Tool payloads from earlier turns have already been digested by the agents' answers.
+    return [_clip_tool_result(message) for message in messages[:current_turn]] + messages[current_turn:]
+
+
+def _blocks(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group each AI tool call with its tool results so windowing never orphans either."""
+    blocks: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and blocks and (
+                isinstance(blocks[-1][0], AIMessage) and blocks[-1][0].tool_calls):
+            blocks[-1].append(message)
+        else:
+            blocks.append([message])
+    return blocks
+
+
+def _summary_line(message: BaseMessage) -> str:
+    if isinstance(message, HumanMessage):
+        return f"- User: {_clip(str(message.content), SUMMARY_LINE_CHARS)}"
+    if isinstance(message, AIMessage):
+        speaker = message.name or "Assistant"
+        calls = [call["name"] for call in message.tool_calls]
+        handoffs = [name[len(HANDOFF_TOOL_PREFIX):] for name in calls if name.startswith(HANDOFF_TOOL_PREFIX)]
+        if handoffs:
+            return f"- {speaker} handed off to {', '.join(handoffs)}"
+        if calls:
+            return f"- {speaker} used {', '.join(calls)}"
+        return f"- {speaker}: {_clip(str(message.content), SUMMARY_LINE_CHARS)}"
+    return ""
+
+
+def summary_lines(messages: Sequence[BaseMessage]) -> List[str]:
+    """One short line per user message, agent answer, tool use or handoff."""
+    return [line for line in map(_summary_line, messages) if line]
+
+
+def _summary_note(messages: Sequence[BaseMessage], budget: int, heading: str) -> SystemMessage:
+    lines = summary_lines(messages)
+    # Keep the most recent lines that fit the summary's share of the budget.
+    size, start = 0, len(lines)
+    while start and size + len(lines[start - 1]) // 4 <= budget:
+        start -= 1
+        size += len(lines[start]) // 4
+    if start:
+        lines = [f"- ({start} earlier events omitted)"] + lines[start:]
+    return SystemMessage(content=heading + "\n" + "\n".join(lines))
+
+
+def _keep_recent(blocks: List[List[BaseMessage]], used: int, budget: int) -> List[List[BaseMessage]]:
+    """Pop the most recent blocks that fit ``budget`` off ``blocks``, oldest first."""
+    kept: List[List[BaseMessage]] = []
+    while blocks:
+        cost = sum(map(estimate_tokens, blocks[-1]))
+        if used + cost > budget:
+            break
+        kept.insert(0, blocks.pop())
+        used += cost
+    return kept
+
+
+def _fit_current_turn(turn: List[BaseMessage], budget: int) -> List[BaseMessage]:
+    """
+    Fit the current turn (its user message onwards) into ``budget`` tokens.
+
+    The newest AI/tool block is what the model is about to act on and stays whole;
+    earlier tool results of the turn are clipped, and if that is not enough the oldest
+    blocks are condensed into a note. Each model call adds blocks at the end, so
+    clipping only rewrites the block that was newest on the previous call.
+    """
+    if sum(map(estimate_tokens, turn)) <= budget:
+        return turn
+    blocks = _blocks(turn[1:])
+    if len(blocks) < 2:
+        return turn
+    latest = blocks.pop()
+    earlier = [[_clip_tool_result(message) for message in block] for block in blocks]
+    used = estimate_tokens(turn[0]) + sum(map(estimate_tokens, latest))
+    if used + sum(estimate_tokens(message) for block in earlier for message in block) <= budget:
+        return [turn[0]] + [message for block in earlier for message in block] + latest
+    summary_budget = int(budget * SUMMARY_SHARE)
+    kept = _keep_recent(earlier, used + summary_budget, budget)
+    fitted = [turn[0]]
+    if earlier:
+        fitted.append(_summary_note([message for block in earlier for message in block], summary_budget,
+                                    "Earlier in this turn (condensed):"))
+    return fitted + [message for block in kept for message in block] + latest
+
+
+def compact_messages(messages: Sequence[BaseMessage], budget: int = DEFAULT_HISTORY_BUDGET) -> List[BaseMessage]:
+    """
+    Fit a conversation into roughly ``budget`` tokens.
+
+    Tool results from earlier turns are clipped first. If the history is still over
+    budget, the first user message (the incident report) and the most recent messages
+    that fit are kept verbatim and everything in between is replaced by a short
+    system note listing who said or did what.
+
+    Everything before the current turn is decided from earlier turns and the latest
+    user message only, so it stays byte-identical across all model calls within a
+    turn and the provider's prompt cache can reuse it. The current turn then gets
+    what is left of the budget: once fan-out or large tool results push it over,
+    its earlier tool results are clipped and, failing that, condensed, leaving the
+    user message and the newest tool results whole.
+
+    Args:
+        messages: The shared swarm conversation
+        budget: Approximate prompt tokens allowed for the conversation
+
+    Returns:
+        The messages to send to the model; the stored state is left untouched
+    """
+    messages = list(messages)
+    humans = [index for index, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not humans:
+        return messages
+    current_turn = humans[-1]
+    messages = _strip_old_tool_results(messages, current_turn)
+    recent = messages[current_turn:]
+    if current_turn == humans[0] or sum(map(estimate_tokens, messages[:current_turn + 1])) <= budget:
+        history = messages[:current_turn]
+    else:
+        history = messages[:humans[0] + 1]
+        older = _blocks(messages[humans[0] + 1:current_turn])
+        summary_budget = int(budget * SUMMARY_SHARE)
+        used = sum(map(estimate_tokens, history)) + estimate_tokens(recent[0]) + summary_budget
+        kept = _keep_recent(older, used, budget)
+        if older:
+            history.append(_summary_note([message for block in older for message in block], summary_budget,
+                                         "Earlier in this incident (condensed):"))
+        history += [message for block in kept for message in block]
+    return history + _fit_current_turn(recent, budget - sum(map(estimate_tokens, history)))
+
+
+def compacting_prompt(system_prompt: str, budget: int = DEFAULT_HISTORY_BUDGET) -> Callable[[Dict[str, Any]], List[BaseMessage]]:
+    """
+    Build a ``create_react_agent`` prompt that prepends the agent's system prompt to
+    the compacted conversation.
+
+    Args:
+        system_prompt: The agent's instructions
+        budget: Approximate prompt tokens allowed for the conversation
+
+    Returns:
+        A callable taking the agent state and returning the messages for the model
+    """
+    system_message = SystemMessage(content=system_prompt)
+
+    def prompt(state: Dict[str, Any]) -> List[BaseMessage]:
+        return [system_message] + compact_messages(state["messages"], budget)
+
+    return prompt
@@ -0,0 +1,309 @@
+"""
+Per-agent latency and token instrumentation for the swarm
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, IO, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langgraph.errors import GraphBubbleUp
+
+UNKNOWN = "unknown"
+
+
+@dataclass
+class AgentStats:
+    activations: int = 0
+    wall_time: float = 0.0
+    llm_calls: int = 0
+    llm_time: float = 0.0
+    tool_calls: int = 0
+    tool_time: float = 0.0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    handoffs: int = 0
+    errors: int = 0
+
+    def add(self, other: "AgentStats") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+
+def _agent_and_thread(metadata: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    metadata = metadata or {}
+    namespace = metadata.get("langgraph_checkpoint_ns") or ""
+    agent = namespace.split("|")[0].split(":")[0] or metadata.get("langgraph_node") or UNKNOWN
+    return str(metadata.get("thread_id", UNKNOWN)), agent
+
+
+def _handoff_destination(output: Any) -> Optional[str]:
+    """Where a handoff tool sent control; a refused handoff returns a message instead of a Command."""
+    goto = getattr(output, "goto", None)
+    return goto if isinstance(goto, str) and goto else None
+
+
+def _usage(response: LLMResult) -> Tuple[int, int, int]:
+    """Prompt, cached prompt and completion tokens of a model call."""
+    prompt_tokens = cached_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                cached_tokens += (usage.get("input_token_details") or {}).get("cache_read") or 0
+                completion_tokens += usage.get("output_tokens", 0)
+    if not prompt_tokens and not completion_tokens and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, cached_tokens, completion_tokens
+
+
+class AgentMetrics(BaseCallbackHandler):
+    """
+    Callback handler that records wall time, LLM and tool latency, token usage and
+    handoffs per thread and per agent, without LangSmith.
+
+    Pass it in the run config (``{"callbacks": [metrics]}``) or to IncidentEngine.
+    Agents are identified from the LangGraph checkpoint namespace, so calls made inside
+    an agent's subgraph are attributed to that agent.
+
+    Per-thread records are kept for the ``max_tracked_threads`` most recently active
+    threads; older threads are folded into the per-agent and per-handoff totals, so a
+    long-running service keeps its totals without growing with every incident.
+
+    Args:
+        max_tracked_threads: Number of threads whose per-thread records are kept
+    """
+
+    run_inline = True
+
+    def __init__(self, max_tracked_threads: int = 4096):
+        self.max_tracked_threads = max_tracked_threads
+        self._lock = threading.Lock()
+        # thread_id -> agent -> stats, least recently active thread first
+        self._stats: "OrderedDict[str, Dict[str, AgentStats]]" = OrderedDict()
+        # thread_id -> (from, to) -> count, for the same threads as _stats
+        self._transitions: Dict[str, Dict[Tuple[str, str], int]] = {}
+        # Totals of the threads no longer tracked
+        self._retired_stats: Dict[str, AgentStats] = {}
+        self._retired_transitions: Dict[Tuple[str, str], int] = {}
+        # run_id -> (thread_id, agent, handoff destination, start time) for runs in flight
+        self._runs: Dict[UUID, Tuple[str, str, str, float]] = {}
+
+    def _record(self, thread_id: str, agent: str) -> AgentStats:
+        agents = self._stats.get(thread_id)
+        if agents is None:
+            agents = self._stats[thread_id] = {}
+            self._transitions[thread_id] = {}
+            while len(self._stats) > self.max_tracked_threads:
+                self._retire(next(iter(self._stats)))
+        else:
+            self._stats.move_to_end(thread_id)
+        if agent not in agents:
+            agents[agent] = AgentStats()
+        return agents[agent]
+
+    def _retire(self, thread_id: str) -> None:
+        for agent, stats in self._stats.pop(thread_id).items():
+            self._retired_stats.setdefault(agent, AgentStats()).add(stats)
+        for pair, count in self._transitions.pop(thread_id).items():
+            self._retired_transitions[pair] = self._retired_transitions.get(pair, 0) + count
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]], name: str = "") -> None:
+        thread_id, agent = _agent_and_thread(metadata)
+        with self._lock:
+            self._runs[run_id] = (thread_id, agent, name, time.perf_counter())
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[str, str, str, float]]:
+        """Pop a run and return its thread_id, agent, handoff destination and elapsed seconds."""
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        thread_id, agent, name, start = run
+        return thread_id, agent, name, time.perf_counter() - start
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, tags: Optional[List[str]] = None,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        # Only the outermost visible run of each swarm agent node counts as an activation;
+        # hidden runs are LangGraph internals such as applying a handoff command.
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        namespace = metadata.get("langgraph_checkpoint_ns") or ""
+        if (node and not node.startswith("__") and kwargs.get("name") == node and "|" not in namespace
+                and "langsmith:hidden" not in (tags or []) and parent_run_id not in self._runs):
+            self._start(run_id, metadata)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            thread_id, agent, _, elapsed = finished
+            with self._lock:
+                stats = self._record(thread_id, agent)
+                stats.activations += 1
+                stats.wall_time += elapsed
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            thread_id, agent, _, elapsed = finished
+            with self._lock:
+                stats = self._record(thread_id, agent)
+                stats.activations += 1
+                stats.wall_time += elapsed
+                # Handoffs leave the agent node by bubbling a command up to the swarm.
+                stats.errors += int(not isinstance(error, GraphBubbleUp))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            thread_id, agent, _, elapsed = finished
+            prompt_tokens, cached_tokens, completion_tokens = _usage(response)
+            with self._lock:
+                stats = self._record(thread_id, agent)
+                stats.llm_calls += 1
+                stats.llm_time += elapsed
+                stats.prompt_tokens += prompt_tokens
+                stats.cached_prompt_tokens += cached_tokens
+                stats.completion_tokens += completion_tokens
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            thread_id, agent, _, elapsed = finished
+            with self._lock:
+                stats = self._record(thread_id, agent)
+                stats.llm_calls += 1
+                stats.llm_time += elapsed
+                stats.errors += 1
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        # Handoff tools carry their destination agent in the tool metadata.
+        destination = (metadata or {}).get("__handoff_destination")
+        self._start(run_id, metadata, destination or "")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tool_finished(run_id, error=False, destination=_handoff_destination(output))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tool_finished(run_id, error=True)
+
+    def _tool_finished(self, run_id: UUID, error: bool, destination: Optional[str] = None) -> None:
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        thread_id, agent, name, elapsed = finished
+        # The governor may send a refused handoff to the coordinator instead of its destination.
+        name = destination if name else ""
+        with self._lock:
+            stats = self._record(thread_id, agent)
+            stats.tool_calls += 1
+            stats.tool_time += elapsed
+            stats.errors += int(error)
+            if name and not error:
+                stats.handoffs += 1
+                transitions = self._transitions[thread_id]
+                transitions[(agent, name)] = transitions.get((agent, name), 0) + 1
+
+    def records(self) -> List[Dict[str, Any]]:
+        """One record per (thread, agent) pair of the tracked threads."""
+        with self._lock:
+            return [{"thread_id": thread_id, "agent": agent, **asdict(stats)}
+                    for thread_id, agents in sorted(self._stats.items())
+                    for agent, stats in sorted(agents.items())]
+
+    def handoffs(self) -> List[Dict[str, Any]]:
+        """Handoff counts per tracked thread and (from, to) pair; repeated pairs point at handoff loops."""
+        with self._lock:
+            return [{"thread_id": thread_id, "from": source, "to": destination, "count": count}
+                    for thread_id, transitions in sorted(self._transitions.items())
+                    for (source, destination), count in sorted(transitions.items())]
+
+    def by_agent(self) -> Dict[str, AgentStats]:
+        """Totals per agent across all threads, most expensive (by tokens) first."""
+        totals: Dict[str, AgentStats] = {}
+        with self._lock:
+            for agent, stats in self._retired_stats.items():
+                totals.setdefault(agent, AgentStats()).add(stats)
+            for agents in self._stats.values():
+                for agent, stats in agents.items():
+                    totals.setdefault(agent, AgentStats()).add(stats)
+        return dict(sorted(totals.items(), key=lambda item: -(item[1].prompt_tokens + item[1].completion_tokens)))
+
+    def handoff_totals(self) -> Dict[Tuple[str, str], int]:
+        """Handoff counts per (from, to) pair across all threads."""
+        with self._lock:
+            totals = dict(self._retired_transitions)
+            for transitions in self._transitions.values():
+                for pair, count in transitions.items():
+                    totals[pair] = totals.get(pair, 0) + count
+        return totals
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._transitions.clear()
+            self._retired_stats.clear()
+            self._retired_transitions.clear()
+
+    def to_jsonl(self, stream: IO[str]) -> None:
+        for record in self.records():
+            stream.write(json.dumps({"kind": "agent", **record}) + "\n")
+        for record in self.handoffs():
+            stream.write(json.dumps({"kind": "handoff", **record}) + "\n")
+
+    def to_prometheus(self) -> str:
+        """Render per-agent totals in the Prometheus text exposition format."""
+        metrics = {
+            "activations": ("counter", "Agent node executions"),
+            "wall_time": ("counter", "Seconds spent inside the agent node"),
+            "llm_calls": ("counter", "Chat model calls"),
+            "llm_time": ("counter", "Seconds spent waiting on the chat model"),
+            "tool_calls": ("counter", "Tool calls, including handoffs"),
+            "tool_time": ("counter", "Seconds spent running tools"),
+            "prompt_tokens": ("counter", "Prompt tokens sent to the chat model"),
+            "cached_prompt_tokens": ("counter", "Prompt tokens served from the provider's prompt cache"),
+            "completion_tokens": ("counter", "Completion tokens returned by the chat model"),
+            "handoffs": ("counter", "Handoffs to another agent"),
+            "errors": ("counter", "Failed model, tool or agent runs"),
+        }
+        totals = self.by_agent()
+        lines = []
+        for name, (kind, help_text) in metrics.items():
+            metric = f"rescuenet_agent_{name}" + ("_seconds_total" if name.endswith("_time") else "_total")
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for agent, stats in totals.items():
+                lines.append(f'{metric}{{agent="{agent}"}} {getattr(stats, name)}')
+        handoff_totals = self.handoff_totals()
+        lines.append("# HELP rescuenet_handoff_total Handoffs between agents")
+        lines.append("# TYPE rescuenet_handoff_total counter")
+        for (source, destination), count in sorted(handoff_totals.items()):
+            lines.append(f'rescuenet_handoff_total{{from="{source}",to="{destination}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Write Prometheus text if ``path`` ends in .prom, JSON lines otherwise."""
+        with open(path, "w") as stream:
+            if str(path).endswith(".prom"):
+                stream.write(self.to_prometheus())
+            else:
+                self.to_jsonl(stream)
@@ -1,15 +1,202 @@
+import asyncio
+import random
+import sys
+import threading
 import time
-from typing import Dict, Any, Callable
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, FrozenSet, Optional
 
-def invoke_with_retry(app: Any, messages: Dict[str, Any], config: Dict[str, Any], max_retries: int = 5) -> Dict[str, Any]:
-    for attempt in range(max_retries):
+from utils.streaming import astream_events
+
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+TRANSIENT = "transient"
+INVALID_OUTPUT = "invalid_output"
+FATAL = "fatal"
+
+
+def classify_error(error: BaseException) -> str:
+    """Sort an exception raised during a swarm turn into one of the retry error classes."""
+    # Imported here to keep openai and langchain_core off the start-up path; by the time
+    # a turn fails the model client has already loaded both.
+    import openai
+    from langchain_core.exceptions import OutputParserException
+
+    if "model produced invalid content" in str(error) or isinstance(error, OutputParserException):
+        return INVALID_OUTPUT
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMIT
+    # APITimeoutError subclasses APIConnectionError, so timeouts are checked first.
+    if isinstance(error, (openai.APITimeoutError, TimeoutError, asyncio.TimeoutError)):
+        return TIMEOUT
+    if isinstance(error, (openai.APIConnectionError, ConnectionError)):
+        return TRANSIENT
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return RATE_LIMIT
+        if error.status_code in (408, 409) or error.status_code >= 500:
+            return TRANSIENT
+    return FATAL
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryBudget:
+    """
+    Token bucket shared by every retry in the process.
+
+    Each retry spends one token and tokens refill at ``refill_rate`` per second, so
+    when the provider throttles many turns at once only ``capacity`` retries go out
+    right away and the rest fail fast instead of multiplying the load.
+    """
+
+    def __init__(self, capacity: float = 20.0, refill_rate: float = 1.0):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.exhausted = 0
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_on: FrozenSet[str] = field(default_factory=lambda: frozenset({RATE_LIMIT, TIMEOUT, TRANSIENT, INVALID_OUTPUT}))
+    budget: RetryBudget = field(default_factory=lambda: DEFAULT_RETRY_BUDGET)
+
+    def delay(self, attempt: int, error: BaseException, error_class: str) -> float:
+        """Exponential backoff with full jitter; rate limits wait at least the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if error_class == RATE_LIMIT:
+            delay = max(delay, min(self.max_delay, _retry_after(error) or 0.0))
+        return delay
+
+
+def _retry_delay(policy: RetryPolicy, attempt: int, error: BaseException) -> Optional[float]:
+    # Diagnostics go to stderr, keeping stdout for the rendered turns (see --output jsonl).
+    error_class = classify_error(error)
+    if error_class not in policy.retry_on:
+        print(f"Not retrying {error_class} error: {str(error)}", file=sys.stderr)
+        return None
+    if attempt == policy.max_retries - 1:
+        print(f"Failed after {policy.max_retries} attempts: {str(error)}", file=sys.stderr)
+        return None
+    if not policy.budget.try_spend():
+        print(f"Retry budget exhausted, giving up on {error_class} error: {str(error)}", file=sys.stderr)
+        return None
+    delay = policy.delay(attempt, error, error_class)
+    print(f"Attempt {attempt + 1} failed ({error_class}), retrying in {delay:.2f} seconds...", file=sys.stderr)
+    return delay
+
+
+def _checkpoint_id(snapshot: Any) -> Optional[str]:
+    return snapshot.config.get("configurable", {}).get("checkpoint_id") if snapshot is not None else None
+
+
+def _get_state(app: Any, config: Dict[str, Any]) -> Any:
+    try:
+        return app.get_state(config)
+    except ValueError:
+        # Compiled without a checkpointer: there is nothing to resume from.
+        return None
+
+
+async def _aget_state(app: Any, config: Dict[str, Any]) -> Any:
+    try:
+        return await app.aget_state(config)
+    except ValueError:
+        return None
+
+
+def _resume_input(inputs: Optional[Dict[str, Any]], before: Any, after: Any) -> Optional[Dict[str, Any]]:
+    """
+    Pick the input for the next attempt.
+
+    When the failed attempt already checkpointed progress on the thread, invoking with
+    ``None`` resumes from that checkpoint: completed agent steps are not run again and
+    the user's message is not appended a second time.
+    """
+    if after is not None and after.next and _checkpoint_id(after) != _checkpoint_id(before):
+        return None
+    return inputs
+
+
+def invoke_with_retry(app: Any, messages: Dict[str, Any], config: Dict[str, Any], max_retries: int = 5,
+                      policy: Optional[RetryPolicy] = None) -> Dict[str, Any]:
+    policy = policy or RetryPolicy(max_retries=max_retries)
+    before = _get_state(app, config)
+    inputs = messages
+    for attempt in range(policy.max_retries):
+        try:
+            return app.invoke(inputs, config)
+        except Exception as e:
+            delay = _retry_delay(policy, attempt, e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            after = _get_state(app, config)
+            inputs = _resume_input(inputs, before, after)
+            before = after
+
+
+async def ainvoke_with_retry(app: Any, messages: Dict[str, Any], config: Dict[str, Any], max_retries: int = 5,
+                             policy: Optional[RetryPolicy] = None) -> Dict[str, Any]:
+    policy = policy or RetryPolicy(max_retries=max_retries)
+    before = await _aget_state(app, config)
+    inputs = messages
+    for attempt in range(policy.max_retries):
+        try:
+            return await app.ainvoke(inputs, config)
+        except Exception as e:
+            delay = _retry_delay(policy, attempt, e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            after = await _aget_state(app, config)
+            inputs = _resume_input(inputs, before, after)
+            before = after
+
+
+async def astream_with_retry(app: Any, messages: Dict[str, Any], config: Dict[str, Any],
+                             on_event: Callable[[Dict[str, Any]], None], max_retries: int = 5,
+                             policy: Optional[RetryPolicy] = None) -> Dict[str, Any]:
+    policy = policy or RetryPolicy(max_retries=max_retries)
+    before = await _aget_state(app, config)
+    inputs = messages
+    for attempt in range(policy.max_retries):
         try:
-            return app.invoke(messages, config)
+            async for event in astream_events(app, inputs, config):
+                on_event(event)
+            return (await app.aget_state(config)).values
         except Exception as e:
-            if "model produced invalid content" in str(e):
-                print(f"Attempt {attempt + 1} failed due to model output error, simplifying request...")
-            if attempt == max_retries - 1:
-                print(f"Failed after {max_retries} attempts: {str(e)}")
+            delay = _retry_delay(policy, attempt, e)
+            if delay is None:
                 raise
-            print(f"Retrying in 1 second...")
-            time.sleep(1) 
\ No newline at end of file
+            await asyncio.sleep(delay)
+            after = await _aget_state(app, config)
+            inputs = _resume_input(inputs, before, after)
+            before = after
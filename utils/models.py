@@ -0,0 +1,402 @@
+"""
+Chat model factory: one pooled HTTP client shared by every agent, and per-tier models
+"""
+import importlib.util
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+from pydantic import Field
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import add_usage
+from langchain_core.messages.tool import tool_call_chunk as create_tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+DEFAULT_MODEL = "gpt-4"
+DEFAULT_FAST_MODEL = "gpt-4o-mini"
+
+# Tiers an agent spec can ask for; see the "tier" field of AGENT_SPECS.
+FAST = "fast"
+STRONG = "strong"
+# Fast for the steps that open a turn (triage and handoff), strong for the rest.
+ROUTING = "routing"
+
+# Phrases that mark a reply the fast model was not confident about.
+_LOW_CONFIDENCE = ("i'm not sure", "i am not sure", "i'm unable to", "i am unable to", "i cannot determine",
+                   "i don't have enough information", "as an ai")
+
+# The tiers are called without callbacks: the EscalatingModel's own run already reports
+# the call, with the reply (and token usage) of whichever tier answered.
+_INNER = {"callbacks": []}
+
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``pip install httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class ConnectionStats:
+    """
+    Counts requests against new connections, so connection reuse can be observed.
+
+    httpcore reports connection set-up through the ``trace`` request extension: a
+    request that triggers a TCP connect opened a new connection, any other request
+    went out on a pooled keep-alive connection.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.connect_time = 0.0
+        self.http_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _event(self, name: str, started: Dict[str, float]) -> None:
+        now = time.perf_counter()
+        if name.endswith(".started"):
+            started[name[:-len(".started")]] = now
+            return
+        if not name.endswith(".complete"):
+            return
+        step = name[:-len(".complete")]
+        with self._lock:
+            if step == "connection.connect_tcp":
+                self.new_connections += 1
+            elif step == "connection.start_tls":
+                self.tls_handshakes += 1
+            if step in ("connection.connect_tcp", "connection.start_tls"):
+                self.connect_time += now - started.pop(step, now)
+
+    def trace_request(self, request: httpx.Request) -> None:
+        started: Dict[str, float] = {}
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = lambda name, info: self._event(name, started)
+
+    async def atrace_request(self, request: httpx.Request) -> None:
+        started: Dict[str, float] = {}
+        with self._lock:
+            self.requests += 1
+
+        async def trace(name: str, info: Dict[str, Any]) -> None:
+            self._event(name, started)
+
+        request.extensions["trace"] = trace
+
+    def record_response(self, response: httpx.Response) -> None:
+        with self._lock:
+            self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+
+    async def arecord_response(self, response: httpx.Response) -> None:
+        self.record_response(response)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+                "tls_handshakes": self.tls_handshakes,
+                "connect_time": round(self.connect_time, 3),
+                "http_versions": dict(self.http_versions),
+            }
+
+
+class HttpClientPool:
+    """
+    One sync and one async httpx client, with keep-alive pools, shared by all agents.
+
+    httpx clients are safe to share between threads, so every agent built from the same
+    model (and every engine worker running them) reuses warm connections instead of
+    paying TCP and TLS set-up on each call. The async client belongs to the event loop
+    that first uses it, which in this app is the IncidentEngine's loop.
+
+    Args:
+        max_connections: Upper bound on open connections per client
+        max_keepalive_connections: Idle connections kept open for reuse
+        keepalive_expiry: Seconds an idle connection is kept before closing
+        timeout: Request timeout
+        http2: Negotiate HTTP/2; None enables it when the h2 package is installed
+    """
+
+    def __init__(self, max_connections: int = 64, max_keepalive_connections: int = 32,
+                 keepalive_expiry: float = 60.0, timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+                 http2: Optional[bool] = None):
+        self.http2 = http2_available() if http2 is None else http2
+        self.connections = ConnectionStats()
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive_connections,
+                              keepalive_expiry=keepalive_expiry)
+        self.client = httpx.Client(
+            limits=limits, timeout=timeout, http2=self.http2,
+            event_hooks={"request": [self.connections.trace_request], "response": [self.connections.record_response]},
+        )
+        self.async_client = httpx.AsyncClient(
+            limits=limits, timeout=timeout, http2=self.http2,
+            event_hooks={"request": [self.connections.atrace_request], "response": [self.connections.arecord_response]},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"http2": self.http2, **self.connections.snapshot()}
+
+    async def aclose(self) -> None:
+        self.client.close()
+        await self.async_client.aclose()
+
+
+def create_chat_model(pool: HttpClientPool, model: str = DEFAULT_MODEL, **kwargs: Any) -> ChatOpenAI:
+    """
+    Create a ChatOpenAI model that sends its requests through the shared pool.
+
+    Args:
+        pool: The HTTP client pool to use
+        model: OpenAI model name
+        **kwargs: Further ChatOpenAI settings (temperature, cache, ...)
+
+    Returns:
+        The chat model
+    """
+    return ChatOpenAI(model=model, http_client=pool.client, http_async_client=pool.async_client, **kwargs)
+
+
+def escalation_reason(message: BaseMessage) -> Optional[str]:
+    """Why a fast-model reply should be redone by the strong model, or None if it is fine."""
+    if getattr(message, "invalid_tool_calls", None):
+        return "invalid_tool_call"
+    if (message.response_metadata or {}).get("finish_reason") == "length":
+        return "truncated"
+    if getattr(message, "tool_calls", None):
+        return None
+    text = message.content if isinstance(message.content, str) else str(message.content)
+    if not text.strip():
+        return "empty"
+    lowered = text.lower()
+    if any(phrase in lowered for phrase in _LOW_CONFIDENCE):
+        return "low_confidence"
+    return None
+
+
+class EscalationStats:
+    """Thread-safe counts of fast-model calls and of escalations by reason."""
+
+    def __init__(self):
+        self.calls = 0
+        self.escalations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, reason: Optional[str]) -> None:
+        with self._lock:
+            self.calls += 1
+            if reason is not None:
+                self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            escalated = sum(self.escalations.values())
+            return {
+                "calls": self.calls,
+                "escalated": escalated,
+                "escalation_rate": escalated / self.calls if self.calls else 0.0,
+                "reasons": dict(self.escalations),
+            }
+
+
+class EscalatingModel(BaseChatModel):
+    """
+    Answer with a fast model and redo the call on the strong model when that reply fails.
+
+    A reply is escalated when the fast model raises (after its own retries), or when
+    ``escalate_when`` finds a reason in its output: an invalid tool call, a reply cut
+    off at the token limit, an empty reply or a hedging, low-confidence one. Because the
+    reply has to be judged whole, tokens are not streamed from this model. An escalated
+    reply reports the token usage of both attempts, so callbacks such as AgentMetrics and
+    the rate limiter see every token spent.
+
+    Args:
+        fast: The cheaper, lower-latency model tried first
+        strong: The model used when the fast reply is rejected
+        escalate_when: Returns the escalation reason for a reply, or None to accept it
+    """
+
+    fast: Runnable
+    strong: Runnable
+    escalate_when: Callable[[BaseMessage], Optional[str]] = escalation_reason
+    stats: EscalationStats = Field(default_factory=EscalationStats)
+
+    @property
+    def _llm_type(self) -> str:
+        return "escalating"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"fast": _model_name(self.fast), "strong": _model_name(self.strong)}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "EscalatingModel":
+        # Both tiers get the same tools; the stats object is shared with the unbound model.
+        return self.model_copy(update={
+            "fast": self.fast.bind_tools(tools, **kwargs),
+            "strong": self.strong.bind_tools(tools, **kwargs),
+        })
+
+    def _accept(self, reply: Optional[BaseMessage], error: Optional[BaseException]) -> bool:
+        reason = type(error).__name__ if error is not None else self.escalate_when(reply)
+        self.stats.record(reason)
+        return reason is None
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        reply, error = None, None
+        try:
+            reply = self.fast.invoke(messages, _INNER, stop=stop, **kwargs)
+        except Exception as e:
+            error = e
+        if not self._accept(reply, error):
+            reply = _with_usage_of(reply, self.strong.invoke(messages, _INNER, stop=stop, **kwargs))
+        return _chat_result(reply)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        reply, error = None, None
+        try:
+            reply = await self.fast.ainvoke(messages, _INNER, stop=stop, **kwargs)
+        except Exception as e:
+            error = e
+        if not self._accept(reply, error):
+            reply = _with_usage_of(reply, await self.strong.ainvoke(messages, _INNER, stop=stop, **kwargs))
+        return _chat_result(reply)
+
+
+def is_routing_step(messages: Sequence[BaseMessage]) -> bool:
+    """A step that answers a new user message, before any specialist has reported back."""
+    return bool(messages) and messages[-1].type == "human"
+
+
+class RoutingModel(BaseChatModel):
+    """
+    Send an agent's routing steps to the fast model and everything else to the strong one.
+
+    The coordinator's first step of a turn reads the user's message and either asks for
+    missing details or hands off to a specialist, which a smaller model does well; the
+    steps after specialists report back summarize their findings and stay on the strong
+    model. Those are streamed as usual; routing steps come back whole.
+
+    Args:
+        fast: Model for routing steps (an EscalatingModel keeps its fallback to strong)
+        strong: Model for every other step
+        route_when: Returns True for the messages of a routing step
+    """
+
+    fast: Runnable
+    strong: Runnable
+    route_when: Callable[[Sequence[BaseMessage]], bool] = is_routing_step
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"fast": _model_name(self.fast), "strong": _model_name(self.strong)}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "RoutingModel":
+        return self.model_copy(update={
+            "fast": self.fast.bind_tools(tools, **kwargs),
+            "strong": self.strong.bind_tools(tools, **kwargs),
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        model = self.fast if self.route_when(messages) else self.strong
+        return _chat_result(model.invoke(messages, _INNER, stop=stop, **kwargs))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        model = self.fast if self.route_when(messages) else self.strong
+        return _chat_result(await model.ainvoke(messages, _INNER, stop=stop, **kwargs))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.route_when(messages):
+            yield _chunk(self.fast.invoke(messages, _INNER, stop=stop, **kwargs))
+            return
+        for chunk in self.strong.stream(messages, _INNER, stop=stop, **kwargs):
+            yield ChatGenerationChunk(message=chunk.model_copy(update={"id": None}))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.route_when(messages):
+            yield _chunk(await self.fast.ainvoke(messages, _INNER, stop=stop, **kwargs))
+            return
+        async for chunk in self.strong.astream(messages, _INNER, stop=stop, **kwargs):
+            yield ChatGenerationChunk(message=chunk.model_copy(update={"id": None}))
+
+
+def _model_name(model: Runnable) -> str:
+    model = getattr(model, "bound", model)
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def _with_usage_of(rejected: Optional[BaseMessage], reply: BaseMessage) -> BaseMessage:
+    """``reply`` with the token usage of the rejected attempt added to its own."""
+    spent = getattr(rejected, "usage_metadata", None)
+    if not spent:
+        return reply
+    return reply.model_copy(update={"usage_metadata": add_usage(spent, getattr(reply, "usage_metadata", None))})
+
+
+def _chat_result(reply: BaseMessage) -> ChatResult:
+    # The outer run assigns the message id; usage and metadata are those of the model that answered.
+    return ChatResult(generations=[ChatGeneration(message=reply.model_copy(update={"id": None}))])
+
+
+def _chunk(reply: BaseMessage) -> ChatGenerationChunk:
+    """A whole reply as the single chunk of a stream."""
+    tool_call_chunks = [
+        create_tool_call_chunk(name=call["name"], args=json.dumps(call["args"]), id=call["id"], index=index)
+        for index, call in enumerate(getattr(reply, "tool_calls", None) or [])
+    ] + [
+        create_tool_call_chunk(name=call["name"], args=call["args"], id=call["id"], index=index)
+        for index, call in enumerate(getattr(reply, "invalid_tool_calls", None) or [],
+                                     start=len(getattr(reply, "tool_calls", None) or []))
+    ]
+    return ChatGenerationChunk(message=AIMessageChunk(
+        content=reply.content, additional_kwargs=reply.additional_kwargs,
+        response_metadata=reply.response_metadata, usage_metadata=getattr(reply, "usage_metadata", None),
+        tool_call_chunks=tool_call_chunks,
+    ))
+
+
+def create_tiered_models(pool: HttpClientPool, strong_model: str = DEFAULT_MODEL,
+                         fast_model: str = DEFAULT_FAST_MODEL, escalate: bool = True,
+                         **kwargs: Any) -> Dict[str, BaseChatModel]:
+    """
+    Create the models for each agent tier, all sharing the pool.
+
+    Args:
+        pool: The HTTP client pool to use
+        strong_model: Model for the strong tier and for escalations
+        fast_model: Model for the fast tier
+        escalate: Wrap the fast tier in an EscalatingModel that falls back to the strong model
+        **kwargs: Further ChatOpenAI settings applied to both tiers
+
+    Returns:
+        Models keyed by tier, as accepted by create_agents and LazyAgents; the routing
+        tier uses the fast tier (escalation included) for routing steps
+    """
+    strong = create_chat_model(pool, strong_model, **kwargs)
+    fast = create_chat_model(pool, fast_model, **kwargs)
+    fast = EscalatingModel(fast=fast, strong=strong) if escalate else fast
+    return {STRONG: strong, FAST: fast, ROUTING: RoutingModel(fast=fast, strong=strong)}
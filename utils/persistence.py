@@ -0,0 +1,496 @@
+"""
+SQLite-backed checkpointer and store for the Emergency Travel Response System
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.constants import TASKS
+from langgraph.store.base import (
+    BaseStore,
+    GetOp,
+    Item,
+    ListNamespacesOp,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Cap SQLite's page cache (in KiB) so memory stays flat as incidents accumulate.
+    conn.execute("PRAGMA cache_size=-8192")
+    return conn
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    File-backed LangGraph checkpointer with compaction and TTL eviction of closed incidents.
+
+    Checkpoints and pending writes live in SQLite, keyed and indexed by thread_id, so
+    state survives restarts and RAM use does not grow with the number of threads.
+    Only the newest ``keep_last`` root checkpoints of each thread are kept, and
+    subgraph checkpoints are dropped once their step has completed.
+
+    Args:
+        path: SQLite database file (":memory:" for a throwaway database)
+        keep_last: Number of root checkpoints to keep per thread
+    """
+
+    def __init__(self, path: str, keep_last: int = 10, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        self.keep_last = max(keep_last, 2)
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                closed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS threads_closed_at ON threads (closed_at);
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+        """)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: Tuple[Any, ...]) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        sends = []
+        if parent_checkpoint_id:
+            sends = self._conn.execute(
+                "SELECT type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ? "
+                "ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+            ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **self.serde.loads_typed((type_, checkpoint)),
+                "pending_sends": [self.serde.loads_typed(send) for send in sends],
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                if filter:
+                    metadata = self.serde.loads_typed((row[4], row[5]))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                results.append(self._tuple(thread_id, checkpoint_ns, tuple(row)))
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = checkpoint.copy()
+        saved.pop("pending_sends", None)
+        type_, serialized = self.serde.dumps_typed(saved)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, serialized, metadata_type, serialized_metadata),
+            )
+            self._conn.execute(
+                "INSERT INTO threads (thread_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET updated_at = excluded.updated_at, closed_at = NULL",
+                (thread_id, time.time()),
+            )
+            self._compact(thread_id, checkpoint_ns)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+             channel, *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in results:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        if not checkpoint_ns:
+            # A new root checkpoint means every subgraph task of the previous step has
+            # finished, so their (per-task) namespaces are no longer needed for resuming.
+            for table in ("checkpoints", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns != ''", (thread_id,))
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last),
+        ).fetchall()
+        if not stale:
+            return
+        params = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, in stale]
+        self._conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+        self._conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+
+    def close_thread(self, thread_id: str) -> None:
+        """Mark an incident as closed so evict_closed can remove it once its TTL has passed."""
+        with self._lock:
+            self._conn.execute("UPDATE threads SET closed_at = ? WHERE thread_id = ?", (time.time(), thread_id))
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            for table in ("checkpoints", "writes", "threads"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def evict_closed(self, ttl: float) -> int:
+        """
+        Delete every incident that was closed more than ``ttl`` seconds ago.
+
+        Returns:
+            The number of threads removed
+        """
+        with self._lock:
+            expired = self._conn.execute(
+                "SELECT thread_id FROM threads WHERE closed_at IS NOT NULL AND closed_at < ?",
+                (time.time() - ttl,),
+            ).fetchall()
+        for thread_id, in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            threads, closed = self._conn.execute(
+                "SELECT COUNT(*), COUNT(closed_at) FROM threads"
+            ).fetchone()
+            checkpoints, = self._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()
+        return {"threads": threads, "closed_threads": closed, "checkpoints": checkpoints}
+
+
+class SqliteStore(BaseStore):
+    """
+    File-backed LangGraph store with per-item TTL.
+
+    Items are kept in SQLite under their dotted namespace, so lookups and prefix
+    searches hit an index instead of scanning memory. Semantic (``query``) search
+    is not supported; searches are filtered by namespace prefix and value equality.
+
+    Args:
+        path: SQLite database file (":memory:" for a throwaway database)
+        default_ttl: Default item time-to-live in minutes (None for no expiry)
+    """
+
+    supports_ttl = True
+
+    def __init__(self, path: str, default_ttl: Optional[float] = None):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS store (
+                prefix TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                ttl_minutes REAL,
+                expires_at REAL,
+                PRIMARY KEY (prefix, key)
+            );
+            CREATE INDEX IF NOT EXISTS store_expires_at ON store (expires_at);
+        """)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def batch(self, ops: Iterable[Op]) -> List[Result]:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            results: List[Result] = []
+            for op in ops:
+                if isinstance(op, GetOp):
+                    results.append(self._get(op, now))
+                elif isinstance(op, PutOp):
+                    self._put(op, now)
+                    results.append(None)
+                elif isinstance(op, SearchOp):
+                    results.append(self._search(op, now))
+                elif isinstance(op, ListNamespacesOp):
+                    results.append(self._list_namespaces(op, now))
+                else:
+                    raise ValueError(f"Unknown operation type: {type(op)}")
+            return results
+
+    async def abatch(self, ops: Iterable[Op]) -> List[Result]:
+        return await asyncio.to_thread(self.batch, list(ops))
+
+    def sweep_expired(self) -> int:
+        """Delete expired items and return how many were removed."""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM store WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            ).rowcount
+
+    def _item(self, row: Tuple[Any, ...], cls: type = Item) -> Item:
+        prefix, key, value, created_at, updated_at = row[:5]
+        return cls(
+            namespace=tuple(prefix.split(".")) if prefix else (),
+            key=key,
+            value=json.loads(value),
+            created_at=datetime.fromtimestamp(created_at, tz=timezone.utc),
+            updated_at=datetime.fromtimestamp(updated_at, tz=timezone.utc),
+        )
+
+    def _refresh(self, rows: List[Tuple[Any, ...]], now: float) -> None:
+        self._conn.executemany(
+            "UPDATE store SET expires_at = ? WHERE prefix = ? AND key = ?",
+            [(now + row[5] * 60, row[0], row[1]) for row in rows if row[5] is not None],
+        )
+
+    def _get(self, op: GetOp, now: float) -> Optional[Item]:
+        row = self._conn.execute(
+            "SELECT prefix, key, value, created_at, updated_at, ttl_minutes FROM store "
+            "WHERE prefix = ? AND key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            (".".join(op.namespace), op.key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        if op.refresh_ttl:
+            self._refresh([row], now)
+        return self._item(row)
+
+    def _put(self, op: PutOp, now: float) -> None:
+        prefix = ".".join(op.namespace)
+        if op.value is None:
+            self._conn.execute("DELETE FROM store WHERE prefix = ? AND key = ?", (prefix, op.key))
+            return
+        ttl = op.ttl if op.ttl is not None else self.default_ttl
+        self._conn.execute(
+            "INSERT INTO store VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (prefix, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at, "
+            "ttl_minutes = excluded.ttl_minutes, expires_at = excluded.expires_at",
+            (prefix, op.key, json.dumps(op.value), now, now, ttl, now + ttl * 60 if ttl is not None else None),
+        )
+
+    def _search(self, op: SearchOp, now: float) -> List[SearchItem]:
+        prefix = ".".join(op.namespace_prefix)
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._conn.execute(
+            "SELECT prefix, key, value, created_at, updated_at, ttl_minutes FROM store "
+            "WHERE (? = '' OR prefix = ? OR prefix LIKE ? ESCAPE '\\') "
+            "AND (expires_at IS NULL OR expires_at >= ?) ORDER BY updated_at DESC",
+            (prefix, prefix, f"{escaped}.%", now),
+        ).fetchall()
+        if op.filter:
+            rows = [row for row in rows if _matches(json.loads(row[2]), op.filter)]
+        rows = rows[op.offset:op.offset + op.limit]
+        if op.refresh_ttl:
+            self._refresh(rows, now)
+        return [self._item(row, SearchItem) for row in rows]
+
+    def _list_namespaces(self, op: ListNamespacesOp, now: float) -> List[Tuple[str, ...]]:
+        rows = self._conn.execute(
+            "SELECT DISTINCT prefix FROM store WHERE expires_at IS NULL OR expires_at >= ?", (now,)
+        ).fetchall()
+        namespaces = set()
+        for prefix, in rows:
+            namespace = tuple(prefix.split("."))
+            if op.match_conditions and not all(_namespace_matches(c.match_type, c.path, namespace) for c in op.match_conditions):
+                continue
+            namespaces.add(namespace[:op.max_depth] if op.max_depth is not None else namespace)
+        return sorted(namespaces)[op.offset:op.offset + op.limit]
+
+
+async def evict_expired(checkpointer: SqliteCheckpointer, store: SqliteStore, ttl: float, interval: float) -> None:
+    """
+    Evict closed incidents and expired store items every ``interval`` seconds until cancelled.
+
+    Args:
+        checkpointer: Checkpointer whose closed incidents are evicted once ``ttl`` seconds old
+        store: Store whose expired items are swept
+        ttl: Seconds a closed incident is kept
+        interval: Seconds between sweeps
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(checkpointer.evict_closed, ttl)
+        await asyncio.to_thread(store.sweep_expired)
+
+def _matches(value: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    return all(value.get(key) == expected for key, expected in filter.items())
+
+
+def _namespace_matches(match_type: str, path: Tuple[str, ...], namespace: Tuple[str, ...]) -> bool:
+    if len(path) > len(namespace):
+        return False
+    candidate = namespace[:len(path)] if match_type == "prefix" else namespace[len(namespace) - len(path):]
+    return all(expected == "*" or expected == actual for expected, actual in zip(path, candidate))
@@ -0,0 +1,196 @@
+"""
+Provider rate limiting shared by every agent, ordered by incident urgency
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from tools.emergency_tools import URGENCY_RANK
+
+ROUTINE_PRIORITY = URGENCY_RANK["ROUTINE"]
+
+# Priority of the model calls made in the current context; lower is more urgent.
+# IncidentEngine sets it for the duration of each turn (see agents.triage.incident_priority).
+request_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=ROUTINE_PRIORITY)
+
+# The model run that budget taken in the current context is charged to, set by the
+# limiter's own callbacks when a run reporting to them starts and cleared when it ends.
+_current_run: contextvars.ContextVar[Optional[UUID]] = contextvars.ContextVar("rate_limited_run", default=None)
+
+
+class _Bucket:
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst)
+        self.level = self.capacity
+
+    def refill(self, elapsed: float) -> None:
+        self.level = min(self.capacity, self.level + elapsed * self.rate)
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (0 if it already is)."""
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class ProviderRateLimiter(BaseRateLimiter, BaseCallbackHandler):
+    """
+    Requests-per-minute and tokens-per-minute budgets for every model call in the process.
+
+    Pass it as ``rate_limiter`` to each chat model and add it to the run callbacks.
+    A call waits until both budgets allow it, so bursts queue up instead of turning
+    into 429s and retry storms. Waiting calls are served most urgent first (see
+    ``request_priority``), then in arrival order, so a CRITICAL incident is not stuck
+    behind a queue of routine ones.
+
+    The token cost of a call is not known until it returns: each call reserves the
+    running average of recent usage and, as a callback, the limiter corrects the
+    budget with the actual usage once the call ends. Reservations are charged to the
+    model run whose start the limiter saw, so every provider request made inside it
+    (both tiers of an escalated EscalatingModel call, whose inner calls report no
+    callbacks of their own) is settled against that run's reported usage, and a cache
+    hit, which reserves nothing, corrects nothing.
+
+    Args:
+        requests_per_minute: Request budget
+        tokens_per_minute: Token budget (prompt plus completion)
+        burst: Seconds of budget that may be spent at once after an idle period
+        initial_estimate: Tokens reserved per call before any usage has been seen
+    """
+
+    run_inline = True
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 300_000,
+                 burst: float = 10.0, initial_estimate: float = 1500.0):
+        self.requests = _Bucket(requests_per_minute, burst)
+        self.tokens = _Bucket(tokens_per_minute, burst)
+        self.estimate = initial_estimate
+        self._reservations: Dict[UUID, float] = {}
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._granted = 0
+        self._delayed = 0
+        self._wait_time: Dict[int, float] = {}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.requests.refill(now - self._updated)
+        self.tokens.refill(now - self._updated)
+        self._updated = now
+
+    def _try_take(self, ticket: Tuple[int, int]) -> float:
+        """Take budget for ``ticket`` if it is next in line; otherwise return how long to wait."""
+        self._refill()
+        wait = max(self.requests.wait_for(1), self.tokens.wait_for(self.estimate))
+        if self._waiters[0] != ticket:
+            return max(wait, 0.01)
+        if wait > 0:
+            return wait
+        self.requests.level -= 1
+        self.tokens.level -= self.estimate
+        run_id = _current_run.get()
+        if run_id is not None:
+            self._reservations[run_id] = self._reservations.get(run_id, 0.0) + self.estimate
+        heapq.heappop(self._waiters)
+        self._lock.notify_all()
+        return 0.0
+
+    def _enqueue(self) -> Tuple[int, int]:
+        ticket = (request_priority.get(), next(self._sequence))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _leave(self, ticket: Tuple[int, int], waited: float) -> None:
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._lock.notify_all()
+            return
+        self._granted += 1
+        if waited >= 0.01:
+            self._delayed += 1
+            self._wait_time[ticket[0]] = self._wait_time.get(ticket[0], 0.0) + waited
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue()
+            try:
+                while True:
+                    wait = self._try_take(ticket)
+                    if wait == 0:
+                        return True
+                    if not blocking:
+                        return False
+                    self._lock.wait(wait)
+            finally:
+                self._leave(ticket, time.monotonic() - start)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue()
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_take(ticket)
+                if wait == 0:
+                    return True
+                if not blocking:
+                    return False
+                # The event loop must not block on the condition, so async callers poll.
+                await asyncio.sleep(min(wait, 0.05))
+        finally:
+            with self._lock:
+                self._leave(ticket, time.monotonic() - start)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            **kwargs: Any) -> None:
+        _current_run.set(run_id)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        _current_run.set(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        _current_run.set(None)
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        with self._lock:
+            reserved = self._reservations.pop(run_id, None)
+            if reserved is None or not usage:
+                return
+            used = usage.get("total_tokens", 0)
+            self.tokens.level -= used - reserved
+            self.estimate = 0.8 * self.estimate + 0.2 * used
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # The provider may have spent tokens on a failed call, so its reservation stands.
+        _current_run.set(None)
+        with self._lock:
+            self._reservations.pop(run_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "granted": self._granted,
+                "delayed": self._delayed,
+                "waiting": len(self._waiters),
+                "wait_time_by_priority": {
+                    level: round(self._wait_time.get(rank, 0.0), 3) for level, rank in URGENCY_RANK.items()
+                },
+                "token_estimate": round(self.estimate),
+                "outstanding_reservations": len(self._reservations),
+            }
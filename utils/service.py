@@ -0,0 +1,261 @@
+"""
+Local HTTP service mode for the Emergency Travel Response System
+
+Endpoints (JSON in, JSON out):
+    POST /incidents                      {"content": ..., "thread_id"?: ..., "wait"?: true}
+    POST /incidents/<thread_id>/messages {"content": ..., "wait"?: true}
+    POST /incidents/<thread_id>/close
+    GET  /incidents/<thread_id>          conversation so far and the active agent
+    GET  /jobs/<job_id>                  status of a turn submitted with "wait": false
+    GET  /metrics                        queue depth, worker utilization and other stats
+    GET  /health
+"""
+import asyncio
+import concurrent.futures
+import json
+import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.engine import IncidentEngine, IncidentResult
+
+_INCIDENT_PATH = re.compile(r"^/incidents/(?P<thread_id>[^/]+)(?P<action>/messages|/close)?$")
+_JOB_PATH = re.compile(r"^/jobs/(?P<job_id>[^/]+)$")
+
+
+def _message_json(message: Any) -> Dict[str, Any]:
+    return {
+        "type": getattr(message, "type", "unknown"),
+        "name": getattr(message, "name", None),
+        "content": getattr(message, "content", ""),
+    }
+
+
+def _result_json(result: IncidentResult) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"thread_id": result.thread_id, "elapsed": round(result.elapsed, 3)}
+    if not result.ok:
+        return {**body, "status": "failed", "error": str(result.error) or type(result.error).__name__}
+    messages = result.response.get("messages", [])
+    answer = next((m for m in reversed(messages) if getattr(m, "type", "") == "ai" and m.content), None)
+    return {
+        **body,
+        "status": "completed",
+        "agent": result.response.get("active_agent"),
+        "answer": _message_json(answer) if answer is not None else None,
+    }
+
+
+class IncidentService:
+    """
+    Serve incidents over a local HTTP API, backed by an IncidentEngine.
+
+    The engine's workers run on the asyncio loop that calls ``serve``, sharing one
+    compiled swarm (or, with a utils.sharding.ShardedEngine, dispatch to worker
+    processes from it); request handler threads hand turns to that loop. A turn is either
+    awaited by the request (``"wait": true``, the default) or queued as a job whose
+    status is polled at ``/jobs/<job_id>``. Follow-ups address the incident by thread_id
+    and are serialized per thread by the engine. When the engine's queue is full new
+    turns are rejected with 503 and a Retry-After header instead of piling up. A request
+    waits for its turn for at most the turn deadline plus ``wait_margin``; past that it
+    gets a 504 with a job id for the turn, which keeps running.
+
+    Args:
+        engine: The incident engine (or ShardedEngine) to dispatch turns to
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        stats: Extra stats providers included in /metrics, keyed by section name
+        on_close: Called with a thread_id when an incident is closed (e.g. SqliteCheckpointer.close_thread)
+        max_jobs: Number of finished jobs whose results are kept for polling
+        request_timeout: Seconds a request waits for an incident's state before failing with 500,
+            and for a turn when no deadline is known
+        deadline: Per-turn deadline of the engine's turns (default: the engine's ``deadline``)
+        wait_margin: Seconds added to the deadline for queueing before a waiting request gets a 504
+    """
+
+    def __init__(self, engine: IncidentEngine, host: str = "127.0.0.1", port: int = 8080,
+                 stats: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None,
+                 on_close: Optional[Callable[[str], None]] = None, max_jobs: int = 10000,
+                 request_timeout: float = 60.0, deadline: Optional[float] = None, wait_margin: float = 30.0):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.stats_providers = stats or {}
+        self.on_close = on_close
+        self.max_jobs = max_jobs
+        self.request_timeout = request_timeout
+        self.deadline = deadline if deadline is not None else getattr(engine, "deadline", None)
+        self.wait_margin = wait_margin
+        self._jobs: "OrderedDict[str, Tuple[str, concurrent.futures.Future]]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.ready = threading.Event()
+
+    async def serve(self) -> None:
+        """Serve until cancelled; the engine must be started on the current loop."""
+        self._loop = asyncio.get_running_loop()
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self.port = self._server.server_address[1]
+        thread = threading.Thread(target=self._server.serve_forever, name="incident-service", daemon=True)
+        thread.start()
+        self.ready.set()
+        # stderr, like all diagnostics, so stdout stays free for the renderer's records.
+        print(f"RescueNet service listening on http://{self.host}:{self.port}", file=sys.stderr)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            thread.join()
+
+    def _submit(self, thread_id: str, content: str) -> Optional[concurrent.futures.Future]:
+        """Hand a turn to the engine, or return None if as many turns as it can hold are already in flight."""
+        with self._in_flight_lock:
+            if self._in_flight >= self.engine.max_pending + self.engine.max_concurrency:
+                return None
+            self._in_flight += 1
+        future = asyncio.run_coroutine_threadsafe(self.engine.run_turn(thread_id, content), self._loop)
+        future.add_done_callback(self._turn_done)
+        return future
+
+    def _turn_done(self, future: concurrent.futures.Future) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _add_job(self, thread_id: str, future: concurrent.futures.Future) -> str:
+        job_id = uuid.uuid4().hex
+        with self._jobs_lock:
+            self._jobs[job_id] = (thread_id, future)
+            while len(self._jobs) > self.max_jobs:
+                oldest = next(iter(self._jobs))
+                if not self._jobs[oldest][1].done():
+                    break
+                del self._jobs[oldest]
+        return job_id
+
+    def _job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        thread_id, future = job
+        if not future.done():
+            return {"job_id": job_id, "thread_id": thread_id, "status": "pending"}
+        return {"job_id": job_id, **_result_json(future.result())}
+
+    def _thread_state(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        values = asyncio.run_coroutine_threadsafe(self.engine.thread_state(thread_id), self._loop).result(self.request_timeout)
+        messages = values.get("messages") if values else None
+        if not messages:
+            return None
+        return {
+            "thread_id": thread_id,
+            "active_agent": values.get("active_agent"),
+            "messages": [_message_json(m) for m in messages],
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._jobs_lock:
+            pending_jobs = sum(not future.done() for _, future in self._jobs.values())
+        metrics = {"engine": self.engine.stats(), "in_flight": self._in_flight, "pending_jobs": pending_jobs}
+        for name, provider in self.stats_providers.items():
+            metrics[name] = provider()
+        return metrics
+
+    def handle(self, method: str, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Route one request; returns (status, JSON body)."""
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return HTTPStatus.OK, self.metrics()
+
+        job = _JOB_PATH.match(path)
+        if method == "GET" and job:
+            status = self._job_status(job.group("job_id"))
+            return (HTTPStatus.OK, status) if status else (HTTPStatus.NOT_FOUND, {"error": "unknown job"})
+
+        incident = _INCIDENT_PATH.match(path)
+        if method == "GET" and incident and not incident.group("action"):
+            state = self._thread_state(incident.group("thread_id"))
+            return (HTTPStatus.OK, state) if state else (HTTPStatus.NOT_FOUND, {"error": "unknown incident"})
+        if method == "POST" and incident and incident.group("action") == "/close":
+            if self.on_close is not None:
+                self.on_close(incident.group("thread_id"))
+            return HTTPStatus.OK, {"thread_id": incident.group("thread_id"), "status": "closed"}
+
+        if method == "POST" and (path == "/incidents" or (incident and incident.group("action") == "/messages")):
+            content = body.get("content")
+            if not isinstance(content, str) or not content.strip():
+                return HTTPStatus.BAD_REQUEST, {"error": "'content' must be a non-empty string"}
+            if incident:
+                thread_id = incident.group("thread_id")
+            else:
+                thread_id = str(body.get("thread_id") or f"incident-{uuid.uuid4().hex[:12]}")
+            future = self._submit(thread_id, content)
+            if future is None:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "incident queue is full, retry later"}
+            if body.get("wait", True):
+                timeout = self.deadline + self.wait_margin if self.deadline is not None else self.request_timeout
+                try:
+                    result = future.result(timeout)
+                except concurrent.futures.TimeoutError:
+                    job_id = self._add_job(thread_id, future)
+                    return HTTPStatus.GATEWAY_TIMEOUT, {
+                        "thread_id": thread_id, "job_id": job_id, "status": "pending",
+                        "error": f"turn did not finish within {timeout:g}s; poll /jobs/{job_id}",
+                    }
+                return (HTTPStatus.OK if result.ok else HTTPStatus.BAD_GATEWAY), _result_json(result)
+            job_id = self._add_job(thread_id, future)
+            return HTTPStatus.ACCEPTED, {"job_id": job_id, "thread_id": thread_id, "status": "pending"}
+
+        return HTTPStatus.NOT_FOUND, {"error": f"no route for {method} {path}"}
+
+    def _handler_class(self) -> type:
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, status: int, body: Dict[str, Any]) -> None:
+                payload = json.dumps(body, default=str).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status == HTTPStatus.SERVICE_UNAVAILABLE:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _dispatch(self, method: str) -> None:
+                body: Dict[str, Any] = {}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length))
+                    except ValueError:
+                        return self._respond(HTTPStatus.BAD_REQUEST, {"error": "request body is not valid JSON"})
+                    if not isinstance(body, dict):
+                        return self._respond(HTTPStatus.BAD_REQUEST, {"error": "request body must be a JSON object"})
+                try:
+                    status, response = service.handle(method, self.path.split("?")[0], body)
+                except Exception as e:
+                    status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+                self._respond(status, response)
+
+            def do_GET(self) -> None:
+                self._dispatch("GET")
+
+            def do_POST(self) -> None:
+                self._dispatch("POST")
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
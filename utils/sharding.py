@@ -0,0 +1,417 @@
+"""
+Multi-process execution of incidents, sharded by thread_id
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.engine import IncidentEngine, IncidentResult
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of thread ids onto shards.
+
+    Each shard owns ``replicas`` points on a ring of 64-bit hashes and a thread belongs
+    to the shard owning the first point at or after the thread id's hash. The mapping
+    depends only on the thread id and the number of shards, so follow-up turns always
+    reach the shard holding the incident's state; changing the number of shards moves
+    only about 1/N of the threads (which matters when the shards share a --db).
+
+    Args:
+        shards: Number of shards
+        replicas: Points per shard; more points spread threads more evenly
+    """
+
+    def __init__(self, shards: int, replicas: int = 128):
+        points = sorted((_hash(f"shard-{shard}-{replica}"), shard) for shard in range(shards) for replica in range(replicas))
+        self.shards = shards
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        return self._owners[bisect.bisect_left(self._hashes, _hash(key)) % len(self._hashes)]
+
+
+@dataclass
+class ShardSetup:
+    """
+    What a shard's ``build`` function returns inside its worker process.
+
+    Args:
+        engine: The shard's (not yet started) incident engine
+        on_close: Called with a thread_id when an incident is closed
+        cleanup: Awaited after the engine stops (closing clients, writing metrics)
+        stats: Stats providers reported to the parent alongside the engine's stats
+    """
+    engine: IncidentEngine
+    on_close: Optional[Callable[[str], None]] = None
+    cleanup: Optional[Callable[[], Awaitable[None]]] = None
+    stats: Dict[str, Callable[[], Dict[str, Any]]] = field(default_factory=dict)
+
+
+def _snapshot(setup: ShardSetup) -> Dict[str, Any]:
+    snapshot = {"engine": setup.engine.stats()}
+    for name, provider in setup.stats.items():
+        snapshot[name] = provider()
+    return snapshot
+
+
+def _result_bytes(result: IncidentResult) -> bytes:
+    try:
+        return pickle.dumps(result)
+    except Exception as e:
+        error = RuntimeError(f"Turn result could not be sent to the parent process: {e}")
+        return pickle.dumps(IncidentResult(result.thread_id, error=error, elapsed=result.elapsed))
+
+
+async def _run_shard(index: int, build: Callable[[int], ShardSetup], requests: Any, responses: Any,
+                     stats_interval: float) -> None:
+    try:
+        setup = build(index)
+    except Exception:
+        responses.put((index, 0, "failed", traceback.format_exc()))
+        return
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue = asyncio.Queue()
+
+    def read() -> None:
+        while True:
+            message = requests.get()
+            loop.call_soon_threadsafe(inbox.put_nowait, message)
+            if message is None:
+                return
+
+    async def handle(kind: str, request_id: int, payload: Tuple[Any, ...]) -> None:
+        try:
+            if kind == "turn":
+                thread_id, content, deadline = payload
+                result = await setup.engine.run_turn(thread_id, content, deadline)
+                responses.put((index, request_id, "result", _result_bytes(result)))
+            elif kind == "state":
+                responses.put((index, request_id, "reply", await setup.engine.thread_state(payload[0])))
+            elif kind == "close":
+                if setup.on_close is not None:
+                    await asyncio.to_thread(setup.on_close, payload[0])
+                responses.put((index, request_id, "reply", None))
+            else:
+                raise ValueError(f"Unknown shard request {kind!r}")
+        except Exception as e:
+            # Every request gets a reply, or the parent's future would wait forever. The
+            # exception travels as text since it may not pickle.
+            responses.put((index, request_id, "error", f"{type(e).__name__}: {e}"))
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(stats_interval)
+            responses.put((index, 0, "stats", _snapshot(setup)))
+
+    threading.Thread(target=read, name=f"shard-{index}-requests", daemon=True).start()
+    tasks = set()
+    async with setup.engine:
+        responses.put((index, 0, "ready", os.getpid()))
+        reporter = asyncio.create_task(report())
+        while True:
+            message = await inbox.get()
+            if message is None:
+                break
+            kind, request_id, *payload = message
+            task = asyncio.create_task(handle(kind, request_id, tuple(payload)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        reporter.cancel()
+    if setup.cleanup is not None:
+        await setup.cleanup()
+    responses.put((index, 0, "stats", _snapshot(setup)))
+    responses.put((index, 0, "stopped", None))
+
+
+def _shard_main(index: int, build: Callable[[int], ShardSetup], requests: Any, responses: Any,
+                stats_interval: float) -> None:
+    asyncio.run(_run_shard(index, build, requests, responses, stats_interval))
+
+
+class _Shard:
+    def __init__(self, index: int, limit: int):
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.requests: Any = None
+        self.slots = asyncio.Semaphore(limit)
+        self.ready: Optional[asyncio.Future] = None
+        self.stopped = asyncio.Event()
+        self.pid: Optional[int] = None
+        self.report: Dict[str, Any] = {}
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "in_flight": 0}
+        self.turn_seconds = 0.0
+
+
+class ShardedEngine:
+    """
+    Run incidents across worker processes, each with its own compiled swarm and IncidentEngine.
+
+    One process is bound by one core and the GIL for the CPU-side work of a turn
+    (graph state merging, checkpoint serialization, formatting, tool logic). Here
+    every thread_id is consistently hashed (see HashRing) to one of ``shards`` worker
+    processes, so an incident's follow-ups run where its checkpoint lives, and turns
+    for different incidents run on different cores. Each worker calls ``build`` with
+    its shard index to create its engine; since workers are spawned, ``build`` must
+    be picklable, e.g. a module-level function or a functools.partial of one.
+
+    The interface mirrors IncidentEngine (``submit``, ``run_turn``, ``run_many``,
+    ``thread_state``, ``stats``) minus streaming. Each shard accepts at most
+    ``max_concurrency + max_pending`` turns at once and ``submit`` waits for a free
+    slot beyond that. ``stats`` reports the load per shard: turns routed to it,
+    in flight and completed, time spent in turns, and the latest engine (and other)
+    stats the worker reported, refreshed every ``stats_interval`` seconds.
+
+    Args:
+        build: Called in each worker with the shard index; returns a ShardSetup
+        shards: Number of worker processes
+        max_concurrency: Turns each shard's engine runs at once
+        max_pending: Turns each shard queues beyond that
+        stats_interval: Seconds between stats reports from each worker
+        start_method: multiprocessing start method for the workers
+        request_timeout: Seconds to wait for a shard to answer ``thread_state`` or ``close_thread``
+    """
+
+    def __init__(self, build: Callable[[int], ShardSetup], shards: int = os.cpu_count() or 1,
+                 max_concurrency: int = 16, max_pending: int = 256, stats_interval: float = 1.0,
+                 start_method: str = "spawn", request_timeout: float = 30.0):
+        self.build = build
+        self.request_timeout = request_timeout
+        self.ring = HashRing(shards)
+        self.max_concurrency = max_concurrency * shards
+        self.max_pending = max_pending * shards
+        self._per_shard_limit = max_concurrency + max_pending
+        self.stats_interval = stats_interval
+        self._context = multiprocessing.get_context(start_method)
+        self._shards: List[_Shard] = []
+        self._responses: Any = None
+        self._reader: Optional[threading.Thread] = None
+        self._closing = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requests: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._request_ids = itertools.count(1)
+
+    @property
+    def shards(self) -> int:
+        return self.ring.shards
+
+    def shard_for(self, thread_id: str) -> int:
+        return self.ring.shard_for(thread_id)
+
+    async def start(self) -> None:
+        """Start the workers and wait until every shard has built its swarm."""
+        if self._shards:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._closing.clear()
+        self._responses = self._context.Queue()
+        self._shards = [_Shard(index, self._per_shard_limit) for index in range(self.shards)]
+        for shard in self._shards:
+            shard.requests = self._context.Queue()
+            shard.ready = self._loop.create_future()
+            shard.process = self._context.Process(
+                target=_shard_main, name=f"rescuenet-shard-{shard.index}", daemon=True,
+                args=(shard.index, self.build, shard.requests, self._responses, self.stats_interval),
+            )
+            shard.process.start()
+        self._reader = threading.Thread(target=self._read_responses, name="shard-responses", daemon=True)
+        self._reader.start()
+        try:
+            await asyncio.gather(*(shard.ready for shard in self._shards))
+        except Exception:
+            await self._terminate()
+            raise
+
+    async def stop(self) -> None:
+        """Let every shard finish its turns and clean up, then end the workers."""
+        if not self._shards:
+            return
+        for shard in self._shards:
+            if shard.process.is_alive():
+                shard.requests.put(None)
+        await asyncio.gather(*(shard.stopped.wait() for shard in self._shards))
+        await self._terminate()
+
+    async def _terminate(self) -> None:
+        self._closing.set()
+        for shard in self._shards:
+            await asyncio.to_thread(shard.process.join, 5)
+            if shard.process.is_alive():
+                shard.process.terminate()
+        await asyncio.to_thread(self._reader.join)
+        self._shards = []
+
+    async def __aenter__(self) -> "ShardedEngine":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    def _read_responses(self) -> None:
+        while not self._closing.is_set():
+            try:
+                message = self._responses.get(timeout=0.5)
+            except queue.Empty:
+                self._loop.call_soon_threadsafe(self._check_workers)
+                continue
+            self._loop.call_soon_threadsafe(self._on_response, *message)
+
+    def _on_response(self, index: int, request_id: int, kind: str, payload: Any) -> None:
+        shard = self._shards[index] if index < len(self._shards) else None
+        if shard is None:
+            return
+        if kind == "ready":
+            shard.pid = payload
+            if not shard.ready.done():
+                shard.ready.set_result(payload)
+        elif kind == "failed":
+            if not shard.ready.done():
+                shard.ready.set_exception(RuntimeError(f"Shard {index} failed to start:\n{payload}"))
+            shard.stopped.set()
+        elif kind == "stats":
+            shard.report = payload
+        elif kind == "stopped":
+            shard.stopped.set()
+        else:
+            _, future = self._requests.pop(request_id, (None, None))
+            if future is None or future.done():
+                return
+            if kind == "error":
+                future.set_exception(RuntimeError(f"Shard {index}: {payload}"))
+            else:
+                future.set_result(pickle.loads(payload) if kind == "result" else payload)
+
+    def _check_workers(self) -> None:
+        """Fail the requests of a worker that died instead of leaving them waiting forever."""
+        for shard in self._shards:
+            if shard.process.is_alive() or shard.stopped.is_set():
+                continue
+            shard.stopped.set()
+            error = RuntimeError(f"Shard {shard.index} exited with code {shard.process.exitcode}")
+            if not shard.ready.done():
+                shard.ready.set_exception(error)
+            for request_id, (index, future) in list(self._requests.items()):
+                if index == shard.index:
+                    del self._requests[request_id]
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _send(self, shard: _Shard, kind: str, *payload: Any) -> asyncio.Future:
+        if shard.stopped.is_set():
+            raise RuntimeError(f"Shard {shard.index} is not running")
+        request_id = next(self._request_ids)
+        future = self._loop.create_future()
+        self._requests[request_id] = (shard.index, future)
+        shard.requests.put((kind, request_id) + payload)
+        return future
+
+    async def submit(self, thread_id: str, content: str, deadline: Optional[float] = None,
+                     on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> "asyncio.Future[IncidentResult]":
+        """
+        Send a user message to its thread's shard, waiting while that shard is full.
+
+        Returns:
+            A future resolving to the IncidentResult of the turn
+        """
+        if on_event is not None:
+            raise ValueError("Streaming is not supported across shard processes")
+        if not self._shards:
+            await self.start()
+        shard = self._shards[self.shard_for(thread_id)]
+        await shard.slots.acquire()
+        try:
+            future = self._send(shard, "turn", thread_id, content, deadline)
+        except Exception:
+            shard.slots.release()
+            raise
+        shard.counters["submitted"] += 1
+        shard.counters["in_flight"] += 1
+        future.add_done_callback(lambda done: self._turn_done(shard, done))
+        return future
+
+    def _turn_done(self, shard: _Shard, future: asyncio.Future) -> None:
+        shard.slots.release()
+        shard.counters["in_flight"] -= 1
+        result = None if future.cancelled() or future.exception() is not None else future.result()
+        if result is None or not result.ok:
+            shard.counters["failed"] += 1
+        else:
+            shard.counters["completed"] += 1
+        if result is not None:
+            shard.turn_seconds += result.elapsed
+
+    async def run_turn(self, thread_id: str, content: str, deadline: Optional[float] = None) -> IncidentResult:
+        try:
+            return await (await self.submit(thread_id, content, deadline))
+        except RuntimeError as e:
+            return IncidentResult(thread_id, error=e)
+
+    async def run_many(self, incidents: Iterable[Tuple[str, str]], deadline: Optional[float] = None) -> List[IncidentResult]:
+        """Submit (thread_id, content) pairs and gather their results in order."""
+        futures = [await self.submit(thread_id, content, deadline) for thread_id, content in incidents]
+        return list(await asyncio.gather(*futures))
+
+    async def _request(self, thread_id: str, kind: str) -> Any:
+        shard = self._shards[self.shard_for(thread_id)]
+        future = self._send(shard, kind, thread_id)
+        try:
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            for request_id, (_, pending) in list(self._requests.items()):
+                if pending is future:
+                    del self._requests[request_id]
+            raise TimeoutError(f"Shard {shard.index} did not answer {kind!r} for {thread_id} "
+                               f"within {self.request_timeout:g}s") from None
+
+    async def thread_state(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """The thread's current state values, fetched from its shard."""
+        return await self._request(thread_id, "state")
+
+    async def close_thread(self, thread_id: str) -> None:
+        """Pass an incident's closure to its shard's ``on_close``."""
+        await self._request(thread_id, "close")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Totals across shards plus the load of each.
+
+        ``imbalance`` is the busiest shard's share of turns relative to an even split
+        (1.0 is perfectly even).
+        """
+        per_shard = [
+            {
+                "shard": shard.index,
+                "pid": shard.pid,
+                "alive": shard.process is not None and shard.process.is_alive(),
+                **shard.counters,
+                "turn_seconds": round(shard.turn_seconds, 3),
+                **shard.report,
+            }
+            for shard in self._shards
+        ]
+        totals = {name: sum(shard.counters[name] for shard in self._shards)
+                  for name in ("submitted", "completed", "failed", "in_flight")}
+        busiest = max((shard.counters["submitted"] for shard in self._shards), default=0)
+        return {
+            "shards": self.shards,
+            **totals,
+            "imbalance": busiest * self.shards / totals["submitted"] if totals["submitted"] else 0.0,
+            "per_shard": per_shard,
+        }
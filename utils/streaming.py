@@ -0,0 +1,57 @@
+"""
+Streaming helpers that turn swarm stream chunks into incremental events
+"""
+from typing import Any, AsyncIterator, Dict, Iterator, Tuple
+
+HANDOFF_TOOL_PREFIX = "transfer_to_"
+
+
+def _agent_from_namespace(namespace: Tuple[str, ...]) -> str:
+    return namespace[0].split(":", 1)[0] if namespace else "EmergencyCoordinator"
+
+
+def _message_events(agent: str, message: Any) -> Iterator[Dict[str, Any]]:
+    role = getattr(message, "type", "")
+    if role == "tool":
+        # Transfers show up as handoff events; a refused one (status "error") stays put and is shown as a result.
+        if not (message.name or "").startswith(HANDOFF_TOOL_PREFIX) or getattr(message, "status", None) == "error":
+            yield {"type": "tool_result", "agent": agent, "name": message.name, "content": message.content}
+        return
+
+    is_chunk = role == "AIMessageChunk"
+    content = message.content if isinstance(message.content, str) else ""
+    if content:
+        yield {"type": "token" if is_chunk else "message", "agent": agent, "text": content}
+
+    calls = message.tool_call_chunks if is_chunk else message.tool_calls
+    for call in calls:
+        name = call.get("name")
+        if name and not name.startswith(HANDOFF_TOOL_PREFIX):
+            yield {"type": "tool_call", "agent": agent, "name": name, "args": call.get("args")}
+
+
+async def astream_events(app: Any, inputs: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a swarm turn as a sequence of small events.
+
+    Events are dictionaries with a ``type`` of ``token`` (a streamed piece of an agent reply),
+    ``message`` (a whole reply from a non-streaming model), ``tool_call``, ``tool_result``
+    or ``handoff`` (an agent transferring control, with ``from`` and ``to`` keys).
+
+    Args:
+        app: The compiled swarm
+        inputs: The turn input, as passed to app.invoke
+        config: The run config including the thread_id
+
+    Yields:
+        Event dictionaries in the order they happen
+    """
+    async for namespace, mode, data in app.astream(inputs, config, stream_mode=["messages", "updates"], subgraphs=True):
+        if mode == "messages":
+            message, _metadata = data
+            for event in _message_events(_agent_from_namespace(namespace), message):
+                yield event
+        elif not namespace:
+            for node, update in data.items():
+                if isinstance(update, dict) and update.get("active_agent") not in (None, node):
+                    yield {"type": "handoff", "from": node, "to": update["active_agent"]}